@@ -18,6 +18,8 @@ load("//coco/private:cc_library.bzl", "coco_library", "coco_test_library")
 
 _CC_RUNTIME = Label("//coco:cc_runtime")
 
+_CC_RUNTIME_PCH = Label("//coco:cc_runtime_pch")
+
 def coco_cc_library(
         name,
         generated_package = None,
@@ -26,6 +28,8 @@ def coco_cc_library(
         hdrs = [],
         deps = [],
         public_hdrs = None,
+        unity_batch_size = 0,
+        unity_exclude = [],
         **kwargs):
     """Creates a C++ library from Coco-generated C++ code.
 
@@ -49,17 +53,23 @@ def coco_cc_library(
         hdrs: Additional C++ header files
         deps: Additional dependencies
         public_hdrs: List of generated header names to make public, or None for all
+        unity_batch_size: If greater than 1, compile the generated sources in batches of up to this many
+            per translation unit, or 0 to compile each on its own
+        unity_exclude: Generated sources to compile on their own when unity_batch_size is set
         **kwargs: Additional arguments passed to cc_library
     """
     coco_library(
         name = name,
         runtime = _CC_RUNTIME,
+        runtime_pch = _CC_RUNTIME_PCH,
         generated_package = generated_package,
         generated_packages = generated_packages,
         srcs = srcs,
         hdrs = hdrs,
         deps = deps,
         public_hdrs = public_hdrs,
+        unity_batch_size = unity_batch_size,
+        unity_exclude = unity_exclude,
         **kwargs
     )
 
@@ -72,6 +82,8 @@ def coco_cc_test_library(
         deps = [],
         public_hdrs = None,
         gmock = "@googletest//:gtest",
+        unity_batch_size = 0,
+        unity_exclude = [],
         **kwargs):
     """Creates a C++ test library from Coco-generated C++ test code.
 
@@ -94,11 +106,15 @@ def coco_cc_test_library(
         public_hdrs: List of generated test header names to make public, or None for all
         gmock: The GoogleTest/GoogleMock library (default: @googletest//:gtest).
                Set to None to omit.
+        unity_batch_size: If greater than 1, compile the generated sources in batches of up to this many
+            per translation unit, or 0 to compile each on its own
+        unity_exclude: Generated sources to compile on their own when unity_batch_size is set
         **kwargs: Additional arguments passed to cc_library
     """
     coco_test_library(
         name = name,
         runtime = _CC_RUNTIME,
+        runtime_pch = _CC_RUNTIME_PCH,
         generated_package = generated_package,
         generated_packages = generated_packages,
         srcs = srcs,
@@ -106,5 +122,7 @@ def coco_cc_test_library(
         deps = deps,
         public_hdrs = public_hdrs,
         gmock = gmock,
+        unity_batch_size = unity_batch_size,
+        unity_exclude = unity_exclude,
         **kwargs
     )
@@ -29,6 +29,7 @@ load(
     _coco_architecture_diagram = "coco_architecture_diagram",
     _coco_counterexample_diagram = "coco_counterexample_diagram",
     _coco_state_diagram = "coco_state_diagram",
+    _coco_verification = "coco_verification",
     _counterexample_options = "counterexample_options",
 )
 load(
@@ -39,6 +40,10 @@ load(
     "//coco/private:licensing.bzl",
     _LICENSE_SOURCES = "LICENSE_SOURCES",
 )
+load(
+    "//coco/private:profile.bzl",
+    _coco_profile_aspect = "coco_profile_aspect",
+)
 
 coco_package = _coco_package
 
@@ -62,6 +67,10 @@ coco_state_diagram = _coco_state_diagram
 
 coco_counterexample_diagram = _coco_counterexample_diagram
 
+coco_verification = _coco_verification
+
 counterexample_options = _counterexample_options
 
+coco_profile_aspect = _coco_profile_aspect
+
 LICENSE_SOURCES = _LICENSE_SOURCES
@@ -155,6 +155,8 @@ def _toolchain_tag_impl(ctx):
     license_source = ""
     license_token = ""
     auth_token_path = ""
+    license_file_path = ""
+    mirrors = []
 
     for mod in ctx.modules:
         for toolchain in mod.tags.toolchain:
@@ -169,6 +171,10 @@ def _toolchain_tag_impl(ctx):
                 license_token = toolchain.license_token
             if not auth_token_path and toolchain.auth_token_path:
                 auth_token_path = toolchain.auth_token_path
+            if not license_file_path and toolchain.license_file_path:
+                license_file_path = toolchain.license_file_path
+            if not mirrors and toolchain.mirrors:
+                mirrors = toolchain.mirrors
 
     # Root-module only: a dependency must not force a machine-specific path on consumers.
     local_tag = None
@@ -244,6 +250,7 @@ def _toolchain_tag_impl(ctx):
                 name = "io_cocotec_coco_cc_runtime__%s" % version_suffix,
                 version = version,
                 extra_deps = cc_runtime_extra_deps_by_version.get(version, []),
+                mirrors = mirrors,
             )
 
         # Set up C runtime if requested (version-specific)
@@ -251,6 +258,7 @@ def _toolchain_tag_impl(ctx):
             coco_c_runtime_repository(
                 name = "io_cocotec_coco_c_runtime__%s" % version_suffix,
                 version = version,
+                mirrors = mirrors,
             )
 
         # Set up toolchains for all platforms
@@ -284,6 +292,8 @@ def _toolchain_tag_impl(ctx):
                 license_source = license_source,
                 license_token = license_token,
                 auth_token_path = auth_token_path,
+                license_file_path = license_file_path,
+                mirrors = mirrors,
             )
 
             constraints = [
@@ -344,6 +354,7 @@ def _toolchain_tag_impl(ctx):
             license_source = license_source,
             license_token = license_token,
             auth_token_path = auth_token_path,
+            license_file_path = license_file_path,
         )
 
         toolchain_names.append("local")
@@ -382,14 +393,22 @@ _toolchain_tag = tag_class(
             default = False,
             doc = "Whether to include C++ runtime support",
         ),
+        "license_file_path": attr.string(
+            doc = "Optional path to a license file for all toolchains when license_source is 'action_license_file'. The file must be available in the execution environment.",
+            default = "",
+        ),
         "license_source": attr.string(
-            doc = "Optional default license source mode for all toolchains (e.g., 'local_user', 'local_acquire', 'token', 'action_environment', 'action_file'). Can be overridden via --@rules_coco//:license_source flag.",
+            doc = "Optional default license source mode for all toolchains (e.g., 'local_user', 'local_acquire', 'token', 'action_environment', 'action_file', 'action_license_file'). Can be overridden via --@rules_coco//:license_source flag.",
             default = "",
         ),
         "license_token": attr.string(
             doc = "Optional default license token for all toolchains when license_source is 'token'.",
             default = "",
         ),
+        "mirrors": attr.string_list(
+            doc = "URL prefixes to download popili and the runtimes from instead of https://dl.cocotec.io/popili, tried in order. Each must serve the same layout, e.g. `<mirror>/archive/1.5.1/popili_linux_amd64.zip`.",
+            default = [],
+        ),
         "versions": attr.string_list(
             default = ["stable"],
             doc = "List of Coco/Popili versions to register (e.g., ['1.5.0', '1.4.0']). Use version aliases like 'stable' or explicit versions like '1.5.1'.",
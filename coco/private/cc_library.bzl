@@ -15,8 +15,38 @@
 """Shared implementation for coco_cc_library and coco_c_library macros."""
 
 load("@rules_cc//cc:defs.bzl", "cc_library")
+load(":cc_runtime.bzl", "CC_RUNTIME_PCH_HEADER")
 load(":coco.bzl", _coco_cc_gen = "coco_cc_gen")
 
+def _runtime_pch_args(runtime_pch, deps, copts):
+    """Adds the precompiled runtime header to deps and copts under --@rules_coco//:cc_runtime_pch."""
+    if not runtime_pch:
+        return deps, copts
+    enabled = Label("//coco/private:cc_runtime_pch_enabled")
+    return (
+        deps + select({enabled: [runtime_pch], "//conditions:default": []}),
+        copts + select({enabled: ["-include", CC_RUNTIME_PCH_HEADER], "//conditions:default": []}),
+    )
+
+def _unity_compiler_inputs(gen_targets, unity_batch_size, additional_compiler_inputs):
+    """Adds the sources #included by unity batches to a library's additional_compiler_inputs.
+
+    The included sources are inputs of the library's own compile actions only, so
+    that they are not propagated to its dependents as headers.
+    """
+    if unity_batch_size <= 1:
+        return additional_compiler_inputs
+    inputs = []
+    for gen_name in gen_targets:
+        native.filegroup(
+            name = gen_name + ".unity_included",
+            srcs = [gen_name],
+            output_group = "unity_included_sources",
+            tags = ["manual"],
+        )
+        inputs.append(gen_name + ".unity_included")
+    return additional_compiler_inputs + inputs
+
 def coco_library(
         name,
         runtime,
@@ -26,6 +56,9 @@ def coco_library(
         hdrs = [],
         deps = [],
         public_hdrs = None,
+        unity_batch_size = 0,
+        unity_exclude = [],
+        runtime_pch = None,
         **kwargs):
     """Creates a C/C++ library from Coco-generated code.
 
@@ -40,6 +73,15 @@ def coco_library(
         public_hdrs: List of generated header names to make public, or None for all.
                         Use bare filenames (e.g., 'ISensor.h') to match by name, or
                         path suffixes (e.g., 'src/ISensor.h') to disambiguate.
+        unity_batch_size: If greater than 1, compile the generated sources in batches of up to
+                        this many per translation unit (a "unity" build), so headers shared by
+                        the sources are only parsed once per batch. 0 (the default) compiles
+                        each source on its own.
+        unity_exclude: Generated sources to compile on their own even when unity_batch_size is
+                        set, e.g. ones that define conflicting internal symbols or macros. Matched
+                        like public_hdrs.
+        runtime_pch: A coco_cc_runtime_pch target to compile against under
+                        --@rules_coco//:cc_runtime_pch, or None
         **kwargs: Additional arguments passed to cc_library
     """
     if generated_package and generated_packages:
@@ -54,15 +96,20 @@ def coco_library(
             package = pkg,
             all_hdrs_public = (public_hdrs == None),
             public_hdrs = public_hdrs if public_hdrs != None else [],
+            unity_batch_size = unity_batch_size,
+            unity_exclude = unity_exclude,
             tags = ["manual"],
         )
         gen_targets.append(gen_name)
 
+    lib_deps, copts = _runtime_pch_args(runtime_pch, deps + gen_targets + [runtime], kwargs.pop("copts", []))
     cc_library(
         name = name,
         srcs = srcs + gen_targets,
         hdrs = hdrs,
-        deps = deps + gen_targets + [runtime],
+        deps = lib_deps,
+        copts = copts,
+        additional_compiler_inputs = _unity_compiler_inputs(gen_targets, unity_batch_size, kwargs.pop("additional_compiler_inputs", [])),
         **kwargs
     )
 
@@ -76,6 +123,9 @@ def coco_test_library(
         deps = [],
         public_hdrs = None,
         gmock = "@googletest//:gtest",
+        unity_batch_size = 0,
+        unity_exclude = [],
+        runtime_pch = None,
         **kwargs):
     """Creates a C/C++ test library from Coco-generated test code.
 
@@ -92,6 +142,15 @@ def coco_test_library(
                         path suffixes (e.g., 'src/RunnableMock.h') to disambiguate.
         gmock: The GoogleTest/GoogleMock library to use (default: @googletest//:gtest).
                Set to None to omit gmock dependency.
+        unity_batch_size: If greater than 1, compile the generated sources in batches of up to
+                        this many per translation unit (a "unity" build), so headers shared by
+                        the sources are only parsed once per batch. 0 (the default) compiles
+                        each source on its own.
+        unity_exclude: Generated sources to compile on their own even when unity_batch_size is
+                        set, e.g. ones that define conflicting internal symbols or macros. Matched
+                        like public_hdrs.
+        runtime_pch: A coco_cc_runtime_pch target to compile against under
+                        --@rules_coco//:cc_runtime_pch, or None
         **kwargs: Additional arguments passed to cc_library
     """
     if generated_package and generated_packages:
@@ -107,16 +166,21 @@ def coco_test_library(
             use_test_outputs = True,
             all_hdrs_public = (public_hdrs == None),
             public_hdrs = public_hdrs if public_hdrs != None else [],
+            unity_batch_size = unity_batch_size,
+            unity_exclude = unity_exclude,
             tags = ["manual"],
         )
         gen_targets.append(gen_name)
 
     gmock_deps = [gmock] if gmock else []
 
+    lib_deps, copts = _runtime_pch_args(runtime_pch, deps + gen_targets + gmock_deps + [runtime], kwargs.pop("copts", []))
     cc_library(
         name = name,
         srcs = srcs + gen_targets,
         hdrs = hdrs,
-        deps = deps + gen_targets + gmock_deps + [runtime],
+        deps = lib_deps,
+        copts = copts,
+        additional_compiler_inputs = _unity_compiler_inputs(gen_targets, unity_batch_size, kwargs.pop("additional_compiler_inputs", [])),
         **kwargs
     )
@@ -14,7 +14,14 @@
 
 """Internal C++ runtime rule implementation."""
 
+load("@rules_cc//cc:action_names.bzl", "ACTION_NAMES")
 load("@rules_cc//cc:defs.bzl", "CcInfo")
+load("@rules_cc//cc:find_cc_toolchain.bzl", "find_cc_toolchain", "use_cc_toolchain")
+load("@rules_cc//cc/common:cc_common.bzl", "cc_common")
+
+# Name of the header that coco_cc_runtime_pch precompiles. Libraries use the
+# precompiled header by passing `-include` with this name.
+CC_RUNTIME_PCH_HEADER = "coco_runtime_pch.h"
 
 def _coco_cc_runtime_impl(ctx):
     """Helper rule that provides the C++ runtime from the toolchain."""
@@ -35,3 +42,104 @@ coco_cc_runtime = rule(
     Use `coco_cc_library` or `coco_cc_test_library` instead.
     """,
 )
+
+def _runtime_include_path(hdr):
+    """Returns the path hdr is included by, relative to the root of its repository."""
+    path = hdr.short_path
+    if path.startswith("../"):
+        path = path.split("/", 2)[2]
+    return path
+
+def _coco_cc_runtime_pch_impl(ctx):
+    toolchain = ctx.toolchains["@rules_coco//coco:toolchain_type"]
+    if not toolchain.cc_runtime:
+        fail("C++ runtime not available. Did you enable cc=True in coco.toolchain()?")
+    runtime = toolchain.cc_runtime[CcInfo].compilation_context
+
+    header = ctx.actions.declare_file("%s/%s" % (ctx.label.name, CC_RUNTIME_PCH_HEADER))
+    ctx.actions.write(header, "#pragma once\n" + "".join([
+        '#include "%s"\n' % _runtime_include_path(h)
+        for h in sorted(runtime.direct_public_headers, key = lambda h: h.short_path)
+    ]))
+
+    cc_toolchain = find_cc_toolchain(ctx)
+    feature_configuration = cc_common.configure_features(
+        ctx = ctx,
+        cc_toolchain = cc_toolchain,
+        requested_features = ctx.features,
+        unsupported_features = ctx.disabled_features,
+    )
+
+    # GCC looks for <header>.gch next to a header passed to -include and, if that is
+    # a directory, uses the first file in it that is valid for the current
+    # compilation, falling back to the header itself. Precompiling both with and
+    # without PIC therefore serves every compile action of a library. Other
+    # compilers reject rather than ignore mismatched precompiled headers, so they
+    # just include the header.
+    pchs = []
+    if cc_toolchain.compiler == "gcc":
+        compiler = cc_common.get_tool_for_action(
+            feature_configuration = feature_configuration,
+            action_name = ACTION_NAMES.cpp_compile,
+        )
+        inputs = depset([header], transitive = [runtime.headers, cc_toolchain.all_files])
+        for use_pic in [False, True]:
+            pch = ctx.actions.declare_file("%s/%s.gch/%s" % (
+                ctx.label.name,
+                CC_RUNTIME_PCH_HEADER,
+                "pic" if use_pic else "nopic",
+            ))
+            variables = cc_common.create_compile_variables(
+                feature_configuration = feature_configuration,
+                cc_toolchain = cc_toolchain,
+                user_compile_flags = ctx.fragments.cpp.copts + ctx.fragments.cpp.cxxopts + ["-x", "c++-header"],
+                source_file = header.path,
+                output_file = pch.path,
+                use_pic = use_pic,
+                include_directories = runtime.includes,
+                quote_include_directories = runtime.quote_includes,
+                system_include_directories = runtime.system_includes,
+                framework_include_directories = runtime.framework_includes,
+                preprocessor_defines = runtime.defines,
+            )
+            ctx.actions.run(
+                executable = compiler,
+                arguments = cc_common.get_memory_inefficient_command_line(
+                    feature_configuration = feature_configuration,
+                    action_name = ACTION_NAMES.cpp_compile,
+                    variables = variables,
+                ),
+                env = cc_common.get_environment_variables(
+                    feature_configuration = feature_configuration,
+                    action_name = ACTION_NAMES.cpp_compile,
+                    variables = variables,
+                ),
+                inputs = inputs,
+                outputs = [pch],
+                mnemonic = "CocoRuntimePch",
+                progress_message = "Precompiling the Coco C++ runtime headers for %{label}",
+            )
+            pchs.append(pch)
+
+    compilation_context = cc_common.create_compilation_context(
+        headers = depset([header] + pchs),
+        quote_includes = depset([header.dirname]),
+    )
+    return [
+        DefaultInfo(files = depset([header] + pchs)),
+        CcInfo(compilation_context = compilation_context),
+    ]
+
+coco_cc_runtime_pch = rule(
+    implementation = _coco_cc_runtime_pch_impl,
+    attrs = {},
+    fragments = ["cpp"],
+    toolchains = ["@rules_coco//coco:toolchain_type"] + use_cc_toolchain(),
+    doc = """Internal helper rule that precompiles the headers of the C++ runtime.
+
+    Provides a header including every public header of the runtime, together
+    with its precompiled form when the C++ toolchain is GCC. This rule is not
+    part of the public API; coco_cc_library and coco_cc_test_library use it
+    under --@rules_coco//:cc_runtime_pch.
+    """,
+)
@@ -29,8 +29,9 @@ CocoPackageInfo = provider(
         "name": "The name of the package",
         "package_file": "The Coco.toml file for this package",
         "srcs": "All .coco files that are sources of this package or any of its transitive dependencies",
-        "test_srcs": "All .coco files that are test_sources of this package or any of its transitive dependencies",
-        "typecheck_marker": "Marker file indicating typecheck passed (or None if typecheck disabled)",
+        "test_srcs": "The .coco files that are test_sources of this package. Test sources are private to a package, " +
+                     "so unlike srcs this does not include those of its dependencies",
+        "typecheck_marker": "Marker file indicating typecheck passed (or None if typecheck is disabled or runs as a validation)",
         "workspace_files": "Coco.toml files for any enclosing workspaces of this package or its transitive dependencies",
     },
 )
@@ -42,8 +43,18 @@ CocoWorkspaceInfo = provider(
     },
 )
 
+CocoVerificationInfo = provider(
+    doc = "Results of verifying a Coco package in a cacheable build action",
+    fields = {
+        "counterexamples": "Counterexample SVGs rendered by the same verification run as a depset",
+        "junit": "JUnit XML report of the verification results",
+    },
+)
+
 CocoCcGeneratedInfo = provider(
-    doc = "Generated C/C++ code from a Coco package",
+    doc = "Generated C/C++ code from a Coco package. With output_mode = \"directory\", headers and sources " +
+          "both hold the tree artifact of the generated code, and test_headers and test_sources that of " +
+          "the generated test code and mocks",
     fields = {
         "headers": "Generated header files as a depset",
         "sources": "Generated implementation files as a depset",
@@ -62,12 +73,76 @@ CocoCSharpGeneratedInfo = provider(
 
 LICENSE_ATTRIBUTES = {
     "_auth_token_path": attr.label(default = Label("//:auth_token_path")),
+    "_license_file_path": attr.label(default = Label("//:license_file_path")),
     "_license_file_fetch": attr.label(default = Label("@io_cocotec_licensing_fetch//:licenses")),
     "_license_file_local": attr.label(default = Label("@io_cocotec_licensing_local//:licenses")),
     "_license_source": attr.label(default = Label("//:license_source")),
     "_license_token": attr.label(default = Label("//:license_token")),
 }
 
+# Profiler selected by --@rules_coco//:profile; an empty target disables profiling.
+POPILI_PROFILER_ATTRIBUTES = {
+    "_popili_profiler": attr.label(default = Label("//:profile"), cfg = "exec"),
+}
+
+# Test rules run the profiler inside the test, so it is built for the target platform.
+POPILI_TEST_PROFILER_ATTRIBUTES = {
+    "_popili_profiler": attr.label(default = Label("//:profile")),
+}
+
+# Whether CocoTypecheck and CocoGenerate report the .coco inputs they did not read
+# (see --@rules_coco//:prune_unused_inputs), and the script that finds them.
+PRUNE_UNUSED_INPUTS_ATTRIBUTES = {
+    "_prune_unused_inputs": attr.label(default = Label("//:prune_unused_inputs")),
+    "_unused_inputs_awk": attr.label(
+        default = Label("//coco/private:unused_inputs.awk"),
+        allow_single_file = True,
+    ),
+}
+
+# Resources that popili actions reserve from Bazel's local scheduler, by resource
+# class. Bazel only accepts top-level functions as resource sets, so each class
+# has its own.
+def _small_resource_set(_os_name, _inputs_size):
+    return {"cpu": 1, "memory": 1024}
+
+def _medium_resource_set(_os_name, _inputs_size):
+    return {"cpu": 2, "memory": 2048}
+
+def _large_resource_set(_os_name, _inputs_size):
+    return {"cpu": 4, "memory": 4096}
+
+def _xlarge_resource_set(_os_name, _inputs_size):
+    return {"cpu": 8, "memory": 8192}
+
+_RESOURCE_CLASSES = {
+    "small": struct(cpu = 1, resource_set = _small_resource_set),
+    "medium": struct(cpu = 2, resource_set = _medium_resource_set),
+    "large": struct(cpu = 4, resource_set = _large_resource_set),
+    "xlarge": struct(cpu = 8, resource_set = _xlarge_resource_set),
+}
+
+# With resources = "auto", the smallest class whose limit covers the number of
+# .coco files in the package, or "xlarge" beyond the last limit.
+_AUTO_RESOURCE_CLASS_LIMITS = [
+    (10, "small"),
+    (50, "medium"),
+    (200, "large"),
+]
+
+# Attributes for rules whose popili actions reserve resources by class.
+RESOURCE_ATTRIBUTES = {
+    "resources": attr.string(
+        default = "auto",
+        values = ["auto"] + _RESOURCE_CLASSES.keys(),
+        doc = "How many resources each popili run of this target reserves from Bazel's scheduler: " +
+              "\"small\" (1 CPU, 1 GB), \"medium\" (2 CPUs, 2 GB), \"large\" (4 CPUs, 4 GB) or " +
+              "\"xlarge\" (8 CPUs, 8 GB). Tests only reserve the CPUs. \"auto\" (the default) picks a " +
+              "class from the number of .coco files in the package.",
+    ),
+    "_popili_threads": attr.label(default = Label("//:popili_threads")),
+}
+
 COCO_TOOLCHAIN_TYPE = "@rules_coco//coco:toolchain_type"
 
 def _resolve_version_alias(version):
@@ -209,6 +284,11 @@ def _coco_startup_args(ctx, package, is_test):
         if auth_token_path:
             arguments.append("--machine-auth-token")
             arguments.append(auth_token_path)
+    elif license_source == "action_license_file":
+        license_file_path = _get_license_file_path(ctx)
+        if license_file_path:
+            arguments.append("--override-licenses")
+            arguments.append(license_file_path)
     else:
         # Handle license file for other modes
         license_file = _get_license_file_from_toolchain(ctx)
@@ -216,15 +296,7 @@ def _coco_startup_args(ctx, package, is_test):
             arguments.append("--override-licenses")
             arguments.append(_runtime_path(license_file, is_test))
     if package:
-        # Support both CocoPackageInfo providers (targets) and structs with the same fields
-        if hasattr(package, "package_file"):
-            # It's a struct
-            package_file = package.package_file
-            dep_package_files = package.dep_package_files
-        else:
-            # It's a target with CocoPackageInfo provider
-            package_file = package[CocoPackageInfo].package_file
-            dep_package_files = package[CocoPackageInfo].dep_package_files
+        package_file, dep_package_files = _package_fields(package)
         arguments += [
             "--package",
             _runtime_dirname(package_file, is_test),
@@ -233,6 +305,65 @@ def _coco_startup_args(ctx, package, is_test):
             arguments += ["--import-path", _runtime_dirname(dep_file, is_test)]
     return arguments
 
+def _package_fields(package):
+    """Returns the package_file and dep_package_files of a coco_package target or a struct with those fields."""
+    if hasattr(package, "package_file"):
+        # It's a struct
+        return package.package_file, package.dep_package_files
+
+    # It's a target with CocoPackageInfo provider
+    return package[CocoPackageInfo].package_file, package[CocoPackageInfo].dep_package_files
+
+def _package_dir(file):
+    """map_each callback giving the directory of a Coco.toml, as passed to --package and --import-path."""
+    return _runtime_dirname(file, False)
+
+# Prefix of the single argument that replaces a popili command line moved to a
+# param file. popili does not read @file arguments, so the action scripts expand it
+# (see _param_file_lines).
+_PARAM_FILE_FLAG = "--popili-params="
+
+def _param_file_lines():
+    """Bash lines that replace a lone _PARAM_FILE_FLAG argument with the lines of its param file."""
+    return [
+        "if [[ $# -eq 1 && \"$1\" == %s* ]]; then" % _PARAM_FILE_FLAG,
+        "  params=()",
+        "  while IFS= read -r arg || [[ -n \"$arg\" ]]; do",
+        "    params+=(\"$arg\")",
+        "  done < \"${1#%s}\"" % _PARAM_FILE_FLAG,
+        "  set -- \"${params[@]}\"",
+        "fi",
+    ]
+
+def _coco_args(ctx, package, arguments):
+    """Builds the popili command line of a build action.
+
+    Unlike _coco_startup_args, the --import-path list is only expanded from
+    dep_package_files when the action executes, so analysis does not flatten the
+    dependency depset of every action. Except on Windows, a command line exceeding
+    the platform's limit moves to a param file, which the action's script must
+    expand with _param_file_lines before running popili.
+
+    Args:
+        ctx: Rule context
+        package: As for _coco_startup_args
+        arguments: Command arguments following the startup arguments
+
+    Returns:
+        An Args object
+    """
+    args = ctx.actions.args()
+    args.add_all(_coco_startup_args(ctx, None, False))
+    if package:
+        package_file, dep_package_files = _package_fields(package)
+        args.add("--package", _package_dir(package_file))
+        args.add_all(dep_package_files, before_each = "--import-path", map_each = _package_dir)
+    args.add_all(arguments)
+    if not _is_windows(ctx):
+        args.use_param_file(_PARAM_FILE_FLAG + "%s")
+        args.set_param_file_format("multiline")
+    return args
+
 def _get_license_source(ctx):
     cli_license_source = ctx.attr._license_source[BuildSettingInfo].value
     if cli_license_source:
@@ -255,6 +386,16 @@ def _get_auth_token_path(ctx):
         return toolchain_auth_token_path
     return ""
 
+def _get_license_file_path(ctx):
+    """Get the license file path from CLI flag or toolchain.
+
+    Returns the path string (not a File object) for use with action_license_file licensing mode.
+    """
+    cli_license_file_path = ctx.attr._license_file_path[BuildSettingInfo].value
+    if cli_license_file_path:
+        return cli_license_file_path
+    return ctx.toolchains[COCO_TOOLCHAIN_TYPE].license_file_path
+
 def _get_license_file_from_toolchain(ctx):
     """Get the appropriate license file based on license_source.
 
@@ -282,19 +423,34 @@ def _coco_env(ctx):
 
     return env
 
-def _coco_runfiles(ctx, package, is_test):
+def _coco_runfiles(ctx, package, is_test, include_test_srcs = False):
+    """The files popili needs to run on a package.
+
+    Args:
+        ctx: Rule context
+        package: The coco_package target, or None
+        is_test: Whether popili runs from a test (or `bazel run`) rather than an action,
+            so popili itself is included
+        include_test_srcs: Whether to include the package's test sources. Only runs that
+            produce test outputs or verify the package need them, so that editing a test
+            source does not rerun the rest.
+    """
     direct = [
         ctx.toolchains[COCO_TOOLCHAIN_TYPE].preferences_file,
     ]
     transitive = []
     if is_test:
         direct.append(ctx.toolchains[COCO_TOOLCHAIN_TYPE].coco)
+        if _popili_profiler(ctx):
+            transitive.append(ctx.attr._popili_profiler[DefaultInfo].default_runfiles.files)
     license_file = _get_license_file_from_toolchain(ctx)
     if license_file:
         direct.append(license_file)
     if package:
         direct.append(package[CocoPackageInfo].package_file)
         transitive.append(package[CocoPackageInfo].srcs)
+        if include_test_srcs:
+            transitive.append(package[CocoPackageInfo].test_srcs)
         transitive.append(package[CocoPackageInfo].dep_package_files)
         transitive.append(package[CocoPackageInfo].workspace_files)
 
@@ -306,19 +462,217 @@ def _coco_runfiles(ctx, package, is_test):
         transitive = transitive,
     )
 
-def _run_coco(ctx, package, verb, mnemonic, arguments, outputs):
+def _popili_profiler(ctx):
+    """Returns the profiler selected by --@rules_coco//:profile, or None if profiling is disabled."""
+    if not hasattr(ctx.attr, "_popili_profiler"):
+        return None
+    profiler = ctx.attr._popili_profiler[DefaultInfo].files_to_run
+    return profiler if profiler.executable else None
+
+def _resource_class(ctx, package):
+    """Returns the resource class of the popili runs of a target, or None if it has no resources attr.
+
+    Args:
+        ctx: Rule context
+        package: The coco_package target popili runs on
+    """
+    if not hasattr(ctx.attr, "resources"):
+        return None
+    if ctx.attr.resources != "auto":
+        return _RESOURCE_CLASSES[ctx.attr.resources]
+    info = package[CocoPackageInfo]
+    count = len(info.direct_srcs.to_list()) + len(info.direct_test_srcs.to_list())
+    for limit, name in _AUTO_RESOURCE_CLASS_LIMITS:
+        if count <= limit:
+            return _RESOURCE_CLASSES[name]
+    return _RESOURCE_CLASSES["xlarge"]
+
+def _with_thread_args(ctx, resources, arguments):
+    """Adds the popili thread count to a command under --@rules_coco//:popili_threads.
+
+    Args:
+        ctx: Rule context
+        resources: The resource class from _resource_class, or None
+        arguments: popili command arguments, starting with the command
+
+    Returns:
+        The arguments, with `--threads` set to the reserved CPUs after the command
+    """
+    if not resources or not ctx.attr._popili_threads[BuildSettingInfo].value:
+        return arguments
+    return arguments[:1] + ["--threads", str(resources.cpu)] + arguments[1:]
+
+def _run_profiled(ctx, profiler, executable, tools, mnemonic, progress_message, inputs, outputs, arguments, env = None, unused_inputs_list = None, resource_set = None):
+    """Run an executable under the profiler, recording its cost in an extra JSON output.
+
+    The inputs are passed to the profiler in a param file, so they are only
+    counted when the action runs rather than flattened during analysis.
+
+    Returns:
+        The profile file, which records the wall time, peak RSS and input count of the action
+    """
+    profile = ctx.actions.declare_file("%s.profile/%s.json" % (ctx.label.name, outputs[0].short_path))
+    profile_inputs = ctx.actions.args()
+    profile_inputs.add_all(inputs)
+    profile_inputs.use_param_file("--inputs-file=%s", use_always = True)
+    profile_inputs.set_param_file_format("multiline")
+    ctx.actions.run(
+        executable = profiler,
+        tools = tools,
+        env = env,
+        mnemonic = mnemonic,
+        progress_message = progress_message,
+        inputs = inputs,
+        outputs = outputs + [profile],
+        unused_inputs_list = unused_inputs_list,
+        resource_set = resource_set,
+        arguments = [
+            "run",
+            "--output",
+            profile.path,
+            "--label",
+            str(ctx.label),
+            "--mnemonic",
+            mnemonic,
+            profile_inputs,
+            "--",
+            executable.path,
+        ] + arguments,
+    )
+    return profile
+
+def _coco_source_path(file):
+    """map_each callback keeping only .coco files."""
+    return file.path if file.extension == "coco" else None
+
+def _prune_unused_inputs(ctx):
+    """Returns whether popili actions should report the .coco inputs they did not read.
+
+    Pruning is controlled by --@rules_coco//:prune_unused_inputs and is not
+    available on Windows, whose actions run popili from a batch file.
+    """
+    if not hasattr(ctx.attr, "_prune_unused_inputs") or _is_windows(ctx):
+        return False
+    return ctx.attr._prune_unused_inputs[BuildSettingInfo].value
+
+def _pruning_args(ctx, roots, inputs, unused_inputs):
+    """The pruning manifest of a popili action, passed as a param file.
+
+    The first line is the path of the unused_inputs_list to write, followed by a
+    `root <path>` line for each .coco file popili is asked to process and an
+    `input <path>` line for each .coco input of the action.
+
+    Args:
+        ctx: Rule context
+        roots: depset of the .coco files popili is asked to process
+        inputs: depset of the action's inputs; only .coco files are listed
+        unused_inputs: The unused_inputs_list file to write
+
+    Returns:
+        An Args object
+    """
+    args = ctx.actions.args()
+    args.add(unused_inputs)
+    args.add_all(roots, format_each = "root %s")
+    args.add_all(inputs, map_each = _coco_source_path, format_each = "input %s")
+    args.use_param_file("%s", use_always = True)
+    args.set_param_file_format("multiline")
+    return args
+
+def _unused_inputs_lines(ctx, manifest):
+    """Bash lines that write the unused_inputs_list described by a pruning manifest.
+
+    The lines run unused_inputs.awk, which must be among the action's tools.
+
+    Args:
+        ctx: Rule context
+        manifest: Shell expression for the path of the manifest from _pruning_args
+    """
+    return [
+        "awk -f \"%s\" \"%s\" > \"$(head -n 1 \"%s\")\"" % (ctx.file._unused_inputs_awk.path, manifest, manifest),
+    ]
+
+def _package_output_path(ctx, file):
+    """The path of an output of ctx's rule relative to the rule's package, for naming outputs derived from it."""
+    return paths.relativize(file.path, paths.join(ctx.bin_dir.path, ctx.label.workspace_root, ctx.label.package))
+
+def _run_coco(ctx, package, verb, mnemonic, arguments, outputs, prune_roots = None, include_test_srcs = False):
+    """Run a popili command for a package.
+
+    Args:
+        ctx: Rule context
+        package: The coco_package target
+        verb: Progress message verb
+        mnemonic: Action mnemonic
+        arguments: popili command arguments
+        outputs: Files popili generates
+        prune_roots: depset of the .coco files popili processes, including any test
+            sources. When set (and --@rules_coco//:prune_unused_inputs is on), the
+            action reports the .coco inputs not reachable from them through imports
+            as unused, so changes to those files do not rerun it.
+        include_test_srcs: Whether popili also reads the package's test sources, as
+            for commands that write test outputs or verify the package
+
+    Returns:
+        The action's profile file when --@rules_coco//:profile is set, otherwise None
+    """
+    coco = ctx.toolchains[COCO_TOOLCHAIN_TYPE].coco
+    profiler = _popili_profiler(ctx)
+    inputs = _coco_runfiles(ctx, package, False, include_test_srcs)
+    resources = _resource_class(ctx, package)
+    resource_set = resources.resource_set if resources else None
+    arguments = [_coco_args(ctx, package, _with_thread_args(ctx, resources, arguments))]
+
+    # Outside Windows popili runs from a script, which expands the param file of a
+    # long command line and writes any unused_inputs_list
+    executable = coco
+    tools = [coco]
+    unused_inputs = None
+    if not _is_windows(ctx):
+        name = "%s.popili/%s" % (ctx.label.name, _package_output_path(ctx, outputs[0]))
+        script_lines = ["#!/bin/bash", "set -e"]
+        if prune_roots != None and _prune_unused_inputs(ctx):
+            unused_inputs = ctx.actions.declare_file(name + ".unused")
+            arguments = [_pruning_args(ctx, prune_roots, inputs, unused_inputs)] + arguments
+            tools.append(ctx.file._unused_inputs_awk)
+            script_lines += ["manifest=\"$1\"", "shift"]
+        script_lines += _param_file_lines()
+        script_lines.append("%s \"$@\"" % coco.path)
+        if unused_inputs:
+            script_lines += _unused_inputs_lines(ctx, "$manifest")
+        executable = ctx.actions.declare_file(name + ".sh")
+        ctx.actions.write(output = executable, content = "\n".join(script_lines), is_executable = True)
+        tools.append(executable)
+
+    if profiler:
+        return _run_profiled(
+            ctx,
+            profiler,
+            executable = executable,
+            tools = tools,
+            env = _coco_env(ctx),
+            mnemonic = mnemonic,
+            progress_message = "%s %s" % (verb, package[CocoPackageInfo].name),
+            inputs = inputs,
+            outputs = outputs,
+            arguments = arguments,
+            unused_inputs_list = unused_inputs,
+            resource_set = resource_set,
+        )
+
     ctx.actions.run(
-        executable = ctx.toolchains[COCO_TOOLCHAIN_TYPE].coco,
-        tools = [
-            ctx.toolchains[COCO_TOOLCHAIN_TYPE].coco,
-        ],
+        executable = executable,
+        tools = tools,
         env = _coco_env(ctx),
         mnemonic = mnemonic,
         progress_message = "%s %s" % (verb, package[CocoPackageInfo].name),
-        inputs = _coco_runfiles(ctx, package, False),
+        inputs = inputs,
         outputs = outputs,
-        arguments = _coco_startup_args(ctx, package, False) + arguments,
+        arguments = arguments,
+        unused_inputs_list = unused_inputs,
+        resource_set = resource_set,
     )
+    return None
 
 WINDOWS_CONSTRAINT_ATTR = attr.label(default = "@platforms//os:windows")
 
@@ -328,13 +682,74 @@ def _is_windows(ctx):
         ctx.attr._windows_constraint[platform_common.ConstraintValueInfo],
     )
 
-def _create_coco_wrapper_script(ctx, package, arguments):
+# A valid, empty JUnit report for test shards that have nothing to run.
+_EMPTY_JUNIT = "<?xml version=\"1.0\" encoding=\"UTF-8\"?><testsuites></testsuites>"
+
+def _shard_selection_lines(shard_targets):
+    """Bash lines that pick this test shard's share of shard_targets into `selected`.
+
+    Targets are assigned round-robin by their (sorted) index, so the split is
+    deterministic for a given shard count. Shards left with nothing to do write
+    an empty JUnit report and exit successfully. Without sharding every target is
+    selected.
+    """
+    lines = ["shard_targets=("]
+    for target in shard_targets:
+        lines.append("  \"%s\"" % target)
+    lines += [
+        ")",
+        "selected=(\"${shard_targets[@]}\")",
+        "if [[ -n \"${TEST_TOTAL_SHARDS:-}\" ]]; then",
+        "  touch \"${TEST_SHARD_STATUS_FILE}\"",
+        "  selected=()",
+        "  for i in \"${!shard_targets[@]}\"; do",
+        "    if (( i % TEST_TOTAL_SHARDS == TEST_SHARD_INDEX )); then",
+        "      selected+=(\"${shard_targets[$i]}\")",
+        "    fi",
+        "  done",
+        "  if (( ${#selected[@]} == 0 )); then",
+        "    echo '%s' > \"${XML_OUTPUT_FILE}\"" % _EMPTY_JUNIT,
+        "    exit 0",
+        "  fi",
+        "fi",
+    ]
+    return lines
+
+def _first_shard_lines():
+    """Bash lines that run everything on the first test shard and nothing on the others."""
+    return [
+        "if [[ -n \"${TEST_TOTAL_SHARDS:-}\" ]]; then",
+        "  touch \"${TEST_SHARD_STATUS_FILE}\"",
+        "  if (( TEST_SHARD_INDEX != 0 )); then",
+        "    echo '%s' > \"${XML_OUTPUT_FILE}\"" % _EMPTY_JUNIT,
+        "    exit 0",
+        "  fi",
+        "fi",
+    ]
+
+def _windows_shard_selection_lines():
+    """Batch lines that run everything on the first test shard and nothing on the others."""
+    return [
+        "IF DEFINED TEST_TOTAL_SHARDS (",
+        "  type nul > \"%TEST_SHARD_STATUS_FILE%\"",
+        "  IF NOT \"%TEST_SHARD_INDEX%\"==\"0\" (",
+        "    echo ^<?xml version=\"1.0\" encoding=\"UTF-8\"?^>^<testsuites^>^</testsuites^> > \"%XML_OUTPUT_FILE%\"",
+        "    exit /b 0",
+        "  )",
+        ")",
+    ]
+
+def _create_coco_wrapper_script(ctx, package, arguments, shard_targets = None):
     """Creates a platform-specific wrapper script for running Coco commands.
 
     Args:
         ctx: The rule context
         package: The coco_package target (or None)
         arguments: List of command arguments (after startup args)
+        shard_targets: Optional list of popili targets to split across test shards.
+            When the test is sharded, each shard passes its share of these to popili;
+            if the list is empty (or on Windows), the first shard runs the whole
+            command and the others do nothing.
 
     Returns:
         The wrapper script file
@@ -346,6 +761,24 @@ def _create_coco_wrapper_script(ctx, package, arguments):
 
     # Build the full command
     full_arguments = [coco_path] + _coco_startup_args(ctx, package, True) + arguments
+    profiler = _popili_profiler(ctx)
+    if profiler:
+        profiler_path = profiler.executable.short_path
+        profile_path = "${TEST_UNDECLARED_OUTPUTS_DIR}/popili_profile.json"
+        if is_windows:
+            profiler_path = profiler_path.replace("/", "\\")
+            profile_path = "%TEST_UNDECLARED_OUTPUTS_DIR%\\popili_profile.json"
+        full_arguments = [
+            profiler_path,
+            "run",
+            "--output",
+            "\"%s\"" % profile_path,
+            "--label",
+            str(ctx.label),
+            "--mnemonic",
+            "CocoTest",
+            "--",
+        ] + full_arguments
     command = " ".join(full_arguments)
     env = _coco_env(ctx)
 
@@ -353,16 +786,22 @@ def _create_coco_wrapper_script(ctx, package, arguments):
     if is_windows:
         wrapper_script = ctx.actions.declare_file(ctx.label.name + "-cmd.bat")
         wrapper_lines = []
+        if shard_targets != None:
+            wrapper_lines += _windows_shard_selection_lines()
+            command += "".join([" \"%s\"" % target for target in shard_targets])
         for k, v in env.items():
             wrapper_lines.append("SET %s=\"%s\"" % (k, v))
         wrapper_lines.append("")
         wrapper_lines.append(command)
     else:
         wrapper_script = ctx.actions.declare_file(ctx.label.name + "-cmd.sh")
-        wrapper_lines = [
-            "#!/usr/bin/env bash",
-            "exec env \\",
-        ]
+        wrapper_lines = ["#!/usr/bin/env bash"]
+        if shard_targets:
+            wrapper_lines += _shard_selection_lines(shard_targets)
+            command += " \"${selected[@]}\""
+        elif shard_targets != None:
+            wrapper_lines += _first_shard_lines()
+        wrapper_lines.append("exec env \\")
         for k, v in env.items():
             wrapper_lines.append("  %s=\"%s\" \\" % (k, v))
         wrapper_lines.append(command)
@@ -389,20 +828,18 @@ def _run_typecheck(ctx, package, srcs, test_srcs):
 
     Args:
         ctx: Rule context
-        package: Struct with package_file and dep_package_files fields
-        srcs: Source files depset
-        test_srcs: Test source files depset
+        package: Struct with package_file, dep_package_files and workspace_files fields
+        srcs: Source files depset, including those of transitive dependencies
+        test_srcs: This package's test source files depset
 
     Returns:
-        The typecheck marker file
+        A tuple of the typecheck marker file and the action's profile file (or None
+        unless --@rules_coco//:profile is set)
     """
 
     # Create a marker file to track typecheck completion
     marker = ctx.actions.declare_file(ctx.label.name + ".typecheck")
 
-    # Build startup arguments using the shared function
-    startup_arguments = _coco_startup_args(ctx, package = package, is_test = False)
-
     # Build typecheck command arguments
     typecheck_arguments = ["typecheck"]
 
@@ -415,43 +852,134 @@ def _run_typecheck(ctx, package, srcs, test_srcs):
     if license_file:
         inputs_direct.append(license_file)
 
-    # Create wrapper script that runs typecheck and creates marker on success
+    inputs = depset(direct = inputs_direct, transitive = [srcs, test_srcs, package.dep_package_files, package.workspace_files])
+
+    # Create wrapper script that runs typecheck and creates marker on success. The
+    # popili arguments are passed to the script rather than written into it, so they
+    # can be expanded lazily.
     coco_path = ctx.toolchains[COCO_TOOLCHAIN_TYPE].coco.path
     is_windows = _is_windows(ctx)
     if is_windows:
         coco_path = coco_path.replace("/", "\\")
 
-    command = " ".join([coco_path] + startup_arguments + typecheck_arguments)
+    arguments = [_coco_args(ctx, package, typecheck_arguments)]
     env = _coco_env(ctx)
+    unused_inputs = None
+    if _prune_unused_inputs(ctx):
+        unused_inputs = ctx.actions.declare_file(ctx.label.name + ".typecheck.unused")
+        arguments = [_pruning_args(ctx, depset(transitive = [srcs, test_srcs]), inputs, unused_inputs)] + arguments
 
     if is_windows:
         script = ctx.actions.declare_file(ctx.label.name + "_typecheck.bat")
         script_lines = ["@echo off"]
         for k, v in env.items():
             script_lines.append("SET %s=\"%s\"" % (k, v))
-        script_lines.append("%s || exit /b 1" % command)
+        script_lines.append("%s %%* || exit /b 1" % coco_path)
         script_lines.append("type nul > \"%s\"" % marker.path.replace("/", "\\"))
     else:
         script = ctx.actions.declare_file(ctx.label.name + "_typecheck.sh")
         script_lines = ["#!/bin/bash", "set -e"]
         for k, v in env.items():
             script_lines.append("export %s=\"%s\"" % (k, v))
-        script_lines.append(command)
+        if unused_inputs:
+            script_lines += ["manifest=\"$1\"", "shift"]
+        script_lines += _param_file_lines()
+        script_lines.append("%s \"$@\"" % coco_path)
+        if unused_inputs:
+            script_lines += _unused_inputs_lines(ctx, "$manifest")
         script_lines.append("touch \"%s\"" % marker.path)
 
     ctx.actions.write(output = script, content = "\n".join(script_lines), is_executable = True)
+    tools = [ctx.toolchains[COCO_TOOLCHAIN_TYPE].coco, script]
+    if unused_inputs:
+        tools.append(ctx.file._unused_inputs_awk)
+
+    profiler = _popili_profiler(ctx)
+    if profiler:
+        profile = _run_profiled(
+            ctx,
+            profiler,
+            executable = script,
+            tools = tools,
+            mnemonic = "CocoTypecheck",
+            progress_message = "Typechecking %s" % ctx.label.name,
+            inputs = inputs,
+            outputs = [marker],
+            arguments = arguments,
+            unused_inputs_list = unused_inputs,
+        )
+        return marker, profile
 
     ctx.actions.run(
         executable = script,
-        tools = [ctx.toolchains[COCO_TOOLCHAIN_TYPE].coco, script],
+        tools = tools,
         mnemonic = "CocoTypecheck",
         progress_message = "Typechecking %s" % ctx.label.name,
-        inputs = depset(direct = inputs_direct, transitive = [srcs, test_srcs, package.dep_package_files, package.workspace_files]),
+        inputs = inputs,
         outputs = [marker],
-        arguments = [],
+        arguments = arguments,
+        unused_inputs_list = unused_inputs,
     )
 
-    return marker
+    return marker, None
+
+def _run_format_checks(ctx, package, files):
+    """Check the formatting of each file in its own action, for the _validation output group.
+
+    Each check only depends on its file and the package's manifests, so unchanged
+    files are cached and the checks run in parallel with the rest of the build.
+
+    Args:
+        ctx: Rule context
+        package: Struct with package_file, dep_package_files and workspace_files fields
+        files: The .coco files to check
+
+    Returns:
+        A list of marker files, one per checked file
+    """
+    coco_path = ctx.toolchains[COCO_TOOLCHAIN_TYPE].coco.path
+    is_windows = _is_windows(ctx)
+    if is_windows:
+        script = ctx.actions.declare_file(ctx.label.name + "_format_check.bat")
+        script_lines = [
+            "@echo off",
+            "%s %%* || (echo %%COCO_FORMAT_FILE%% is not correctly formatted; run popili format on it 1>&2 & exit /b 1)" % coco_path.replace("/", "\\"),
+            "type nul > \"%COCO_FORMAT_MARKER%\"",
+        ]
+    else:
+        script = ctx.actions.declare_file(ctx.label.name + "_format_check.sh")
+        script_lines = ["#!/bin/bash"] + _param_file_lines() + [
+            "if ! %s \"$@\"; then" % coco_path,
+            "  echo \"$COCO_FORMAT_FILE is not correctly formatted; run popili format on it\" >&2",
+            "  exit 1",
+            "fi",
+            "touch \"$COCO_FORMAT_MARKER\"",
+        ]
+    ctx.actions.write(output = script, content = "\n".join(script_lines), is_executable = True)
+
+    license_file = _get_license_file_from_toolchain(ctx)
+    common_inputs = [package.package_file, ctx.toolchains[COCO_TOOLCHAIN_TYPE].preferences_file]
+    if license_file:
+        common_inputs.append(license_file)
+
+    markers = []
+    for file in files:
+        marker = ctx.actions.declare_file("%s.format/%s.ok" % (ctx.label.name, file.short_path))
+        env = dict(_coco_env(ctx))
+        env["COCO_FORMAT_FILE"] = file.short_path
+        env["COCO_FORMAT_MARKER"] = marker.path.replace("/", "\\") if is_windows else marker.path
+        ctx.actions.run(
+            executable = script,
+            tools = [ctx.toolchains[COCO_TOOLCHAIN_TYPE].coco],
+            env = env,
+            mnemonic = "CocoFormatCheck",
+            progress_message = "Checking formatting of %s" % file.short_path,
+            inputs = depset(direct = common_inputs + [file], transitive = [package.dep_package_files, package.workspace_files]),
+            outputs = [marker],
+            arguments = [_coco_args(ctx, package, ["format", "--verify", file.path])],
+        )
+        markers.append(marker)
+    return markers
 
 def _require_coco_toml(file, attr):
     if file.basename != "Coco.toml":
@@ -468,10 +996,9 @@ def _coco_package_impl(ctx):
         direct = ctx.files.srcs,
         transitive = [dep[CocoPackageInfo].srcs for dep in ctx.attr.deps],
     )
-    test_srcs = depset(
-        direct = ctx.files.test_srcs,
-        transitive = [dep[CocoPackageInfo].test_srcs for dep in ctx.attr.deps],
-    )
+
+    # Test sources are not visible to dependents, so they are not collected from deps
+    test_srcs = depset(ctx.files.test_srcs)
 
     # Workspace Coco.toml files for this package and its deps, so popili can resolve inherited settings
     workspace_transitive = [dep[CocoPackageInfo].workspace_files for dep in ctx.attr.deps]
@@ -481,16 +1008,35 @@ def _coco_package_impl(ctx):
 
     # Conditionally run typecheck
     typecheck_marker = None
+    typecheck_profile = None
     if ctx.attr.typecheck:
         package_struct = struct(
             package_file = package_file,
             dep_package_files = dep_package_files,
             workspace_files = workspace_files,
         )
-        typecheck_marker = _run_typecheck(ctx, package_struct, srcs, test_srcs)
+        typecheck_marker, typecheck_profile = _run_typecheck(ctx, package_struct, srcs, test_srcs)
+
+    # As a validation, typecheck runs alongside (rather than before) code generation
+    validation_markers = []
+    if typecheck_marker and ctx.attr._typecheck_validation[BuildSettingInfo].value:
+        validation_markers.append(typecheck_marker)
+        typecheck_marker = None
+
+    format_markers = []
+    if ctx.attr.format_check:
+        format_markers = _run_format_checks(
+            ctx,
+            struct(
+                package_file = package_file,
+                dep_package_files = dep_package_files,
+                workspace_files = workspace_files,
+            ),
+            ctx.files.srcs + ctx.files.test_srcs,
+        )
 
     # Build the list of files for DefaultInfo
-    default_files_direct = [package_file]
+    default_files_direct = [package_file] + validation_markers
     if typecheck_marker:
         default_files_direct.append(typecheck_marker)
 
@@ -500,22 +1046,32 @@ def _coco_package_impl(ctx):
             package_file = package_file,
             dep_package_files = dep_package_files,
             direct_srcs = depset(ctx.files.srcs),
-            direct_test_srcs = depset(ctx.files.test_srcs),
+            direct_test_srcs = test_srcs,
             srcs = srcs,
             test_srcs = test_srcs,
             typecheck_marker = typecheck_marker,
             workspace_files = workspace_files,
         ),
         DefaultInfo(files = depset(direct = default_files_direct, transitive = [srcs, test_srcs, dep_package_files, workspace_files])),
+        OutputGroupInfo(
+            coco_profile = depset([typecheck_profile] if typecheck_profile else []),
+            _validation = depset(validation_markers + format_markers),
+        ),
     ]
 
 _coco_package = rule(
     implementation = _coco_package_impl,
-    attrs = dict(LICENSE_ATTRIBUTES.items() + {
+    attrs = dict(LICENSE_ATTRIBUTES.items() + POPILI_PROFILER_ATTRIBUTES.items() + PRUNE_UNUSED_INPUTS_ATTRIBUTES.items() + {
         "deps": attr.label_list(
             providers = [CocoPackageInfo],
             doc = "Other coco_package targets this package depends on.",
         ),
+        "format_check": attr.bool(
+            default = False,
+            doc = "Check the formatting of each source file (as `popili format --verify` would) in its own " +
+                  "validation action, so any build of this package fails on a badly formatted file and names " +
+                  "it. Unchanged files are not rechecked. Disabled by default.",
+        ),
         "package": attr.label(
             mandatory = True,
             allow_single_file = [".toml"],
@@ -534,12 +1090,14 @@ _coco_package = rule(
         "typecheck": attr.bool(
             default = False,
             doc = "Run typecheck validation during package creation. When enabled, " +
-                  "the build fails if typecheck errors are found. Disabled by default.",
+                  "the build fails if typecheck errors are found. Code generation waits for " +
+                  "typecheck unless --@rules_coco//:typecheck_validation is set. Disabled by default.",
         ),
         "workspace": attr.label(
             providers = [CocoWorkspaceInfo],
             doc = "Optional coco_workspace whose Coco.toml settings this package inherits.",
         ),
+        "_typecheck_validation": attr.label(default = Label("//:typecheck_validation")),
         "_windows_constraint": WINDOWS_CONSTRAINT_ATTR,
     }.items()),
     toolchains = [
@@ -612,7 +1170,67 @@ packages. Reference this target from a coco_package's `workspace` attribute.""",
     implementation = _coco_workspace_macro_impl,
 )
 
+def _create_verification_report_script(ctx, junit):
+    """Creates a test script that reports previously computed verification results.
+
+    The JUnit report is copied to the test's XML output, and the test fails if it
+    records any failure or error.
+
+    Args:
+        ctx: The rule context
+        junit: The JUnit report produced by a coco_verification target
+
+    Returns:
+        The report script file
+    """
+    if _is_windows(ctx):
+        results = junit.short_path.replace("/", "\\")
+        script = ctx.actions.declare_file(ctx.label.name + "-report.bat")
+        lines = [
+            "copy /Y \"%s\" \"%%XML_OUTPUT_FILE%%\" > nul" % results,
+            "findstr /C:\"<failure\" /C:\"<error\" \"%s\" > nul" % results,
+            "IF %ERRORLEVEL% EQU 0 (",
+            "  type \"%s\"" % results,
+            "  exit /b 1",
+            ")",
+            "exit /b 0",
+        ]
+    else:
+        script = ctx.actions.declare_file(ctx.label.name + "-report.sh")
+        lines = [
+            "#!/usr/bin/env bash",
+            "results=\"%s\"" % junit.short_path,
+            "cp \"${results}\" \"${XML_OUTPUT_FILE}\"",
+            "if grep -q -E '<(failure|error)[ />]' \"${results}\"; then",
+            "  cat \"${results}\"",
+            "  exit 1",
+            "fi",
+        ]
+
+    ctx.actions.write(
+        output = script,
+        content = "\n".join(lines),
+        is_executable = True,
+    )
+
+    return script
+
 def _coco_package_verify(ctx):
+    if ctx.attr.verification:
+        if ctx.attr.package:
+            fail("Only one of package and verification may be set on %s" % ctx.label)
+        if ctx.attr.targets:
+            fail("targets cannot be set with verification, whose results cover the whole package", attr = "targets")
+
+        # Report the results of a verification run that was executed (and cached) as a build action
+        junit = ctx.attr.verification[CocoVerificationInfo].junit
+        return DefaultInfo(
+            executable = _create_verification_report_script(ctx, junit),
+            runfiles = ctx.runfiles(files = [junit]),
+        )
+    if not ctx.attr.package:
+        fail("One of package or verification must be set on %s" % ctx.label)
+
     # Build the verify command arguments
     arguments = [
         "verify",
@@ -624,21 +1242,40 @@ def _coco_package_verify(ctx):
     if backend != "":
         arguments.append("--backend")
         arguments.append(backend)
+    resources = _resource_class(ctx, ctx.attr.package)
+    arguments = _with_thread_args(ctx, resources, arguments)
 
-    wrapper_script = _create_coco_wrapper_script(ctx, ctx.attr.package, arguments)
+    # When shard_count is set, each shard verifies its share of the targets
+    wrapper_script = _create_coco_wrapper_script(ctx, ctx.attr.package, arguments, shard_targets = sorted(ctx.attr.targets))
 
-    return DefaultInfo(
-        executable = wrapper_script,
-        runfiles = ctx.runfiles(transitive_files = _coco_runfiles(ctx, ctx.attr.package, True)),
-    )
+    return [
+        DefaultInfo(
+            executable = wrapper_script,
+            runfiles = ctx.runfiles(transitive_files = _coco_runfiles(ctx, ctx.attr.package, True, include_test_srcs = True)),
+        ),
+        # Reserves the CPUs of the resource class, as a `cpu:<n>` tag would
+        testing.ExecutionInfo({"cpu:%d" % resources.cpu: ""}),
+    ]
 
 _coco_verify_test = rule(
     implementation = _coco_package_verify,
-    attrs = dict(LICENSE_ATTRIBUTES.items() + {
+    attrs = dict(LICENSE_ATTRIBUTES.items() + POPILI_TEST_PROFILER_ATTRIBUTES.items() + RESOURCE_ATTRIBUTES.items() + {
         "package": attr.label(
             providers = [CocoPackageInfo],
-            mandatory = True,
-            doc = "The coco_package target to verify.",
+            doc = "The coco_package target to verify. Exactly one of package and verification must be set.",
+        ),
+        "targets": attr.string_list(
+            default = [],
+            doc = "Fully qualified names of the declarations to verify (e.g. \"MyComponent\"), passed to " +
+                  "`popili verify`. If empty, the whole package is verified. When the test is sharded with " +
+                  "shard_count, the targets are split deterministically between the shards, each of which " +
+                  "verifies its own targets and writes its own JUnit report. Without targets, and always on " +
+                  "Windows, the first shard verifies everything and the other shards do nothing.",
+        ),
+        "verification": attr.label(
+            providers = [CocoVerificationInfo],
+            doc = "A coco_verification target whose results to report instead of running popili in the " +
+                  "test. Exactly one of package and verification must be set.",
         ),
         "_verification_backend": attr.label(default = Label("//:verification_backend")),
         "_windows_constraint": WINDOWS_CONSTRAINT_ATTR,
@@ -660,7 +1297,9 @@ coco_verify_test = macro(
     doc = """Creates a test that runs Coco verification on a package.
 
 Executes `popili verify` on the specified coco_package, failing the test if
-verification does not pass.""",
+verification does not pass. Alternatively, reports the results of a
+coco_verification target, so verification runs once as a cacheable build action
+that the test and counterexample diagrams share.""",
     inherit_attrs = _coco_verify_test,
     implementation = _coco_verify_test_macro_impl,
 )
@@ -935,6 +1574,69 @@ def _output_directory(package_dir, srcs):
             root_output_dir = paths.dirname(relative_to_package)
     return root_output_dir
 
+def _package_relative_output(ctx, package_dir, output_dir, attr):
+    """The path of output_dir within package_dir, relative to the BUILD file declaring it."""
+    if not output_dir:
+        fail("output_mode = \"directory\" needs the sources of %s to be in a subdirectory of its Coco.toml" % package_dir, attr = attr)
+    path = paths.join(package_dir, output_dir)
+    return paths.relativize(path, ctx.label.package) if ctx.label.package else path
+
+def _directories_overlap(a, b):
+    return a == b or a.startswith(b + "/") or b.startswith(a + "/")
+
+def _generate_directories(ctx, package, package_dir, root_output_dir, test_root_output_dir, prune_roots):
+    """Generates C or C++ code into one tree artifact per output root.
+
+    Implements output_mode = "directory": popili's outputs are not predicted in
+    Starlark, so popili does not have to write empty files either. Test code and
+    mocks go into a tree of their own, as production libraries must not compile
+    them; when they would share (or nest in) the production root they are written
+    to `<root>.tst` instead.
+    """
+    if ctx.attr.language not in ("cpp", "c"):
+        fail("output_mode = \"directory\" is only supported for the C and C++ generators", attr = "output_mode")
+
+    output = ctx.actions.declare_directory(_package_relative_output(ctx, package_dir, root_output_dir, "output_mode"))
+    arguments = [
+        "generate-%s" % ctx.attr.language,
+        "--output",
+        output.path,
+        "--output-runtime=false",
+    ]
+
+    test_output = None
+    if package[CocoPackageInfo].direct_test_srcs or ctx.attr.mocks:
+        if _directories_overlap(test_root_output_dir, root_output_dir):
+            test_root_output_dir = root_output_dir + ".tst"
+        test_output = ctx.actions.declare_directory(_package_relative_output(ctx, package_dir, test_root_output_dir, "output_mode"))
+        arguments += ["--test-output", test_output.path]
+
+    # Make all include paths absolute within the workspace to avoid the need for includes
+    arguments += ["--include-prefix", paths.join(package_dir, root_output_dir)]
+
+    profile = _run_coco(
+        ctx = ctx,
+        package = package,
+        verb = "Generating %s" % ctx.attr.language,
+        mnemonic = "CocoGenerate",
+        arguments = arguments,
+        outputs = [output] + ([test_output] if test_output else []),
+        prune_roots = prune_roots,
+        include_test_srcs = test_output != None,
+    )
+
+    tests = depset([test_output] if test_output else [])
+    return [
+        DefaultInfo(files = depset([output])),
+        OutputGroupInfo(coco_profile = depset([profile] if profile else [])),
+        CocoCcGeneratedInfo(
+            headers = depset([output]),
+            sources = depset([output]),
+            test_headers = tests,
+            test_sources = tests,
+        ),
+    ]
+
 def _coco_package_generate_impl(ctx):
     # When using configuration transitions, ctx.attr.package becomes a list
     package = ctx.attr.package[0] if type(ctx.attr.package) == type([]) else ctx.attr.package
@@ -942,13 +1644,6 @@ def _coco_package_generate_impl(ctx):
     test_srcs = package[CocoPackageInfo].direct_test_srcs
     package_dir = package[CocoPackageInfo].package_file.dirname
 
-    headers = []
-    sources = []
-    mock_headers = []
-    mock_sources = []
-    test_headers = []
-    test_sources = []
-
     root_output_dir = _output_directory(package_dir, srcs)
     test_root_output_dir = _output_directory(package_dir, test_srcs) if test_srcs else root_output_dir
 
@@ -959,6 +1654,22 @@ def _coco_package_generate_impl(ctx):
         "csharp": ctx.attr.csharp_regenerate_packages,
     }.get(ctx.attr.language, [])
 
+    # popili reads the package's own sources (and those of any packages it
+    # regenerates) and whatever they import; other dependency sources are pruned.
+    # Test sources are read whenever the package has any, as test code is then
+    # generated.
+    prune_roots = depset(transitive = [srcs, test_srcs] + [p[CocoPackageInfo].direct_srcs for p in regenerate_pkgs])
+
+    if ctx.attr.output_mode == "directory":
+        return _generate_directories(ctx, package, package_dir, root_output_dir, test_root_output_dir, prune_roots)
+
+    headers = []
+    sources = []
+    mock_headers = []
+    mock_sources = []
+    test_headers = []
+    test_sources = []
+
     # Add outputs for regenerated packages (using current package's settings)
     # Regenerated files go into the current package's output directory
     # Compute path relative to BUILD file: from ctx.label.package to package_dir
@@ -1003,13 +1714,15 @@ def _coco_package_generate_impl(ctx):
     all_outputs = headers + sources
     all_test_outputs = test_headers + test_sources
 
-    _run_coco(
+    profile = _run_coco(
         ctx = ctx,
         package = package,
         verb = "Generating %s" % ctx.attr.language,
         mnemonic = "CocoGenerate",
         arguments = arguments,
         outputs = all_outputs + all_test_outputs,
+        prune_roots = prune_roots,
+        include_test_srcs = bool(test_srcs),
     )
 
     if ctx.attr.language in ("cpp", "c"):
@@ -1031,12 +1744,13 @@ def _coco_package_generate_impl(ctx):
         DefaultInfo(
             files = depset(all_outputs),
         ),
+        OutputGroupInfo(coco_profile = depset([profile] if profile else [])),
         lang_provider,
     ]
 
 _coco_generate = rule(
     implementation = _coco_package_generate_impl,
-    attrs = dict(LICENSE_ATTRIBUTES.items() + {
+    attrs = dict(LICENSE_ATTRIBUTES.items() + POPILI_PROFILER_ATTRIBUTES.items() + PRUNE_UNUSED_INPUTS_ATTRIBUTES.items() + RESOURCE_ATTRIBUTES.items() + {
         # C output path options
         "c_file_name_mangler": attr.string(
             default = "Unaltered",
@@ -1116,11 +1830,22 @@ _coco_generate = rule(
         "mocks": attr.bool(
             doc = "Generate mock implementations for testing. Disabled by default.",
         ),
+        "output_mode": attr.string(
+            default = "files",
+            values = ["files", "directory"],
+            doc = "How generated code is declared. \"files\" (the default) predicts and declares every " +
+                  "generated file. \"directory\" declares a single directory (tree artifact) for the " +
+                  "generated code and another for test code and mocks, which saves analysis time and memory " +
+                  "on large packages; it is only supported for C and C++, and requires " +
+                  "all headers to be public in coco_cc_library and coco_c_library. Test code and mocks " +
+                  "whose output directory would overlap the generated code go to `<dir>.tst` instead.",
+        ),
         "package": attr.label(
             providers = [CocoPackageInfo],
             mandatory = True,
             doc = "The coco_package target containing the source files to generate from.",
         ),
+        "_windows_constraint": WINDOWS_CONSTRAINT_ATTR,
     }.items()),
     toolchains = [
         COCO_TOOLCHAIN_TYPE,
@@ -1151,11 +1876,64 @@ _coco_test_outputs = rule(
 def coco_test_outputs_name(name):
     return "%s.tst" % name
 
+def _matches_file_patterns(file, patterns):
+    """Whether file matches a bare filename or a path suffix in patterns."""
+    for p in patterns:
+        if "/" in p:
+            if file.short_path.endswith(p):
+                return True
+        elif file.basename == p:
+            return True
+    return False
+
+def _unity_batches(ctx, sources):
+    """Groups sources into batch files that each #include up to unity_batch_size of them.
+
+    Sources are grouped in order of their path, so the batches only depend on the
+    set of sources. Sources matching unity_exclude, directories of generated code
+    and groups of a single source are compiled on their own.
+
+    Returns:
+        A tuple of the files to compile and the sources included by batch files.
+    """
+    batchable = []
+    compiled = []
+    for src in sources:
+        if src.is_directory or _matches_file_patterns(src, ctx.attr.unity_exclude):
+            compiled.append(src)
+        else:
+            batchable.append(src)
+    batchable = sorted(batchable, key = lambda f: f.short_path)
+
+    size = ctx.attr.unity_batch_size
+    included = []
+    for start in range(0, len(batchable), size):
+        group = batchable[start:start + size]
+        if len(group) == 1:
+            compiled.extend(group)
+            continue
+
+        # Batches are found by the exec root relative paths of the sources, which
+        # are always on the quote include path.
+        batch = ctx.actions.declare_file("{name}.unity/batch_{index}.{extension}".format(
+            name = ctx.label.name,
+            index = start // size,
+            extension = group[0].extension,
+        ))
+        ctx.actions.write(batch, "".join(['#include "%s"\n' % src.path for src in group]))
+        compiled.append(batch)
+        included.extend(group)
+    return compiled, included
+
 def _coco_cc_gen_impl(ctx):
     """Extracts generated C/C++ sources and headers, providing CcInfo for headers.
 
     Returns DefaultInfo with sources (+ private headers) for cc_library srcs,
-    and CcInfo with public headers for cc_library deps.
+    and CcInfo with public headers for cc_library deps. With unity_batch_size,
+    the sources are replaced by batch files that #include them, and the included
+    sources are returned in the unity_included_sources output group, for the
+    library's additional_compiler_inputs. They are not exported as headers, so
+    they are not inputs to the compile actions of the library's dependents.
     """
     gen_info = ctx.attr.package[CocoCcGeneratedInfo]
 
@@ -1169,25 +1947,22 @@ def _coco_cc_gen_impl(ctx):
     if ctx.attr.all_hdrs_public:
         public_hdrs = all_headers
         private_hdrs = []
+    elif [h for h in all_headers if h.is_directory]:
+        fail("public_hdrs cannot be used with %s, whose headers are generated into a directory " % ctx.attr.package.label +
+             "(output_mode = \"directory\")")
     else:
-        patterns = ctx.attr.public_hdrs
         public_hdrs = []
         private_hdrs = []
         for h in all_headers:
-            matched = False
-            for p in patterns:
-                if "/" in p:
-                    if h.short_path.endswith(p):
-                        matched = True
-                        break
-                elif h.basename == p:
-                    matched = True
-                    break
-            if matched:
+            if _matches_file_patterns(h, ctx.attr.public_hdrs):
                 public_hdrs.append(h)
             else:
                 private_hdrs.append(h)
 
+    included_sources = []
+    if ctx.attr.unity_batch_size > 1:
+        sources, included_sources = _unity_batches(ctx, sources)
+
     compilation_context = cc_common.create_compilation_context(
         headers = depset(public_hdrs),
     )
@@ -1195,6 +1970,7 @@ def _coco_cc_gen_impl(ctx):
     return [
         DefaultInfo(files = depset(sources + private_hdrs)),
         CcInfo(compilation_context = compilation_context),
+        OutputGroupInfo(unity_included_sources = depset(included_sources)),
     ]
 
 _coco_cc_gen = rule(
@@ -1211,6 +1987,17 @@ _coco_cc_gen = rule(
                   "Use bare filenames (e.g., 'ISensor.h') to match by name, or " +
                   "path suffixes (e.g., 'src/ISensor.h') to disambiguate.",
         ),
+        "unity_batch_size": attr.int(
+            default = 0,
+            doc = "If greater than 1, compile the sources in batches of up to this many, each batch " +
+                  "being a generated file that #includes its sources.",
+        ),
+        "unity_exclude": attr.string_list(
+            default = [],
+            doc = "Sources to compile on their own when unity_batch_size is set. " +
+                  "Use bare filenames (e.g., 'Sensor.cpp') to match by name, or " +
+                  "path suffixes (e.g., 'src/Sensor.cpp') to disambiguate.",
+        ),
         "use_test_outputs": attr.bool(default = False, doc = "If True, extract test/mock outputs instead of regular outputs"),
     },
 )
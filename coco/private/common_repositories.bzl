@@ -132,6 +132,29 @@ def download_prefix(version):
         return "archive/%s" % version
     return version
 
+# URL prefixes Popili releases are downloaded from when no mirrors are configured
+DEFAULT_MIRRORS = ["https://dl.cocotec.io/popili"]
+
+def download_urls(version, filename, mirrors = []):
+    """Returns the URLs to try, in order, for a file of a Popili release.
+
+    Args:
+      version: The version string of the release.
+      filename: The name of the file within the release, e.g. "coco-cpp-runtime.zip".
+      mirrors: URL prefixes to download from instead of DEFAULT_MIRRORS.
+
+    Returns:
+      A list of URLs, one per mirror.
+    """
+    return [
+        "{mirror}/{download_prefix}/{filename}".format(
+            mirror = mirror.rstrip("/"),
+            download_prefix = download_prefix(version),
+            filename = filename,
+        )
+        for mirror in (mirrors or DEFAULT_MIRRORS)
+    ]
+
 def version_to_repo_suffix(version):
     """Converts a version string to a valid repository name suffix.
 
@@ -191,9 +214,7 @@ def _coco_cc_runtime_repository_impl(ctx):
     """Implementation for C++ runtime repository rule."""
     version = ctx.attr.version
     ctx.download_and_extract(
-        url = "https://dl.cocotec.io/popili/{download_prefix}/coco-cpp-runtime.zip".format(
-            download_prefix = download_prefix(version),
-        ),
+        url = download_urls(version, "coco-cpp-runtime.zip", ctx.attr.mirrors),
         sha256 = FILE_KEY_TO_SHA.get("{version}/coco-cpp-runtime.zip".format(version = version)),
     )
 
@@ -209,6 +230,10 @@ _coco_cc_runtime_repository = repository_rule(
             doc = "Canonical label strings appended to the runtime's deps; typically Boost libraries for old compilers.",
             default = [],
         ),
+        "mirrors": attr.string_list(
+            doc = "URL prefixes to download the runtime from instead of https://dl.cocotec.io/popili, tried in order",
+            default = [],
+        ),
         "version": attr.string(
             doc = "The version of coco/popili to download C++ runtime for",
             mandatory = True,
@@ -220,9 +245,7 @@ def _coco_c_runtime_repository_impl(ctx):
     """Implementation for C runtime repository rule."""
     version = ctx.attr.version
     ctx.download_and_extract(
-        url = "https://dl.cocotec.io/popili/{download_prefix}/coco-c-runtime.zip".format(
-            download_prefix = download_prefix(version),
-        ),
+        url = download_urls(version, "coco-c-runtime.zip", ctx.attr.mirrors),
         sha256 = FILE_KEY_TO_SHA.get("{version}/coco-c-runtime.zip".format(version = version)),
     )
 
@@ -233,6 +256,10 @@ def _coco_c_runtime_repository_impl(ctx):
 _coco_c_runtime_repository = repository_rule(
     implementation = _coco_c_runtime_repository_impl,
     attrs = {
+        "mirrors": attr.string_list(
+            doc = "URL prefixes to download the runtime from instead of https://dl.cocotec.io/popili, tried in order",
+            default = [],
+        ),
         "version": attr.string(
             doc = "The version of coco/popili to download C runtime for",
             mandatory = True,
@@ -299,18 +326,14 @@ _coco_c_local_runtime_repository = repository_rule(
     },
 )
 
-def _coco_cc_repositories(version, extra_deps = []):
+def _coco_cc_repositories(version, extra_deps = [], mirrors = []):
     """WORKSPACE-mode sibling of _coco_cc_runtime_repository."""
     version_suffix = version_to_repo_suffix(version)
     repo_name = "io_cocotec_coco_cc_runtime__%s" % version_suffix
 
     http_archive(
         name = repo_name,
-        urls = [
-            "https://dl.cocotec.io/popili/{download_prefix}/coco-cpp-runtime.zip".format(
-                download_prefix = download_prefix(version),
-            ),
-        ],
+        urls = download_urls(version, "coco-cpp-runtime.zip", mirrors),
         sha256 = FILE_KEY_TO_SHA.get("{version}/coco-cpp-runtime.zip".format(version = version)),
         build_file_content = _CC_RUNTIME_BUILD_TEMPLATE.format(
             deps = json.encode(extra_deps),
@@ -19,7 +19,11 @@ load(
     "//coco/private:coco.bzl",
     "COCO_TOOLCHAIN_TYPE",
     "CocoPackageInfo",
+    "CocoVerificationInfo",
     "LICENSE_ATTRIBUTES",
+    "POPILI_PROFILER_ATTRIBUTES",
+    "RESOURCE_ATTRIBUTES",
+    "WINDOWS_CONSTRAINT_ATTR",
     "run_coco",
 )
 
@@ -38,6 +42,31 @@ def counterexample_options(decl, assertion = None):
         assertion = assertion,
     )
 
+def _architecture_display_arguments(ctx):
+    """Display and layout options shared by every graph-component invocation of a target."""
+    arguments = []
+
+    # Add display options
+    if ctx.attr.port_names:
+        arguments.append("--port-names")
+    if not ctx.attr.port_types:
+        arguments.append("--port-types=false")
+    if ctx.attr.component_names:
+        arguments.append("--component-names")
+    if not ctx.attr.component_types:
+        arguments.append("--component-types=false")
+
+    # Add layout options
+    if ctx.attr.depth:
+        arguments += ["--depth", ctx.attr.depth]
+    if ctx.attr.hide_ports:
+        arguments.append("--hide-ports")
+    if not ctx.attr.only_encapsulating:
+        arguments.append("--only-encapsulating=false")
+    if ctx.attr.only_roots:
+        arguments.append("--only-roots")
+    return arguments
+
 def _coco_architecture_diagram_impl(ctx):
     """Implementation for coco_architecture_diagram rule.
 
@@ -53,7 +82,10 @@ def _coco_architecture_diagram_impl(ctx):
     for filename in filenames:
         outputs.append(ctx.actions.declare_file(filename))
 
+    display_arguments = _architecture_display_arguments(ctx)
+
     # Build command arguments for each component
+    profiles = []
     for i in range(len(filenames)):
         component = targets[i]
         arguments = ["graph-component"]
@@ -62,44 +94,28 @@ def _coco_architecture_diagram_impl(ctx):
         if component:
             arguments += ["--component", component]
 
-        # Add display options
-        if ctx.attr.port_names:
-            arguments.append("--port-names")
-        if not ctx.attr.port_types:
-            arguments.append("--port-types=false")
-        if ctx.attr.component_names:
-            arguments.append("--component-names")
-        if not ctx.attr.component_types:
-            arguments.append("--component-types=false")
-
-        # Add layout options
-        if ctx.attr.depth:
-            arguments += ["--depth", ctx.attr.depth]
-        if ctx.attr.hide_ports:
-            arguments.append("--hide-ports")
-        if not ctx.attr.only_encapsulating:
-            arguments.append("--only-encapsulating=false")
-        if ctx.attr.only_roots:
-            arguments.append("--only-roots")
-
-        # Add output
+        # Add display and layout options, then the output
+        arguments += display_arguments
         arguments += ["--output", outputs[i].path]
 
         # Run command for this component
-        run_coco(
+        profiles.append(run_coco(
             ctx = ctx,
             package = package,
             verb = "Generating architecture diagram for",
             mnemonic = "CocoDiagram",
             arguments = arguments,
             outputs = [outputs[i]],
-        )
+        ))
 
-    return [DefaultInfo(files = depset(outputs))]
+    return [
+        DefaultInfo(files = depset(outputs)),
+        OutputGroupInfo(coco_profile = depset([p for p in profiles if p])),
+    ]
 
 _coco_architecture_diagram = rule(
     implementation = _coco_architecture_diagram_impl,
-    attrs = dict(LICENSE_ATTRIBUTES.items() + {
+    attrs = dict(LICENSE_ATTRIBUTES.items() + POPILI_PROFILER_ATTRIBUTES.items() + {
         "component_filenames": attr.string_list(
             mandatory = True,
         ),
@@ -143,6 +159,7 @@ _coco_architecture_diagram = rule(
             default = True,
             doc = "Show the type of each port. Enabled by default.",
         ),
+        "_windows_constraint": WINDOWS_CONSTRAINT_ATTR,
     }.items()),
     toolchains = [COCO_TOOLCHAIN_TYPE],
 )
@@ -173,6 +190,7 @@ def _coco_state_diagram_impl(ctx):
             outputs.append(ctx.actions.declare_file(filename))
 
     # Build command arguments for each target
+    profiles = []
     for i, target in enumerate(targets):
         arguments = ["graph-states"]
 
@@ -188,20 +206,23 @@ def _coco_state_diagram_impl(ctx):
         arguments += ["--output", outputs[i].path]
 
         # Run command for this target
-        run_coco(
+        profiles.append(run_coco(
             ctx = ctx,
             package = package,
             verb = "Generating state diagram for",
             mnemonic = "CocoDiagram",
             arguments = arguments,
             outputs = [outputs[i]],
-        )
+        ))
 
-    return [DefaultInfo(files = depset(outputs))]
+    return [
+        DefaultInfo(files = depset(outputs)),
+        OutputGroupInfo(coco_profile = depset([p for p in profiles if p])),
+    ]
 
 _coco_state_diagram = rule(
     implementation = _coco_state_diagram_impl,
-    attrs = dict(LICENSE_ATTRIBUTES.items() + {
+    attrs = dict(LICENSE_ATTRIBUTES.items() + POPILI_PROFILER_ATTRIBUTES.items() + {
         "package": attr.label(
             providers = [CocoPackageInfo],
             mandatory = True,
@@ -216,25 +237,17 @@ _coco_state_diagram = rule(
             doc = "Fully qualified names of state machines/components/ports to diagram " +
                   "(e.g. \"MyComponent.myPort.stateMachine\"). If empty, all state machines are drawn.",
         ),
+        "_windows_constraint": WINDOWS_CONSTRAINT_ATTR,
     }.items()),
     toolchains = [COCO_TOOLCHAIN_TYPE],
 )
 
-def _coco_counterexample_diagram_impl(ctx):
-    """Implementation for coco_counterexample_diagram rule.
+def _verify_arguments(ctx):
+    """Arguments for a `popili verify` run that renders counterexamples.
 
-    Generates counterexample diagrams using `popili verify --counterexample-svg`.
+    Verification failures do not fail the action, since that is when counterexamples
+    are generated.
     """
-    package = ctx.attr.package
-
-    filenames = ctx.attr.counterexample_filenames
-    targets = ctx.attr.counterexample_targets
-    assertions = ctx.attr.counterexample_assertions
-
-    if not filenames:
-        fail("counterexamples must specify at least one expected counterexample")
-
-    # Build base arguments
     arguments = [
         "verify",
         "--exit-code=fatal-only",
@@ -246,8 +259,21 @@ def _coco_counterexample_diagram_impl(ctx):
     backend = ctx.attr._verification_backend[BuildSettingInfo].value
     if backend != "":
         arguments += ["--backend", backend]
+    return arguments
+
+def _declare_counterexamples(ctx):
+    """Declares the counterexample SVGs requested by a target.
+
+    Returns:
+        A tuple of the `popili verify` arguments that render the counterexamples, and
+        the declared output files.
+    """
+    filenames = ctx.attr.counterexample_filenames
+    targets = ctx.attr.counterexample_targets
+    assertions = ctx.attr.counterexample_assertions
 
     # Process each counterexample specification
+    arguments = []
     outputs = []
     for i in range(len(filenames)):
         filename = filenames[i]
@@ -269,21 +295,37 @@ def _coco_counterexample_diagram_impl(ctx):
         if assertion:
             arguments += ["--counterexample-assertion", assertion]
 
+    return arguments, outputs
+
+def _coco_counterexample_diagram_impl(ctx):
+    """Implementation for coco_counterexample_diagram rule.
+
+    Generates counterexample diagrams using `popili verify --counterexample-svg`.
+    """
+    if not ctx.attr.counterexample_filenames:
+        fail("counterexamples must specify at least one expected counterexample")
+
+    counterexample_arguments, outputs = _declare_counterexamples(ctx)
+
     # Run verification with counterexample generation
-    run_coco(
+    profile = run_coco(
         ctx = ctx,
-        package = package,
+        package = ctx.attr.package,
         verb = "Generating counterexample diagrams for",
         mnemonic = "CocoDiagram",
-        arguments = arguments,
+        arguments = _verify_arguments(ctx) + counterexample_arguments,
         outputs = outputs,
+        include_test_srcs = True,
     )
 
-    return [DefaultInfo(files = depset(outputs))]
+    return [
+        DefaultInfo(files = depset(outputs)),
+        OutputGroupInfo(coco_profile = depset([profile] if profile else [])),
+    ]
 
 _coco_counterexample_diagram = rule(
     implementation = _coco_counterexample_diagram_impl,
-    attrs = dict(LICENSE_ATTRIBUTES.items() + {
+    attrs = dict(LICENSE_ATTRIBUTES.items() + POPILI_PROFILER_ATTRIBUTES.items() + RESOURCE_ATTRIBUTES.items() + {
         "counterexample_assertions": attr.string_list(
             default = [],
         ),
@@ -304,6 +346,63 @@ _coco_counterexample_diagram = rule(
             mandatory = True,
         ),
         "_verification_backend": attr.label(default = Label("//:verification_backend")),
+        "_windows_constraint": WINDOWS_CONSTRAINT_ATTR,
+    }.items()),
+    toolchains = [COCO_TOOLCHAIN_TYPE],
+)
+
+def _coco_verification_impl(ctx):
+    """Implementation for coco_verification rule.
+
+    Runs `popili verify` once as a build action, writing a JUnit report alongside any
+    requested counterexample diagrams.
+    """
+    junit = ctx.actions.declare_file(ctx.label.name + ".junit.xml")
+    counterexample_arguments, counterexamples = _declare_counterexamples(ctx)
+
+    profile = run_coco(
+        ctx = ctx,
+        package = ctx.attr.package,
+        verb = "Verifying",
+        mnemonic = "CocoVerify",
+        arguments = _verify_arguments(ctx) + ["--results-junit", junit.path] + counterexample_arguments,
+        outputs = [junit] + counterexamples,
+        include_test_srcs = True,
+    )
+
+    return [
+        DefaultInfo(files = depset([junit] + counterexamples)),
+        CocoVerificationInfo(
+            counterexamples = depset(counterexamples),
+            junit = junit,
+        ),
+        OutputGroupInfo(coco_profile = depset([profile] if profile else [])),
+    ]
+
+_coco_verification = rule(
+    implementation = _coco_verification_impl,
+    attrs = dict(LICENSE_ATTRIBUTES.items() + POPILI_PROFILER_ATTRIBUTES.items() + RESOURCE_ATTRIBUTES.items() + {
+        "counterexample_assertions": attr.string_list(
+            default = [],
+        ),
+        "counterexample_filenames": attr.string_list(
+            default = [],
+        ),
+        "counterexample_targets": attr.string_list(
+            default = [],
+        ),
+        "deterministic": attr.bool(
+            default = True,
+        ),
+        "draw_title": attr.bool(
+            default = True,
+        ),
+        "package": attr.label(
+            providers = [CocoPackageInfo],
+            mandatory = True,
+        ),
+        "_verification_backend": attr.label(default = Label("//:verification_backend")),
+        "_windows_constraint": WINDOWS_CONSTRAINT_ATTR,
     }.items()),
     toolchains = [COCO_TOOLCHAIN_TYPE],
 )
@@ -359,6 +458,29 @@ Generates SVG diagrams showing state machine structure using
     implementation = _coco_state_diagram_macro_impl,
 )
 
+def _split_counterexamples(counterexamples):
+    """Process a counterexamples dict into parallel lists of filenames, targets and assertions."""
+    filenames = []
+    targets = []
+    assertions = []
+
+    for filename, spec in counterexamples.items():
+        filenames.append(filename)
+
+        # Check if spec is a string or a struct
+        if type(spec) == "string":
+            # Simple case: spec is just the target name
+            targets.append(spec)
+            assertions.append("")
+        else:
+            # Struct case: extract decl and assertion fields
+            if not hasattr(spec, "decl"):
+                fail("counterexample specification must be a string or a struct with 'decl' field")
+            targets.append(spec.decl)
+            assertions.append(spec.assertion if hasattr(spec, "assertion") and spec.assertion else "")
+
+    return filenames, targets, assertions
+
 def coco_counterexample_diagram(
         name,
         package,
@@ -380,32 +502,53 @@ def coco_counterexample_diagram(
           (e.g., {"alarm.svg": "Alarm"} or {"safety.svg": counterexample_options(decl="Checker", assertion="prop")})
         draw_title: Draw border and title on diagrams (default: True)
         deterministic: Ensure reproducible output (default: True)
-        **kwargs: Additional Bazel arguments (e.g., visibility, tags)
+        **kwargs: Additional Bazel arguments (e.g., visibility, tags), or `resources` to choose the
+            resources popili reserves (see coco_generate)
     """
     if not counterexamples:
         fail("counterexamples must specify at least one expected counterexample")
 
-    # Process the counterexamples dict into parallel lists
-    filenames = []
-    targets = []
-    assertions = []
+    filenames, targets, assertions = _split_counterexamples(counterexamples)
 
-    for filename, spec in counterexamples.items():
-        filenames.append(filename)
+    _coco_counterexample_diagram(
+        name = name,
+        package = package,
+        counterexample_filenames = filenames,
+        counterexample_targets = targets,
+        counterexample_assertions = assertions,
+        draw_title = draw_title,
+        deterministic = deterministic,
+        **kwargs
+    )
 
-        # Check if spec is a string or a struct
-        if type(spec) == "string":
-            # Simple case: spec is just the target name
-            targets.append(spec)
-            assertions.append("")
-        else:
-            # Struct case: extract decl and assertion fields
-            if not hasattr(spec, "decl"):
-                fail("counterexample specification must be a string or a struct with 'decl' field")
-            targets.append(spec.decl)
-            assertions.append(spec.assertion if hasattr(spec, "assertion") and spec.assertion else "")
+def coco_verification(
+        name,
+        package,
+        counterexamples = {},
+        draw_title = True,
+        deterministic = True,
+        **kwargs):
+    """Verifies a package once as a cacheable build action.
 
-    _coco_counterexample_diagram(
+    Runs `popili verify` on the package, producing `<name>.junit.xml` together with
+    any requested counterexample diagrams. The action succeeds even when
+    verification fails, so its results can be cached and shared: reference this
+    target from coco_verify_test's `verification` attribute to report the results
+    as a test without verifying the package again.
+
+    Args:
+        name: Name of the verification target
+        package: The coco_package target to verify
+        counterexamples: Dict mapping output filenames to target specifications, as for
+          coco_counterexample_diagram (default: no counterexample diagrams)
+        draw_title: Draw border and title on diagrams (default: True)
+        deterministic: Ensure reproducible output (default: True)
+        **kwargs: Additional Bazel arguments (e.g., visibility, tags), or `resources` to choose the
+            resources popili reserves (see coco_generate)
+    """
+    filenames, targets, assertions = _split_counterexamples(counterexamples)
+
+    _coco_verification(
         name = name,
         package = package,
         counterexample_filenames = filenames,
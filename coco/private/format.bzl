@@ -40,7 +40,7 @@ def _coco_fmt_test_impl(ctx):
 
     return DefaultInfo(
         executable = wrapper_script,
-        runfiles = ctx.runfiles(transitive_files = coco_runfiles(ctx, ctx.attr.package, True)),
+        runfiles = ctx.runfiles(transitive_files = coco_runfiles(ctx, ctx.attr.package, True, include_test_srcs = True)),
     )
 
 _coco_fmt_test = rule(
@@ -101,7 +101,7 @@ def _coco_fmt_binary_impl(ctx):
 
     return DefaultInfo(
         executable = wrapper_script,
-        runfiles = ctx.runfiles(transitive_files = coco_runfiles(ctx, ctx.attr.package, True)),
+        runfiles = ctx.runfiles(transitive_files = coco_runfiles(ctx, ctx.attr.package, True, include_test_srcs = True)),
     )
 
 _coco_fmt_binary = rule(
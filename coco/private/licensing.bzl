@@ -72,6 +72,12 @@ LICENSE_SOURCES = [
     # Requires popili 1.5.2 or later.
     "action_file",
 
+    # A license file path will be provided that is available in the execution environment of each action, e.g. a
+    # machine-wide license installed at the same path on every developer machine and CI runner. The path should be
+    # specified via --@rules_coco//:license_file_path or in the toolchain configuration. The file is not an input of
+    # any action, so action keys (and hence remote cache entries) do not depend on whose license is used.
+    "action_license_file",
+
     # A license will be acquired on the local machine as part of the build using COCOTEC_AUTH_TOKEN.
     #
     # This is not compatible with remote execution.
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Profiler for popili actions.
+
+Selected with --@rules_coco//:profile=@rules_coco//coco:popili_profile. Each
+popili invocation is then run as
+
+    popili_profile run --output <json> --label <label> --mnemonic <mnemonic>
+        [--inputs-file <file>] -- <command>...
+
+which runs the command and records its wall time, peak RSS and input count in
+<json>. The inputs are counted from --inputs-file, which lists one per line, so
+that they are only counted when the action runs. The exit code of the command is passed through.
+
+coco_profile_aspect merges the per-action files of a build with
+
+    popili_profile merge --output <report> <json>...
+
+into a single report ranking the actions and targets by wall time.
+
+The profiler only uses the standard library, so it runs with the python3 (python
+on Windows) on the PATH rather than a Python toolchain, which users of
+rules_coco need not have.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_child_rss_kb() -> Optional[int]:
+    """Returns the peak RSS of any waited-for child process, in KiB."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # macOS reports bytes, Linux KiB
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def count_inputs(path: Optional[str]) -> Optional[int]:
+    """Returns the number of inputs listed in a file, one per line."""
+    if path is None:
+        return None
+    with open(path) as f:
+        return sum(1 for line in f if line.strip())
+
+
+def run(options: argparse.Namespace) -> int:
+    command = options.command
+    if command and command[0] == "--":
+        command = command[1:]
+    start = time.monotonic()
+    returncode = subprocess.call(command)
+    profile = {
+        "label": options.label,
+        "mnemonic": options.mnemonic,
+        "wall_seconds": round(time.monotonic() - start, 3),
+        "peak_rss_kb": _peak_child_rss_kb(),
+        "inputs": count_inputs(options.inputs_file),
+        "exit_code": returncode,
+    }
+    with open(options.output, "w") as f:
+        json.dump(profile, f, indent=2, sort_keys=True)
+    return returncode
+
+
+def build_report(profiles: List[Dict]) -> Dict:
+    """Ranks actions and the targets they belong to by wall time."""
+    targets: Dict[str, Dict] = defaultdict(lambda: {
+        "actions": 0,
+        "wall_seconds": 0.0,
+        "peak_rss_kb": None,
+    })
+    for profile in profiles:
+        target = targets[profile["label"]]
+        target["actions"] += 1
+        target["wall_seconds"] += profile["wall_seconds"]
+        if profile.get("peak_rss_kb") is not None:
+            target["peak_rss_kb"] = max(target["peak_rss_kb"] or 0,
+                                        profile["peak_rss_kb"])
+
+    ranked_targets = [
+        dict(label=label, **target) for label, target in targets.items()
+    ]
+    for target in ranked_targets:
+        target["wall_seconds"] = round(target["wall_seconds"], 3)
+    ranked_targets.sort(key=lambda t: (-t["wall_seconds"], t["label"]))
+
+    return {
+        "total_wall_seconds":
+        round(sum(p["wall_seconds"] for p in profiles), 3),
+        "targets":
+        ranked_targets,
+        "actions":
+        sorted(profiles,
+               key=lambda p: (-p["wall_seconds"], p["label"], p["mnemonic"])),
+    }
+
+
+def merge(options: argparse.Namespace) -> int:
+    profiles = []
+    for path in options.profiles:
+        if path.startswith("@"):
+            with open(path[1:]) as f:
+                paths = f.read().splitlines()
+        else:
+            paths = [path]
+        for p in paths:
+            with open(p) as f:
+                profiles.append(json.load(f))
+    with open(options.output, "w") as f:
+        json.dump(build_report(profiles), f, indent=2, sort_keys=True)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    subparsers = parser.add_subparsers(dest="subcommand", required=True)
+
+    run_parser = subparsers.add_parser("run",
+                                       help="Run and profile a command")
+    run_parser.add_argument("--output", required=True)
+    run_parser.add_argument("--label", required=True)
+    run_parser.add_argument("--mnemonic", required=True)
+    run_parser.add_argument(
+        "--inputs-file",
+        default=None,
+        help="File listing the inputs of the action, one per line")
+    run_parser.add_argument("command", nargs=argparse.REMAINDER)
+    run_parser.set_defaults(func=run)
+
+    merge_parser = subparsers.add_parser(
+        "merge", help="Merge per-action profiles into a report")
+    merge_parser.add_argument("--output", required=True)
+    merge_parser.add_argument("profiles", nargs="*")
+    merge_parser.set_defaults(func=merge)
+
+    options = parser.parse_args(argv)
+    return options.func(options)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Aggregation of popili action profiles recorded with --@rules_coco//:profile."""
+
+load(":coco.bzl", "WINDOWS_CONSTRAINT_ATTR")
+
+CocoProfileInfo = provider(
+    doc = "Profiles of the popili actions of a target and its transitive dependencies",
+    fields = {
+        "profiles": "Per-action profile JSON files as a depset",
+    },
+)
+
+# Attributes through which Coco targets reach the packages they are built from
+_PROFILE_ATTR_ASPECTS = [
+    "deps",
+    "package",
+    "target",
+]
+
+def _coco_profile_aspect_impl(target, ctx):
+    direct = []
+    if OutputGroupInfo in target and hasattr(target[OutputGroupInfo], "coco_profile"):
+        direct = [target[OutputGroupInfo].coco_profile]
+
+    transitive = []
+    for attr_name in _PROFILE_ATTR_ASPECTS:
+        value = getattr(ctx.rule.attr, attr_name, None)
+        if value == None:
+            continue
+        for dep in (value if type(value) == type([]) else [value]):
+            if type(dep) == "Target" and CocoProfileInfo in dep:
+                transitive.append(dep[CocoProfileInfo].profiles)
+
+    profiles = depset(transitive = direct + transitive)
+
+    profiler = ctx.attr._popili_profiler[DefaultInfo].files_to_run
+    if not profiler.executable:
+        return [CocoProfileInfo(profiles = profiles)]
+
+    report = ctx.actions.declare_file(ctx.label.name + ".coco_profile.json")
+    arguments = ctx.actions.args()
+    arguments.add("merge")
+    arguments.add("--output", report)
+    profile_paths = ctx.actions.args()
+    profile_paths.add_all(profiles)
+    profile_paths.use_param_file("@%s", use_always = True)
+    profile_paths.set_param_file_format("multiline")
+    ctx.actions.run(
+        executable = profiler,
+        mnemonic = "CocoProfileReport",
+        progress_message = "Merging popili profiles for %{label}",
+        inputs = profiles,
+        outputs = [report],
+        arguments = [arguments, profile_paths],
+    )
+
+    return [
+        CocoProfileInfo(profiles = profiles),
+        OutputGroupInfo(coco_profile_report = depset([report])),
+    ]
+
+def _popili_profiler_impl(ctx):
+    # The script is run by the python3 (python on Windows) on the PATH, so the
+    # profiler does not need rules_python, which is only a dev dependency
+    if ctx.target_platform_has_constraint(ctx.attr._windows_constraint[platform_common.ConstraintValueInfo]):
+        script = ctx.actions.declare_file(ctx.label.name + ".py")
+        ctx.actions.symlink(output = script, target_file = ctx.file.src)
+        launcher = ctx.actions.declare_file(ctx.label.name + ".bat")
+        ctx.actions.write(output = launcher, content = "@python \"%~dpn0.py\" %*\r\n", is_executable = True)
+        return [DefaultInfo(executable = launcher, runfiles = ctx.runfiles(files = [script]))]
+
+    executable = ctx.actions.declare_file(ctx.label.name)
+    ctx.actions.symlink(output = executable, target_file = ctx.file.src, is_executable = True)
+    return [DefaultInfo(executable = executable)]
+
+popili_profiler = rule(
+    implementation = _popili_profiler_impl,
+    doc = "Makes the popili profiler script executable with the system Python.",
+    attrs = {
+        "src": attr.label(
+            allow_single_file = [".py"],
+            mandatory = True,
+            doc = "The profiler script.",
+        ),
+        "_windows_constraint": WINDOWS_CONSTRAINT_ATTR,
+    },
+    executable = True,
+)
+
+coco_profile_aspect = aspect(
+    implementation = _coco_profile_aspect_impl,
+    doc = """Merges the popili action profiles of Coco targets into a report.
+
+Build with `--@rules_coco//:profile=@rules_coco//coco:popili_profile` so that
+popili actions record their wall time, peak RSS and input count, and apply this
+aspect to request a report for each top-level target:
+
+```
+bazel build //... --@rules_coco//:profile=@rules_coco//coco:popili_profile \\
+    --aspects=@rules_coco//coco:defs.bzl%coco_profile_aspect \\
+    --output_groups=+coco_profile_report
+```
+
+Each `<target>.coco_profile.json` covers the target and the Coco packages it is
+built from, ranking actions and targets by wall time.""",
+    attr_aspects = _PROFILE_ATTR_ASPECTS,
+    attrs = {
+        "_popili_profiler": attr.label(default = Label("//:profile"), cfg = "exec"),
+    },
+)
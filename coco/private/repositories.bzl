@@ -25,7 +25,7 @@ load(
     "coco_fetch_license_repository",
     "coco_preferences_repository",
     "coco_symlink_license_repository",
-    "download_prefix",
+    "download_urls",
     "resolve_local_path",
     "validate_minimum_version",
     "version_to_repo_suffix",
@@ -47,16 +47,17 @@ toolchain(
         parent_workspace_name = parent_workspace_name,
     )
 
-def BUILD_for_coco_toolchain(name, cc_runtime_label = None, c_runtime_label = None, license_source = None, license_token = None, auth_token_path = None):
+def BUILD_for_coco_toolchain(name, cc_runtime_label = None, c_runtime_label = None, license_source = None, license_token = None, auth_token_path = None, license_file_path = None):
     """Emits a toolchain declaration to match an existing compiler and stdlib.
 
     Args:
       name: The name of the toolchain declaration
       cc_runtime_label: Optional label to the C++ runtime library (can be a Label object or string)
       c_runtime_label: Optional label to the C runtime library (can be a Label object or string)
-      license_source: Optional license source mode (e.g., "local_user", "local_acquire", "token", "action_environment", "action_file")
+      license_source: Optional license source mode (e.g., "local_user", "local_acquire", "token", "action_environment", "action_file", "action_license_file")
       license_token: Optional license token string
       auth_token_path: Optional auth token file path string
+      license_file_path: Optional license file path string
 
     Returns:
       A string containing BUILD file content for the toolchain.
@@ -84,11 +85,15 @@ def BUILD_for_coco_toolchain(name, cc_runtime_label = None, c_runtime_label = No
     if auth_token_path and auth_token_path != "":
         auth_token_path_attr = '\n    auth_token_path = "{}",'.format(auth_token_path)
 
+    license_file_path_attr = ""
+    if license_file_path and license_file_path != "":
+        license_file_path_attr = '\n    license_file_path = "{}",'.format(license_file_path)
+
     return """
 coco_toolchain(
     name = "{toolchain_name}_impl",
     coco = "//:coco",
-    cocotec_licensing_server = "//:cocotec_licensing_server",{cc_runtime_attr}{c_runtime_attr}{license_source_attr}{license_token_attr}{auth_token_path_attr}
+    cocotec_licensing_server = "//:cocotec_licensing_server",{cc_runtime_attr}{c_runtime_attr}{license_source_attr}{license_token_attr}{auth_token_path_attr}{license_file_path_attr}
     visibility = ["//visibility:public"],
 )
 """.format(
@@ -98,6 +103,7 @@ coco_toolchain(
         license_source_attr = license_source_attr,
         license_token_attr = license_token_attr,
         auth_token_path_attr = auth_token_path_attr,
+        license_file_path_attr = license_file_path_attr,
     )
 
 def BUILD_for_coco_archive(binary_ext, product):
@@ -139,16 +145,17 @@ def _coco_toolchain_repository_impl(ctx):
     product = _product_for(ctx.attr.version)
 
     # Download the compiler
-    download_path = "{download_prefix}/{product}_{os}_{arch}.zip".format(
+    filename = "{product}_{os}_{arch}.zip".format(
         arch = ctx.attr.arch.replace("aarch64", "arm64").replace("x86_64", "amd64"),
         os = ctx.attr.os.replace("osx", "darwin"),
-        download_prefix = download_prefix(ctx.attr.version),
         product = product,
     )
+
+    # The checksum is also what lets Bazel serve the archive from its repository cache.
     ctx.download_and_extract(
-        url = "https://dl.cocotec.io/popili/{download_path}".format(download_path = download_path),
+        url = download_urls(ctx.attr.version, filename, ctx.attr.mirrors),
         output = "bin",
-        sha256 = FILE_KEY_TO_SHA.get(download_path) or "",
+        sha256 = FILE_KEY_TO_SHA.get("{}/{}".format(ctx.attr.version, filename)) or "",
     )
 
     ctx.file("WORKSPACE", "")
@@ -161,6 +168,7 @@ def _coco_toolchain_repository_impl(ctx):
             license_source = ctx.attr.license_source,
             license_token = ctx.attr.license_token,
             auth_token_path = ctx.attr.auth_token_path,
+            license_file_path = ctx.attr.license_file_path,
         ),
     ]))
 
@@ -192,13 +200,21 @@ coco_toolchain_repository = repository_rule(
             default = None,
         ),
         "license_source": attr.string(
-            doc = "Optional license source mode (e.g., 'local_user', 'local_acquire', 'token', 'action_environment', 'action_file')",
+            doc = "Optional license source mode (e.g., 'local_user', 'local_acquire', 'token', 'action_environment', 'action_file', 'action_license_file')",
+            default = "",
+        ),
+        "license_file_path": attr.string(
+            doc = "Optional license file path string",
             default = "",
         ),
         "license_token": attr.string(
             doc = "Optional license token string",
             default = "",
         ),
+        "mirrors": attr.string_list(
+            doc = "URL prefixes to download popili from instead of https://dl.cocotec.io/popili, tried in order",
+            default = [],
+        ),
         "os": attr.string(mandatory = True),
         "version": attr.string(mandatory = True),
     },
@@ -231,6 +247,7 @@ def _coco_local_toolchain_repository_impl(ctx):
             license_source = ctx.attr.license_source,
             license_token = ctx.attr.license_token,
             auth_token_path = ctx.attr.auth_token_path,
+            license_file_path = ctx.attr.license_file_path,
         ),
     ]))
 
@@ -249,7 +266,11 @@ coco_local_toolchain_repository = repository_rule(
             default = None,
         ),
         "license_source": attr.string(
-            doc = "Optional license source mode (e.g., 'local_user', 'local_acquire', 'token', 'action_environment', 'action_file')",
+            doc = "Optional license source mode (e.g., 'local_user', 'local_acquire', 'token', 'action_environment', 'action_file', 'action_license_file')",
+            default = "",
+        ),
+        "license_file_path": attr.string(
+            doc = "Optional license file path string",
             default = "",
         ),
         "license_token": attr.string(
@@ -277,7 +298,7 @@ coco_toolchain_repository_proxy = repository_rule(
     configure = True,
 )
 
-def coco_repository_set(name, version, os, arch, constraints, cc_runtime_label = None, c_runtime_label = None, license_source = None, license_token = None, auth_token_path = None):
+def coco_repository_set(name, version, os, arch, constraints, cc_runtime_label = None, c_runtime_label = None, license_source = None, license_token = None, auth_token_path = None, license_file_path = None, mirrors = []):
     coco_toolchain_repository(
         arch = arch,
         os = os,
@@ -288,6 +309,8 @@ def coco_repository_set(name, version, os, arch, constraints, cc_runtime_label =
         license_source = license_source,
         license_token = license_token,
         auth_token_path = auth_token_path,
+        license_file_path = license_file_path,
+        mirrors = mirrors,
     )
 
     coco_toolchain_repository_proxy(
@@ -301,7 +324,7 @@ def coco_repository_set(name, version, os, arch, constraints, cc_runtime_label =
         name = name,
     ))
 
-def _coco_deps(version, c = False, cc = False, cc_runtime_extra_deps = []):
+def _coco_deps(version, c = False, cc = False, cc_runtime_extra_deps = [], mirrors = []):
     if not "bazel_skylib" in native.existing_rules():
         http_archive(
             name = "bazel_skylib",
@@ -327,10 +350,11 @@ def _coco_deps(version, c = False, cc = False, cc_runtime_extra_deps = []):
         coco_c_runtime_repository(
             name = "io_cocotec_coco_c_runtime__%s" % version_suffix,
             version = version,
+            mirrors = mirrors,
         )
 
     if cc:
-        coco_cc_repositories(version = version, extra_deps = cc_runtime_extra_deps)
+        coco_cc_repositories(version = version, extra_deps = cc_runtime_extra_deps, mirrors = mirrors)
 
     coco_preferences_repository(name = "io_cocotec_coco_preferences")
     coco_fetch_license_repository(
@@ -350,13 +374,17 @@ def coco_repositories(version = "stable", **kwargs):
 
           cc (bool): Whether to include C++ runtime support.
 
-          license_source (str): Optional default license source mode for all toolchains (e.g., 'local_user', 'local_acquire', 'token', 'action_environment', 'action_file'). Can be overridden via --@rules_coco//:license_source flag.
+          license_source (str): Optional default license source mode for all toolchains (e.g., 'local_user', 'local_acquire', 'token', 'action_environment', 'action_file', 'action_license_file'). Can be overridden via --@rules_coco//:license_source flag.
 
           license_token (str): Optional default license token for all toolchains when license_source is 'token'.
 
           auth_token_path (str): Optional path to auth token file for all toolchains when license_source is 'action_file'. The file must be available in the execution environment.
 
+          license_file_path (str): Optional path to a license file for all toolchains when license_source is 'action_license_file'. The file must be available in the execution environment.
+
           cc_runtime_extra_deps (list): cc_library labels appended to the Coco C++ runtime's deps. Use this to supply Boost (or equivalent) libraries on old compilers; see the rules_coco README. Empty by default.
+
+          mirrors (list): URL prefixes to download popili and the runtimes from instead of https://dl.cocotec.io/popili, tried in order. Each must serve the same layout, e.g. `<mirror>/archive/1.5.1/popili_linux_amd64.zip`.
     """
 
     # Resolve version aliases
@@ -372,12 +400,15 @@ def coco_repositories(version = "stable", **kwargs):
     license_source = kwargs.get("license_source", None)
     license_token = kwargs.get("license_token", None)
     auth_token_path = kwargs.get("auth_token_path", None)
+    license_file_path = kwargs.get("license_file_path", None)
     cc_runtime_extra_deps = kwargs.get("cc_runtime_extra_deps", [])
+    mirrors = kwargs.get("mirrors", [])
     _coco_deps(
         version = resolved_version,
         c = c,
         cc = cc,
         cc_runtime_extra_deps = cc_runtime_extra_deps,
+        mirrors = mirrors,
     )
 
     version_suffix = version_to_repo_suffix(resolved_version)
@@ -413,9 +444,11 @@ def coco_repositories(version = "stable", **kwargs):
             license_source = license_source,
             license_token = license_token,
             auth_token_path = auth_token_path,
+            license_file_path = license_file_path,
+            mirrors = mirrors,
         )
 
-def coco_local_repository_set(name, path, cc_runtime_label = None, c_runtime_label = None, license_source = None, license_token = None, auth_token_path = None):
+def coco_local_repository_set(name, path, cc_runtime_label = None, c_runtime_label = None, license_source = None, license_token = None, auth_token_path = None, license_file_path = None):
     coco_local_toolchain_repository(
         name = name,
         path = path,
@@ -424,6 +457,7 @@ def coco_local_repository_set(name, path, cc_runtime_label = None, c_runtime_lab
         license_source = license_source,
         license_token = license_token,
         auth_token_path = auth_token_path,
+        license_file_path = license_file_path,
     )
 
     coco_toolchain_repository_proxy(
@@ -462,6 +496,8 @@ def coco_local_repositories(path, cc_runtime_path = None, c_runtime_path = None,
           license_token (str): Optional default license token.
 
           auth_token_path (str): Optional auth token file path.
+
+          license_file_path (str): Optional license file path.
     """
 
     # Nothing is downloaded (toolchain/runtimes are local); version only picks the
@@ -492,4 +528,5 @@ def coco_local_repositories(path, cc_runtime_path = None, c_runtime_path = None,
         license_source = kwargs.get("license_source", None),
         license_token = kwargs.get("license_token", None),
         auth_token_path = kwargs.get("auth_token_path", None),
+        license_file_path = kwargs.get("license_file_path", None),
     )
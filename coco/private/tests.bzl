@@ -14,9 +14,19 @@
 
 """Unit tests for coco.bzl functions."""
 
-load("@bazel_skylib//lib:unittest.bzl", "asserts", "unittest")
+load("@bazel_skylib//lib:paths.bzl", "paths")
+load("@bazel_skylib//lib:unittest.bzl", "analysistest", "asserts", "unittest")
 load(":cc_runtime_deps.bzl", "collect_cc_runtime_extra_deps")
-load(":coco.bzl", "compute_output_filenames", "mangle_name")
+load(
+    ":coco.bzl",
+    "CocoPackageInfo",
+    "coco_generate",
+    "coco_package",
+    "coco_verify_test",
+    "compute_output_filenames",
+    "mangle_name",
+)
+load(":diagram.bzl", "coco_state_diagram", "coco_verification")
 
 # Tests for collect_cc_runtime_extra_deps
 
@@ -558,6 +568,222 @@ compute_output_filenames_c_with_mangling_test = unittest.make(_compute_output_fi
 compute_output_filenames_c_flat_hierarchy_test = unittest.make(_compute_output_filenames_c_flat_hierarchy_test)
 compute_output_filenames_c_combined_test = unittest.make(_compute_output_filenames_c_combined_test)
 
+# Analysis tests pinning which .coco files each kind of popili action reads. The
+# fixture packages are app, with test sources, depending on base, with test
+# sources of its own that app must never see.
+
+def _coco_basenames(files):
+    return sorted([f.basename for f in files if f.extension == "coco"])
+
+def _action_inputs(env, mnemonic):
+    """The .coco inputs of each action with the given mnemonic, sorted."""
+    inputs = [
+        _coco_basenames(action.inputs.to_list())
+        for action in analysistest.target_actions(env)
+        if action.mnemonic == mnemonic
+    ]
+    asserts.true(env, len(inputs) > 0, "expected a %s action" % mnemonic)
+    return sorted(inputs)
+
+def _package_info_test(ctx):
+    """Test that test sources are not collected from dependencies."""
+    env = analysistest.begin(ctx)
+    info = analysistest.target_under_test(env)[CocoPackageInfo]
+
+    asserts.equals(env, ["App.coco", "Base.coco"], _coco_basenames(info.srcs.to_list()))
+    asserts.equals(env, ["AppTest.coco"], _coco_basenames(info.test_srcs.to_list()))
+
+    return analysistest.end(env)
+
+def _typecheck_inputs_test(ctx):
+    """Test that typecheck reads the package's test sources but not those of its dependencies."""
+    env = analysistest.begin(ctx)
+
+    asserts.equals(env, [["App.coco", "AppTest.coco", "Base.coco"]], _action_inputs(env, "CocoTypecheck"))
+
+    return analysistest.end(env)
+
+def _generate_inputs_test(ctx):
+    """Test that generating test outputs reads the package's own test sources only."""
+    env = analysistest.begin(ctx)
+
+    asserts.equals(env, [["App.coco", "AppTest.coco", "Base.coco"]], _action_inputs(env, "CocoGenerate"))
+
+    return analysistest.end(env)
+
+def _diagram_inputs_test(ctx):
+    """Test that diagrams only read production sources."""
+    env = analysistest.begin(ctx)
+
+    asserts.equals(env, [["App.coco", "Base.coco"]], _action_inputs(env, "CocoDiagram"))
+
+    return analysistest.end(env)
+
+def _verification_inputs_test(ctx):
+    """Test that verification reads the package's test sources but not those of its dependencies."""
+    env = analysistest.begin(ctx)
+
+    asserts.equals(env, [["App.coco", "AppTest.coco", "Base.coco"]], _action_inputs(env, "CocoVerify"))
+
+    return analysistest.end(env)
+
+def _verify_test_runfiles_test(ctx):
+    """Test that coco_verify_test ships the package's test sources but not those of its dependencies."""
+    env = analysistest.begin(ctx)
+    runfiles = analysistest.target_under_test(env)[DefaultInfo].default_runfiles.files
+
+    asserts.equals(env, ["App.coco", "AppTest.coco", "Base.coco"], _coco_basenames(runfiles.to_list()))
+
+    return analysistest.end(env)
+
+def _wrapper_script(env):
+    """The content of the wrapper script of a coco_verify_test."""
+    scripts = [
+        action.content
+        for action in analysistest.target_actions(env)
+        if action.mnemonic == "FileWrite" and action.outputs.to_list()[0].basename.endswith("-cmd.sh")
+    ]
+    asserts.equals(env, 1, len(scripts))
+    return scripts[0]
+
+def _verify_test_shards_by_target_test(ctx):
+    """Test that each coco_verify_test shard passes its share of the targets to popili, never source files."""
+    env = analysistest.begin(ctx)
+    script = _wrapper_script(env)
+
+    asserts.true(env, "shard_targets=(\n  \"App\"\n  \"AppTest\"\n)" in script, "expected the sorted targets:\n" + script)
+    asserts.true(env, "\"${selected[@]}\"" in script, "expected the selected targets to be passed to popili")
+    asserts.false(env, ".coco" in script, "source files must not be passed to popili verify")
+
+    return analysistest.end(env)
+
+def _verify_test_first_shard_test(ctx):
+    """Test that without targets only the first coco_verify_test shard verifies, and that it verifies everything."""
+    env = analysistest.begin(ctx)
+    script = _wrapper_script(env)
+
+    asserts.true(env, "if (( TEST_SHARD_INDEX != 0 )); then" in script, "expected the other shards to do nothing")
+    asserts.false(env, "selected" in script, "expected the whole package to be verified")
+
+    return analysistest.end(env)
+
+def _format_check_markers_test(ctx):
+    """Test that each format check's marker mirrors the path of its file, so distinct files never share a marker."""
+    env = analysistest.begin(ctx)
+    target = analysistest.target_under_test(env)
+    prefix = "%s.format/" % target.label.name
+
+    markers = sorted([
+        action.outputs.to_list()[0].short_path
+        for action in analysistest.target_actions(env)
+        if action.mnemonic == "CocoFormatCheck"
+    ])
+    asserts.equals(
+        env,
+        sorted([
+            paths.join(target.label.package, prefix + f.short_path + ".ok")
+            for f in target[CocoPackageInfo].direct_srcs.to_list() + target[CocoPackageInfo].direct_test_srcs.to_list()
+        ]),
+        markers,
+    )
+
+    return analysistest.end(env)
+
+package_info_test = analysistest.make(_package_info_test)
+typecheck_inputs_test = analysistest.make(_typecheck_inputs_test)
+generate_inputs_test = analysistest.make(_generate_inputs_test)
+diagram_inputs_test = analysistest.make(_diagram_inputs_test)
+verification_inputs_test = analysistest.make(_verification_inputs_test)
+verify_test_runfiles_test = analysistest.make(_verify_test_runfiles_test)
+format_check_markers_test = analysistest.make(_format_check_markers_test)
+verify_test_shards_by_target_test = analysistest.make(_verify_test_shards_by_target_test)
+verify_test_first_shard_test = analysistest.make(_verify_test_first_shard_test)
+
+def coco_input_sets_test_suite(name):
+    """Create the fixture packages and the analysis tests of their action inputs.
+
+    Args:
+        name: The name of the test suite.
+    """
+    testdata = "testdata/input_sets"
+
+    # The fixtures are only analyzed, never built
+    coco_package(
+        name = name + "_base",
+        srcs = [testdata + "/base/src/Base.coco"],
+        test_srcs = [testdata + "/base/test/BaseTest.coco"],
+        package = testdata + "/base/Coco.toml",
+        tags = ["manual"],
+    )
+    coco_package(
+        name = name + "_app",
+        srcs = [testdata + "/app/src/App.coco"],
+        test_srcs = [testdata + "/app/test/AppTest.coco"],
+        package = testdata + "/app/Coco.toml",
+        typecheck = True,
+        deps = [name + "_base"],
+        tags = ["manual"],
+    )
+    coco_package(
+        name = name + "_app_format",
+        srcs = [testdata + "/app/src/App.coco"],
+        test_srcs = [testdata + "/app/test/AppTest.coco"],
+        package = testdata + "/app/Coco.toml",
+        format_check = True,
+        deps = [name + "_base"],
+        tags = ["manual"],
+    )
+    coco_generate(
+        name = name + "_app_cpp",
+        language = "cpp",
+        package = name + "_app",
+        tags = ["manual"],
+    )
+    coco_state_diagram(
+        name = name + "_app_states",
+        package = name + "_app",
+        tags = ["manual"],
+    )
+    coco_verification(
+        name = name + "_app_verification",
+        package = name + "_app",
+        tags = ["manual"],
+    )
+    coco_verify_test(
+        name = name + "_app_verify",
+        package = name + "_app",
+        tags = ["manual"],
+    )
+    coco_verify_test(
+        name = name + "_app_verify_targets",
+        package = name + "_app",
+        shard_count = 2,
+        targets = ["AppTest", "App"],
+        tags = ["manual"],
+    )
+
+    tests = {
+        "package_info": (package_info_test, "_app"),
+        "typecheck_inputs": (typecheck_inputs_test, "_app"),
+        "generate_inputs": (generate_inputs_test, "_app_cpp"),
+        "diagram_inputs": (diagram_inputs_test, "_app_states"),
+        "verification_inputs": (verification_inputs_test, "_app_verification"),
+        "verify_test_runfiles": (verify_test_runfiles_test, "_app_verify"),
+        "format_check_markers": (format_check_markers_test, "_app_format"),
+        "verify_test_shards_by_target": (verify_test_shards_by_target_test, "_app_verify_targets"),
+        "verify_test_first_shard": (verify_test_first_shard_test, "_app_verify"),
+    }
+    for test_name, (test, target) in tests.items():
+        test(
+            name = "%s_%s_test" % (name, test_name),
+            target_under_test = name + target,
+        )
+
+    native.test_suite(
+        name = name,
+        tests = ["%s_%s_test" % (name, test_name) for test_name in tests],
+    )
+
 def coco_test_suite(name):
     """Create test suite for coco functions.
 
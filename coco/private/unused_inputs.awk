@@ -0,0 +1,45 @@
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Reads a pruning manifest (see _pruning_args in coco.bzl) and prints the input
+# .coco files that cannot be reached through import declarations from the root
+# files. popili resolves `import a.b.C` to a/b/C.coco under some package's source
+# directory, so every input ending in that path is treated as read.
+#
+# Usage: awk -f unused_inputs.awk <manifest>
+/^root / { path = substr($0, 6); used[path] = 1; queue[++queued] = path }
+/^input / { inputs[++count] = substr($0, 7) }
+END {
+    for (i = 1; i <= queued; i++) {
+        while ((getline line < queue[i]) > 0) {
+            if (line !~ /^[ \t]*import[ \t]/) continue
+            sub(/^[ \t]*import[ \t]+((un)?qualified[ \t]+)?/, "", line)
+            if (!match(line, /^[A-Za-z_][A-Za-z0-9_.]*/)) continue
+            module = substr(line, 1, RLENGTH)
+            gsub(/\./, "/", module)
+            suffix = "/" module ".coco"
+            for (j = 1; j <= count; j++) {
+                path = "/" inputs[j]
+                if (!(inputs[j] in used) && substr(path, length(path) - length(suffix) + 1) == suffix) {
+                    used[inputs[j]] = 1
+                    queue[++queued] = inputs[j]
+                }
+            }
+        }
+        close(queue[i])
+    }
+    for (j = 1; j <= count; j++) {
+        if (!(inputs[j] in used)) print inputs[j]
+    }
+}
@@ -24,6 +24,7 @@ def _coco_toolchain_impl(ctx):
         license_source = ctx.attr.license_source,
         license_token = ctx.attr.license_token,
         auth_token_path = ctx.attr.auth_token_path,
+        license_file_path = ctx.attr.license_file_path,
     )
     return toolchain
 
@@ -56,8 +57,12 @@ coco_toolchain = rule(
             allow_single_file = True,
             mandatory = True,
         ),
+        "license_file_path": attr.string(
+            doc = "The path to the license file to use when license_source is 'action_license_file'. The file must be available in the execution environment. Optional.",
+            default = "",
+        ),
         "license_source": attr.string(
-            doc = "The license source mode for this toolchain. Can be 'local_user', 'local_acquire', 'token', 'action_environment', or 'action_file'. If not specified, defaults to 'local_user'. Can be overridden via --@rules_coco//:license_source flag.",
+            doc = "The license source mode for this toolchain. Can be 'local_user', 'local_acquire', 'token', 'action_environment', 'action_file', or 'action_license_file'. If not specified, defaults to 'local_user'. Can be overridden via --@rules_coco//:license_source flag.",
             default = "",
         ),
         "license_token": attr.string(
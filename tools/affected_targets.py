@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Select the Coco targets affected by a set of changed files.
+
+Reads the graph of Coco targets from a query export of the tree being tested,
+e.g.
+
+    bazel query 'kind("coco_|cc_library", //...)' --output=streamed_jsonproto > graph.json
+
+(`--output=jsonproto`, and cquery's `--output=jsonproto`, are accepted too) and
+the changed files, relative to the workspace root, as arguments or one per line
+on stdin:
+
+    git diff --name-only origin/main | affected_targets.py --graph graph.json
+
+and prints the labels of the coco_verify_test, coco_fmt_test, diagram and
+coco_cc_library/coco_c_library targets that the changes can affect, one per
+line. A coco_package is affected by changes to its srcs, test_srcs or Coco.toml,
+to the Coco.toml of its coco_workspace or any enclosing workspace, and to the
+packages it depends on. Code generation is also affected by changes to its
+`*_regenerate_packages`. coco_fmt_test targets are only affected by their own
+package's files and workspaces, since formatting does not depend on other
+packages.
+
+A changed .coco or Coco.toml file that no target lists (e.g. one that was added
+or deleted) affects every coco_package in its Bazel package, as does a changed
+BUILD file. A changed .bzl file, MODULE.bazel or .bazelrc selects every target.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+# The attributes of each rule class that refer to other targets in the graph
+EDGES = {
+    "_coco_package": ("deps", "workspace"),
+    "_coco_workspace": ("parent",),
+    "_coco_generate": ("package", "c_regenerate_packages", "cpp_regenerate_packages", "csharp_regenerate_packages"),
+    "_coco_test_outputs": ("package",),
+    "_coco_cc_gen": ("package",),
+    "_coco_verification": ("package",),
+    "_coco_verify_test": ("package", "verification"),
+    "_coco_counterexample_diagram": ("package",),
+    "_coco_architecture_diagram": ("package",),
+    "_coco_state_diagram": ("package",),
+    "cc_library": ("srcs", "deps"),
+}
+
+# The attributes of each rule class that list source files
+FILES = {
+    "_coco_package": ("srcs", "test_srcs", "package"),
+    "_coco_workspace": ("workspace",),
+}
+
+KINDS = {
+    "verify": ("_coco_verify_test",),
+    "format": ("_coco_fmt_test",),
+    "diagram": ("_coco_architecture_diagram", "_coco_state_diagram", "_coco_counterexample_diagram"),
+    "library": ("cc_library",),
+}
+
+# Changes to these files can change any target
+GLOBAL_FILES = ("MODULE.bazel", "WORKSPACE", "WORKSPACE.bazel", ".bazelrc", ".bazelversion")
+
+BUILD_FILES = ("BUILD", "BUILD.bazel")
+
+
+class Rule:
+
+    def __init__(self, label: str, kind: str, attributes: Dict[str, List[str]]):
+        self.label = label
+        self.kind = kind
+        self.attributes = attributes
+
+    def labels(self, names: Iterable[str]) -> List[str]:
+        return [label for name in names for label in self.attributes.get(name, [])]
+
+
+def _attribute_labels(attribute: Dict) -> List[str]:
+    if "stringListValue" in attribute:
+        return attribute["stringListValue"]
+    if attribute.get("stringValue"):
+        return [attribute["stringValue"]]
+    return []
+
+
+def _targets(text: str) -> Iterable[Dict]:
+    text = text.strip()
+    if not text:
+        return []
+    try:
+        document = json.loads(text)
+    except json.JSONDecodeError:
+        # --output=streamed_jsonproto: one target per line
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    if "target" in document:
+        return document["target"]
+    if "results" in document:
+        return [result["target"] for result in document["results"]]
+    return [document]
+
+
+def load_graph(text: str) -> Dict[str, Rule]:
+    """Parses a query export into the rules it lists, keyed by label."""
+    graph = {}
+    for target in _targets(text):
+        if target.get("type") != "RULE":
+            continue
+        rule = target["rule"]
+        attributes = {a["name"]: _attribute_labels(a) for a in rule.get("attribute", [])}
+        graph[rule["name"]] = Rule(rule["name"], rule["ruleClass"], attributes)
+    return graph
+
+
+def label_path(label: str) -> Optional[str]:
+    """Returns the workspace-relative path of a main repository label, or None for other repositories."""
+    if label.startswith("@@//"):
+        label = label[2:]
+    if not label.startswith("//"):
+        return None
+    package, _, name = label[2:].partition(":")
+    return f"{package}/{name}" if package else name
+
+
+def _bazel_package(label: str) -> Optional[str]:
+    if label_path(label) is None:
+        return None
+    return label.lstrip("@").partition(":")[0][2:]
+
+
+def _enclosing_package(path: str, packages: Dict[str, Set[str]]) -> Optional[str]:
+    parts = path.split("/")[:-1]
+    while True:
+        candidate = "/".join(parts)
+        if candidate in packages:
+            return candidate
+        if not parts:
+            return None
+        parts.pop()
+
+
+def changed_rules(graph: Dict[str, Rule], changed_files: Iterable[str]) -> Optional[Set[str]]:
+    """Returns the labels of the rules whose own files changed, or None if any rule may have changed."""
+    owners: Dict[str, Set[str]] = {}
+    packages: Dict[str, Set[str]] = {}
+    for rule in graph.values():
+        for label in rule.labels(FILES.get(rule.kind, ())):
+            path = label_path(label)
+            if path is not None:
+                owners.setdefault(path, set()).add(rule.label)
+        package = _bazel_package(rule.label)
+        if package is not None:
+            packages.setdefault(package, set()).add(rule.label)
+
+    changed = set()
+    for path in changed_files:
+        path = path.strip()
+        if path.startswith("./"):
+            path = path[2:]
+        if not path:
+            continue
+        directory, _, name = path.rpartition("/")
+        if name in GLOBAL_FILES or name.endswith(".bzl"):
+            return None
+        if path in owners:
+            changed |= owners[path]
+        elif name in BUILD_FILES:
+            changed |= packages.get(directory, set())
+        elif name.endswith(".coco") or name == "Coco.toml":
+            package = _enclosing_package(path, packages)
+            if package is not None:
+                changed |= {label for label in packages[package] if graph[label].kind == "_coco_package"}
+    return changed
+
+
+def _reverse_closure(graph: Dict[str, Rule], roots: Set[str], edges: Dict[str, Iterable[str]]) -> Set[str]:
+    """Returns roots and every rule that reaches one of them through the given attributes of each rule class."""
+    dependents: Dict[str, List[str]] = {}
+    for rule in graph.values():
+        for dep in rule.labels(edges.get(rule.kind, ())):
+            dependents.setdefault(dep, []).append(rule.label)
+    result = set(roots)
+    pending = list(roots)
+    while pending:
+        for dependent in dependents.get(pending.pop(), []):
+            if dependent not in result:
+                result.add(dependent)
+                pending.append(dependent)
+    return result
+
+
+def affected_rules(graph: Dict[str, Rule], changed: Optional[Set[str]]) -> Set[str]:
+    """Returns the labels of the rules affected by changes to the rules in changed (None for all rules)."""
+    if changed is None:
+        return set(graph)
+    affected = _reverse_closure(graph, changed, EDGES)
+
+    # Formatting only depends on the package's own files and its workspaces' settings
+    local = _reverse_closure(graph, changed, {"_coco_package": ("workspace",), "_coco_workspace": ("parent",)})
+    for rule in graph.values():
+        if rule.kind == "_coco_fmt_test" and any(package in local for package in rule.labels(("package",))):
+            affected.add(rule.label)
+    return affected
+
+
+def _is_coco_library(graph: Dict[str, Rule], rule: Rule) -> bool:
+    """Whether a cc_library was created by coco_library, i.e. compiles a _coco_cc_gen target."""
+    return any(graph[src].kind == "_coco_cc_gen" for src in rule.labels(("srcs",)) if src in graph)
+
+
+def select(graph: Dict[str, Rule], changed_files: Iterable[str], kinds: Iterable[str] = KINDS) -> Dict[str, List[str]]:
+    """Returns the sorted labels of the affected targets of each requested kind."""
+    affected = affected_rules(graph, changed_rules(graph, changed_files))
+    result = {}
+    for kind in kinds:
+        result[kind] = sorted(label for label in affected if graph[label].kind in KINDS[kind] and
+                              (kind != "library" or _is_coco_library(graph, graph[label])))
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--graph",
+                        type=Path,
+                        required=True,
+                        help="bazel query or cquery output (streamed_jsonproto or jsonproto) of the Coco targets")
+    parser.add_argument("--kinds",
+                        nargs="+",
+                        choices=list(KINDS),
+                        default=list(KINDS),
+                        help="Kinds of target to print (default: all)")
+    parser.add_argument("--json", action="store_true", help="Print a JSON object of labels by kind")
+    parser.add_argument("changed_files",
+                        nargs="*",
+                        help="Changed files relative to the workspace root (default: read from stdin)")
+    options = parser.parse_args(argv)
+
+    graph = load_graph(options.graph.read_text())
+    changed_files = options.changed_files or sys.stdin.read().splitlines()
+    selected = select(graph, changed_files, options.kinds)
+    if options.json:
+        print(json.dumps(selected, indent=2))
+    else:
+        for labels in selected.values():
+            for label in labels:
+                print(label)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
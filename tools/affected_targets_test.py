@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for selecting the Coco targets affected by changed files."""
+
+import contextlib
+import io
+import json
+import sys
+import unittest
+import unittest.mock
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import affected_targets  # noqa: E402
+
+GRAPH = Path(__file__).resolve().parent / "testdata" / "affected_targets" / "graph.json"
+
+
+class AffectedTargetsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = affected_targets.load_graph(GRAPH.read_text())
+
+    def select(self, *changed_files):
+        return affected_targets.select(self.graph, changed_files)
+
+    def test_load_graph_skips_source_files(self):
+        self.assertNotIn("//lib:base/Coco.toml", self.graph)
+        self.assertEqual("_coco_package", self.graph["//lib:base"].kind)
+        self.assertEqual(["//lib:base"], self.graph["//lib:app"].labels(["deps"])[:1])
+
+    def test_load_graph_accepts_jsonproto(self):
+        targets = [json.loads(line) for line in GRAPH.read_text().splitlines()]
+        for text in [json.dumps({"target": targets}), json.dumps({"results": [{"target": t} for t in targets]})]:
+            self.assertEqual(set(self.graph), set(affected_targets.load_graph(text)))
+
+    def test_change_propagates_to_dependents(self):
+        self.assertEqual(
+            {
+                "verify": ["//lib:app_report", "//lib:app_verify", "//lib:base_verify"],
+                "format": ["//lib:base_fmt_test"],
+                "diagram": ["//lib:app_architecture", "//lib:app_counterexamples"],
+                "library": ["//lib:app_cc", "//lib:app_cc_test_lib"],
+            }, self.select("lib/base/src/Timer.coco"))
+
+    def test_leaf_change_does_not_affect_dependencies(self):
+        selected = self.select("lib/app/Coco.toml")
+        self.assertEqual(["//lib:app_report", "//lib:app_verify"], selected["verify"])
+        self.assertEqual(["//lib:app_fmt_test"], selected["format"])
+
+    def test_workspace_change_affects_nested_members(self):
+        self.assertEqual(
+            {
+                "verify": ["//ws/inner/pkg:pkg_verify"],
+                "format": ["//ws/inner/pkg:pkg_fmt_test"],
+                "diagram": ["//ws/inner/pkg:pkg_states"],
+                "library": [],
+            }, self.select("ws/Coco.toml"))
+
+    def test_regenerate_packages_edge(self):
+        selected = self.select("regen/shared/Shared.coco")
+        self.assertEqual(["//regen:shared_verify"], selected["verify"])
+        self.assertEqual(["//regen:tool_c_lib"], selected["library"])
+
+    def test_unlisted_coco_file_affects_enclosing_bazel_package(self):
+        selected = self.select("ws/inner/pkg/src/New.coco")
+        self.assertEqual(["//ws/inner/pkg:pkg_verify"], selected["verify"])
+        self.assertEqual(["//ws/inner/pkg:pkg_fmt_test"], selected["format"])
+
+    def test_build_file_change_affects_its_package(self):
+        selected = self.select("regen/BUILD.bazel")
+        self.assertEqual(["//regen:shared_verify", "//regen:tool_verify"], selected["verify"])
+        self.assertEqual([], self.select("docs/BUILD")["verify"])
+
+    def test_bzl_change_selects_everything(self):
+        selected = self.select("coco/private/coco.bzl")
+        self.assertEqual(6, len(selected["verify"]))
+        self.assertEqual(3, len(selected["format"]))
+        self.assertNotIn("//lib:helpers", selected["library"])
+
+    def test_unrelated_change_selects_nothing(self):
+        self.assertEqual({kind: [] for kind in affected_targets.KINDS}, self.select("README.md", "lib/helpers.cc"))
+
+    def test_main_reads_changed_files_from_stdin(self):
+        stdout = io.StringIO()
+        stdin = io.StringIO("./lib/app/src/App.coco\n")
+        with contextlib.redirect_stdout(stdout), unittest.mock.patch("sys.stdin", stdin):
+            self.assertEqual(0, affected_targets.main(["--graph", str(GRAPH), "--kinds", "verify", "format"]))
+        self.assertEqual(["//lib:app_report", "//lib:app_verify", "//lib:app_fmt_test"], stdout.getvalue().split())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark the analysis of rules_coco targets in synthetic workspaces.
+
+For each requested (shape, packages, files) scale, generates a workspace with
+synthetic_workspace.py and, for each of the coco_package, coco_generate and
+coco_library targets of every package, records:
+
+  analysis_seconds   wall time of `bazel build --nobuild` with a warm server
+                     but an empty analysis cache
+  actions            number of actions registered (from `bazel aquery`)
+  action_inputs      total number of inputs over those actions
+  heap_mb            `bazel info used-heap-size-after-gc` after analysis, a
+                     proxy for Skyframe memory
+
+The workspaces use a local popili toolchain, so no popili download is needed.
+To compare two versions of the rules, run the benchmark once per checkout with
+--rules-coco.
+"""
+
+import argparse
+import json
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import synthetic_workspace  # noqa: E402
+
+# Target name suffix of each measured rule, as generated by synthetic_workspace
+KINDS = {
+    "coco_package": "",
+    "coco_generate": "_cpp",
+    "coco_library": "_cc",
+}
+
+
+def targets(packages: int, kind: str) -> List[str]:
+    suffix = KINDS[kind]
+    names = [synthetic_workspace.package_name(p) for p in range(packages)]
+    return [f"//{name}:{name}{suffix}" for name in names]
+
+
+def count_action_inputs(aquery: Dict) -> int:
+    """Sums the number of distinct inputs of each action in `aquery --output=jsonproto` output."""
+    dep_sets = {d["id"]: d for d in aquery.get("depSetOfFiles", [])}
+    expanded: Dict[int, frozenset] = {}
+
+    def expand(dep_set_id: int) -> frozenset:
+        if dep_set_id not in expanded:
+            dep_set = dep_sets[dep_set_id]
+            files = set(dep_set.get("directArtifactIds", []))
+            for child in dep_set.get("transitiveDepSetIds", []):
+                files |= expand(child)
+            expanded[dep_set_id] = frozenset(files)
+        return expanded[dep_set_id]
+
+    total = 0
+    for action in aquery.get("actions", []):
+        inputs = set()
+        for dep_set_id in action.get("inputDepSetIds", []):
+            inputs |= expand(dep_set_id)
+        total += len(inputs)
+    return total
+
+
+def require_bazel() -> None:
+    """Exits with an explanation, rather than a traceback, if bazel is not on PATH."""
+    if shutil.which("bazel") is None:
+        sys.exit("bazel (or bazelisk installed as bazel) must be on PATH to run the benchmark")
+
+
+def _bazel(workspace: Path, output_base: Path, *args: str, capture: bool = False) -> str:
+    result = subprocess.run(["bazel", f"--output_base={output_base}"] + list(args),
+                            cwd=workspace,
+                            check=True,
+                            stdout=subprocess.PIPE if capture else subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL,
+                            text=True)
+    return result.stdout if capture else ""
+
+
+def measure(workspace: Path, output_base: Path, target_patterns: List[str]) -> Dict:
+    pattern_file = workspace / "targets.txt"
+    pattern_file.write_text("\n".join(target_patterns) + "\n")
+    target_flag = f"--target_pattern_file={pattern_file}"
+
+    # Load everything (and fetch external repositories) once, then discard the
+    # analysis cache so the timed run analyses from scratch on a warm server.
+    _bazel(workspace, output_base, "build", "--nobuild", target_flag)
+    _bazel(workspace, output_base, "build", "--nobuild", "--discard_analysis_cache", target_flag)
+    start = time.monotonic()
+    _bazel(workspace, output_base, "build", "--nobuild", target_flag)
+    analysis_seconds = time.monotonic() - start
+
+    heap = _bazel(workspace, output_base, "info", "used-heap-size-after-gc", capture=True)
+    match = re.match(r"\s*([0-9.]+)\s*MB", heap)
+
+    query = "deps(set(%s))" % " ".join(target_patterns)
+    aquery = json.loads(_bazel(workspace, output_base, "aquery", "--output=jsonproto", query, capture=True) or "{}")
+
+    return {
+        "analysis_seconds": round(analysis_seconds, 2),
+        "actions": len(aquery.get("actions", [])),
+        "action_inputs": count_action_inputs(aquery),
+        "heap_mb": float(match.group(1)) if match else None,
+    }
+
+
+def print_table(results: List[Dict]) -> None:
+    headers = ("Shape", "Packages", "Files", "Kind", "Analysis", "Actions", "Inputs", "Heap")
+    rows = [(r["shape"], str(r["packages"]), str(r["files"]), r["kind"], f"{r['analysis_seconds']:.2f}s",
+             str(r["actions"]), str(r["action_inputs"]), "?" if r["heap_mb"] is None else f"{r['heap_mb']:.0f}MB")
+            for r in results]
+    widths = [max(len(row[i]) for row in rows + [headers]) for i in range(len(headers))]
+    for row in [headers] + rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+
+def main(argv=None) -> None:
+    staged = synthetic_workspace.ROOT / "e2e" / "local_toolchain" / "staged"
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--shapes", nargs="+", choices=synthetic_workspace.SHAPES, default=["chain"])
+    parser.add_argument("--packages", nargs="+", type=int, default=[10, 100], help="Package counts to measure")
+    parser.add_argument("--files", nargs="+", type=int, default=[10], help=".coco files per package to measure")
+    parser.add_argument("--kinds", nargs="+", choices=sorted(KINDS), default=sorted(KINDS))
+    parser.add_argument("--popili", default=str(staged / "popili"), help="Local popili toolchain directory")
+    parser.add_argument("--cc-runtime", default=str(staged / "cpp-runtime"), help="Local C++ runtime directory")
+    parser.add_argument("--rules-coco",
+                        type=Path,
+                        default=synthetic_workspace.ROOT,
+                        help="rules_coco checkout to benchmark (default: this one)")
+    parser.add_argument("--work-dir", type=Path, help="Where to generate workspaces (default: a temporary directory)")
+    parser.add_argument("--json", type=Path, help="Also write the results to this JSON file")
+    options = parser.parse_args(argv)
+    require_bazel()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = options.work_dir or Path(tmp)
+        results = []
+        for shape in options.shapes:
+            for packages in options.packages:
+                for files in options.files:
+                    name = f"{shape}-{packages}x{files}"
+                    workspace = work_dir / name
+                    synthetic_workspace.generate(workspace, packages, files, shape,
+                                                 str(Path(options.popili).resolve()),
+                                                 str(Path(options.cc_runtime).resolve()),
+                                                 rules_coco=options.rules_coco.resolve())
+                    output_base = work_dir / "output_bases" / name
+                    try:
+                        for kind in options.kinds:
+                            print(f"Measuring {kind} in {name}...", flush=True)
+                            result = {"shape": shape, "packages": packages, "files": files, "kind": kind}
+                            result.update(measure(workspace, output_base, targets(packages, kind)))
+                            results.append(result)
+                    finally:
+                        subprocess.run(["bazel", f"--output_base={output_base}", "shutdown"],
+                                       cwd=workspace,
+                                       stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.DEVNULL)
+
+    print()
+    print_table(results)
+    if options.json:
+        options.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
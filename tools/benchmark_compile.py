@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark compiling generated C++ with and without unity builds.
+
+For each requested coco_cc_library unity_batch_size, generates a workspace with
+synthetic_workspace.py, generates its code and then records:
+
+  compile_seconds   wall time of building every coco_cc_library target once
+                    their code has been generated, i.e. of the C++ compile
+                    and link actions alone
+  compile_actions   number of CppCompile actions (from `bazel aquery`)
+
+Each batch size gets its own output base, so nothing is cached between them.
+Like benchmark_analysis.py, the workspaces use a local popili toolchain.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import benchmark_analysis  # noqa: E402
+import synthetic_workspace  # noqa: E402
+
+
+def count_mnemonic(aquery: Dict, mnemonic: str) -> int:
+    """Counts the actions with the given mnemonic in `aquery --output=jsonproto` output."""
+    return sum(1 for action in aquery.get("actions", []) if action.get("mnemonic") == mnemonic)
+
+
+def _bazel(workspace: Path, output_base: Path, *args: str, capture: bool = False) -> str:
+    result = subprocess.run(["bazel", f"--output_base={output_base}"] + list(args),
+                            cwd=workspace,
+                            check=True,
+                            stdout=subprocess.PIPE if capture else subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL,
+                            text=True)
+    return result.stdout if capture else ""
+
+
+def measure(workspace: Path, output_base: Path, packages: int) -> Dict:
+    generate_targets = benchmark_analysis.targets(packages, "coco_generate")
+    library_targets = benchmark_analysis.targets(packages, "coco_library")
+
+    # Generate the code first so that the timed build only compiles it.
+    _bazel(workspace, output_base, "build", *generate_targets)
+    start = time.monotonic()
+    _bazel(workspace, output_base, "build", *library_targets)
+    compile_seconds = time.monotonic() - start
+
+    query = "deps(set(%s))" % " ".join(library_targets)
+    aquery = json.loads(_bazel(workspace, output_base, "aquery", "--output=jsonproto", query, capture=True) or "{}")
+
+    return {
+        "compile_seconds": round(compile_seconds, 2),
+        "compile_actions": count_mnemonic(aquery, "CppCompile"),
+    }
+
+
+def print_table(results: List[Dict]) -> None:
+    headers = ("Shape", "Packages", "Files", "Batch", "Compile", "Actions")
+    rows = [(r["shape"], str(r["packages"]), str(r["files"]), str(r["unity_batch_size"]),
+             f"{r['compile_seconds']:.2f}s", str(r["compile_actions"])) for r in results]
+    widths = [max(len(row[i]) for row in rows + [headers]) for i in range(len(headers))]
+    for row in [headers] + rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+
+def main(argv=None) -> None:
+    staged = synthetic_workspace.ROOT / "e2e" / "local_toolchain" / "staged"
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--shape", choices=synthetic_workspace.SHAPES, default="chain")
+    parser.add_argument("--packages", type=int, default=4, help="Number of packages (default: 4)")
+    parser.add_argument("--files", type=int, default=50, help=".coco files per package (default: 50)")
+    parser.add_argument("--unity-batch-sizes",
+                        nargs="+",
+                        type=int,
+                        default=[0, 8, 32],
+                        help="unity_batch_size values to measure; 0 compiles every file on its own")
+    parser.add_argument("--popili", default=str(staged / "popili"), help="Local popili toolchain directory")
+    parser.add_argument("--cc-runtime", default=str(staged / "cpp-runtime"), help="Local C++ runtime directory")
+    parser.add_argument("--work-dir", type=Path, help="Where to generate workspaces (default: a temporary directory)")
+    parser.add_argument("--json", type=Path, help="Also write the results to this JSON file")
+    options = parser.parse_args(argv)
+    benchmark_analysis.require_bazel()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = options.work_dir or Path(tmp)
+        results = []
+        for batch_size in options.unity_batch_sizes:
+            name = f"{options.shape}-{options.packages}x{options.files}-unity{batch_size}"
+            workspace = work_dir / name
+            synthetic_workspace.generate(workspace, options.packages, options.files, options.shape,
+                                         str(Path(options.popili).resolve()),
+                                         str(Path(options.cc_runtime).resolve()), batch_size)
+            output_base = work_dir / "output_bases" / name
+            try:
+                print(f"Measuring {name}...", flush=True)
+                result = {
+                    "shape": options.shape,
+                    "packages": options.packages,
+                    "files": options.files,
+                    "unity_batch_size": batch_size,
+                }
+                result.update(measure(workspace, output_base, options.packages))
+                results.append(result)
+            finally:
+                subprocess.run(["bazel", f"--output_base={output_base}", "shutdown"],
+                               cwd=workspace,
+                               stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+
+    print()
+    print_table(results)
+    if options.json:
+        options.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Explain cache misses of Coco actions from two Bazel execution logs.
+
+Record the execution log of two builds that should share cache entries (e.g.
+the same commit built by two users or two CI runners):
+
+    bazel build //... --execution_log_json_file=/tmp/before.json
+    bazel build //... --execution_log_json_file=/tmp/after.json
+
+and compare them:
+
+    cache_report.py /tmp/before.json /tmp/after.json
+
+This prints the cache hit rate of each Coco mnemonic in the second build. Then,
+for each Coco action of the second build that missed the cache, it prints how the
+action's arguments, environment and inputs differ from the same action (same
+target, mnemonic and outputs) in the first build, with the likely cause:
+
+  license token   COCOTEC_AUTH_TOKEN differs in the environment
+  license file    a license file input differs, e.g. one per user
+  configuration   paths differ only in their bazel-out/<configuration>
+                  directory, e.g. a --output under a different genfiles_dir
+  popili version  popili itself differs
+
+Values of environment variables that look like secrets are never printed.
+
+Compact logs (--execution_log_compact_file) are zstd-compressed protobuf. Read
+them by passing --converter, Bazel's execution log converter (built from
+//src/tools/execlog:converter in the Bazel source tree), which is run as
+
+    <converter> --input=compact:<log> --output=json:<json>
+"""
+
+import argparse
+import difflib
+import json
+import re
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+COCO_MNEMONICS = ("CocoGenerate", "CocoTypecheck", "CocoDiagram", "CocoVerify", "CocoFormatCheck", "CocoFetchLicense")
+
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+_CONFIGURATION = re.compile(r"bazel-out/[^/]+/")
+
+_SECRET = re.compile(r"TOKEN|SECRET|PASSWORD|KEY|CREDENTIAL", re.IGNORECASE)
+
+
+def _parse_json_stream(text: str) -> List[Dict]:
+    """Parses concatenated JSON objects, whether one per line or pretty-printed."""
+    decoder = json.JSONDecoder()
+    spawns = []
+    index = 0
+    while True:
+        while index < len(text) and text[index].isspace():
+            index += 1
+        if index == len(text):
+            return spawns
+        spawn, index = decoder.raw_decode(text, index)
+        spawns.append(spawn)
+
+
+def read_log(path: Path, converter: Optional[str] = None) -> List[Dict]:
+    """Returns the SpawnExec records of a JSON or (with a converter) compact execution log."""
+    with open(path, "rb") as f:
+        compact = f.read(len(_ZSTD_MAGIC)) == _ZSTD_MAGIC
+    if not compact:
+        return _parse_json_stream(path.read_text())
+    if not converter:
+        raise ValueError(f"{path} is a compact execution log; pass --converter to read it")
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "log.json"
+        subprocess.run([converter, f"--input=compact:{path}", f"--output=json:{output}"], check=True)
+        return _parse_json_stream(output.read_text())
+
+
+def without_configuration(path: str) -> str:
+    """Replaces the configuration directory of a bazel-out path, so paths match across configurations."""
+    return _CONFIGURATION.sub("bazel-out/<configuration>/", path)
+
+
+def action_key(spawn: Dict) -> Tuple[str, str, Tuple[str, ...]]:
+    """Identifies the same action across builds: its target, mnemonic and outputs."""
+    outputs = tuple(sorted(without_configuration(path) for path in spawn.get("listedOutputs", [])))
+    return spawn.get("targetLabel", ""), spawn.get("mnemonic", ""), outputs
+
+
+def is_cache_hit(spawn: Dict) -> bool:
+    return bool(spawn.get("cacheHit")) or "cache hit" in spawn.get("runner", "")
+
+
+def hit_rates(spawns: Iterable[Dict], mnemonics: Iterable[str]) -> Dict[str, Tuple[int, int]]:
+    """Returns the number of cache hits and of actions for each mnemonic."""
+    rates = {mnemonic: [0, 0] for mnemonic in mnemonics}
+    for spawn in spawns:
+        rate = rates.get(spawn.get("mnemonic"))
+        if rate is not None:
+            rate[0] += is_cache_hit(spawn)
+            rate[1] += 1
+    return {mnemonic: (hits, total) for mnemonic, (hits, total) in rates.items()}
+
+
+def _env(spawn: Dict) -> Dict[str, str]:
+    return {v["name"]: v.get("value", "") for v in spawn.get("environmentVariables", [])}
+
+
+def _inputs(spawn: Dict) -> Dict[str, str]:
+    return {i["path"]: i.get("digest", {}).get("hash", "") for i in spawn.get("inputs", [])}
+
+
+def _shown(name: str, value: Optional[str]) -> Optional[str]:
+    if value is None or not _SECRET.search(name):
+        return value
+    return "<redacted>"
+
+
+def diff_spawns(before: Dict, after: Dict) -> Dict:
+    """Returns how the arguments, environment and inputs of two runs of an action differ.
+
+    Arguments are diffed as sequences: "arguments" lists [before, after] pairs of
+    differing argument runs, either of which may be empty. "environment" maps each
+    differing variable to its [before, after] values (None when unset), and
+    "inputs" each differing input path to its [before, after] digests.
+    """
+    arguments = []
+    args_before, args_after = before.get("commandArgs", []), after.get("commandArgs", [])
+    for op, i1, i2, j1, j2 in difflib.SequenceMatcher(a=args_before, b=args_after, autojunk=False).get_opcodes():
+        if op != "equal":
+            arguments.append([args_before[i1:i2], args_after[j1:j2]])
+
+    env_before, env_after = _env(before), _env(after)
+    environment = {}
+    for name in sorted(set(env_before) | set(env_after)):
+        if env_before.get(name) != env_after.get(name):
+            environment[name] = [_shown(name, env_before.get(name)), _shown(name, env_after.get(name))]
+
+    inputs_before, inputs_after = _inputs(before), _inputs(after)
+    inputs = {}
+    for path in sorted(set(inputs_before) | set(inputs_after)):
+        if inputs_before.get(path) != inputs_after.get(path):
+            inputs[path] = [inputs_before.get(path), inputs_after.get(path)]
+
+    return {"arguments": arguments, "environment": environment, "inputs": inputs}
+
+
+def _is_popili(path: str) -> bool:
+    return Path(path).name in ("popili", "popili.exe")
+
+
+def causes(diff: Dict) -> List[str]:
+    """Returns the likely causes of the differences found by diff_spawns."""
+    result = []
+    if "COCOTEC_AUTH_TOKEN" in diff["environment"]:
+        result.append("license token")
+    if any("licen" in Path(path).name.lower() for path in diff["inputs"]):
+        result.append("license file")
+
+    # The same arguments or inputs under another bazel-out/<configuration> directory
+    moved_args = any([without_configuration(arg) for arg in before] == [without_configuration(arg) for arg in after]
+                     for before, after in diff["arguments"])
+    only_before = {without_configuration(path) for path, (_, digest) in diff["inputs"].items() if digest is None}
+    only_after = {without_configuration(path) for path, (digest, _) in diff["inputs"].items() if digest is None}
+    moved_inputs = bool(only_before & only_after)
+    if moved_args or moved_inputs:
+        result.append("configuration")
+
+    changed_args = [arg for before, after in diff["arguments"] for arg in before + after]
+    if any(_is_popili(path) for path in list(diff["inputs"]) + changed_args):
+        result.append("popili version")
+    return result
+
+
+def compare(before: List[Dict], after: List[Dict], mnemonics: Iterable[str]) -> List[Dict]:
+    """Explains each cache miss of the given mnemonics in after against the same action in before.
+
+    Returns, for each missed action, its target label, mnemonic, the differences
+    from diff_spawns and their likely causes; "differences" is None when before
+    has no matching action.
+    """
+    mnemonics = set(mnemonics)
+    previous = {action_key(spawn): spawn for spawn in before}
+    misses = []
+    for spawn in after:
+        if spawn.get("mnemonic") not in mnemonics or is_cache_hit(spawn):
+            continue
+        miss = {"target": spawn.get("targetLabel", ""), "mnemonic": spawn.get("mnemonic"), "differences": None}
+        match = previous.get(action_key(spawn))
+        if match is not None:
+            miss["differences"] = diff_spawns(match, spawn)
+            miss["causes"] = causes(miss["differences"])
+        misses.append(miss)
+    return sorted(misses, key=lambda miss: (miss["mnemonic"], miss["target"]))
+
+
+def print_report(rates: Dict[str, Tuple[int, int]], misses: List[Dict]) -> None:
+    headers = ("Mnemonic", "Hits", "Actions", "Hit rate")
+    rows = [(mnemonic, str(hits), str(total), f"{100 * hits / total:.0f}%" if total else "-")
+            for mnemonic, (hits, total) in rates.items()]
+    widths = [max(len(row[i]) for row in rows + [headers]) for i in range(len(headers))]
+    for row in [headers] + rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+    for miss in misses:
+        print()
+        print(f"{miss['mnemonic']} {miss['target']}")
+        differences = miss["differences"]
+        if differences is None:
+            print("  not run by the first build")
+            continue
+        if miss["causes"]:
+            print(f"  likely causes: {', '.join(miss['causes'])}")
+        for before, after in differences["arguments"]:
+            print(f"  arguments: {' '.join(before) or '(none)'} -> {' '.join(after) or '(none)'}")
+        for name, (before, after) in differences["environment"].items():
+            print(f"  env {name}: {before if before is not None else '(unset)'} -> "
+                  f"{after if after is not None else '(unset)'}")
+        for path, (before, after) in differences["inputs"].items():
+            print(f"  input {path}: {before or '(absent)'} -> {after or '(absent)'}")
+        if not any(differences.values()):
+            print("  no differences in arguments, environment or inputs")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("before", type=Path, help="Execution log of the build expected to fill the cache")
+    parser.add_argument("after", type=Path, help="Execution log of the build whose cache misses to explain")
+    parser.add_argument("--mnemonics",
+                        nargs="+",
+                        default=list(COCO_MNEMONICS),
+                        help=f"Mnemonics to report (default: {' '.join(COCO_MNEMONICS)})")
+    parser.add_argument("--converter", help="Bazel's execution log converter, to read compact logs")
+    parser.add_argument("--json", type=Path, help="Also write the hit rates and misses to this JSON file")
+    options = parser.parse_args(argv)
+
+    try:
+        before = read_log(options.before, options.converter)
+        after = read_log(options.after, options.converter)
+    except (OSError, ValueError, subprocess.CalledProcessError) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    rates = hit_rates(after, options.mnemonics)
+    misses = compare(before, after, options.mnemonics)
+    print_report(rates, misses)
+    if options.json:
+        rates_json = {mnemonic: {"hits": hits, "actions": total} for mnemonic, (hits, total) in rates.items()}
+        options.json.write_text(json.dumps({"hit_rates": rates_json, "misses": misses}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for explaining cache misses from execution logs."""
+
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import cache_report  # noqa: E402
+
+TESTDATA = Path(__file__).resolve().parent / "testdata" / "cache_report"
+
+
+class CacheReportTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        # before.json is pretty-printed, after.json has one record per line
+        self.before = cache_report.read_log(TESTDATA / "before.json")
+        self.after = cache_report.read_log(TESTDATA / "after.json")
+
+    def misses(self):
+        misses = cache_report.compare(self.before, self.after, cache_report.COCO_MNEMONICS)
+        return {miss["target"]: miss for miss in misses}
+
+    def test_read_log(self):
+        self.assertEqual(7, len(self.before))
+        self.assertEqual(8, len(self.after))
+        self.assertEqual("CocoFetchLicense", self.before[0]["mnemonic"])
+
+    def test_hit_rates(self):
+        self.assertEqual(
+            {
+                "CocoGenerate": (0, 2),
+                "CocoTypecheck": (1, 1),
+                "CocoDiagram": (0, 3),
+                "CocoFetchLicense": (1, 1),
+            },
+            cache_report.hit_rates(self.after,
+                                   ["CocoGenerate", "CocoTypecheck", "CocoDiagram", "CocoFetchLicense"]))
+
+    def test_only_misses_of_coco_actions_are_reported(self):
+        self.assertEqual(["//app:app_architecture", "//app:app_counterexamples", "//app:app_states",
+                          "//app:app_cpp", "//lib:lib_c"],
+                         [miss["target"] for miss in cache_report.compare(self.before, self.after,
+                                                                         cache_report.COCO_MNEMONICS)])
+
+    def test_license_token(self):
+        miss = self.misses()["//app:app_cpp"]
+        self.assertEqual(["license token"], miss["causes"])
+        self.assertEqual({"COCOTEC_AUTH_TOKEN": ["<redacted>", "<redacted>"]}, miss["differences"]["environment"])
+        self.assertEqual([], miss["differences"]["arguments"])
+
+    def test_license_file(self):
+        miss = self.misses()["//app:app_architecture"]
+        self.assertEqual(["license file"], miss["causes"])
+        self.assertEqual(["bazel-out/k8-fastbuild/bin/coco_license/license.lic"], list(miss["differences"]["inputs"]))
+
+    def test_configuration(self):
+        miss = self.misses()["//lib:lib_c"]
+        self.assertEqual(["configuration"], miss["causes"])
+        self.assertEqual(
+            [[["bazel-out/k8-fastbuild/bin/lib/src"], ["bazel-out/k8-opt-exec-ST-d57f47055a04/bin/lib/src"]]],
+            miss["differences"]["arguments"])
+
+    def test_popili_version(self):
+        miss = self.misses()["//app:app_counterexamples"]
+        self.assertEqual(["popili version"], miss["causes"])
+
+    def test_action_missing_from_first_build(self):
+        miss = self.misses()["//app:app_states"]
+        self.assertIsNone(miss["differences"])
+
+    def test_compact_log_needs_converter(self):
+        compact = self.tmp / "exec.log"
+        compact.write_bytes(b"\x28\xb5\x2f\xfd" + b"\0" * 16)
+        with self.assertRaisesRegex(ValueError, "--converter"):
+            cache_report.read_log(compact)
+
+        # A stand-in for Bazel's converter, writing the JSON fixture
+        converter = self.tmp / "converter"
+        converter.write_text(f"#!{sys.executable}\n"
+                             "import shutil, sys\n"
+                             "args = dict(arg.split('=', 1) for arg in sys.argv[1:])\n"
+                             f"shutil.copy({str(TESTDATA / 'after.json')!r}, args['--output'].split(':', 1)[1])\n")
+        converter.chmod(0o755)
+        self.assertEqual(self.after, cache_report.read_log(compact, str(converter)))
+
+    def test_main(self):
+        report = self.tmp / "report.json"
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            self.assertEqual(
+                0,
+                cache_report.main(
+                    [str(TESTDATA / "before.json"),
+                     str(TESTDATA / "after.json"), "--json",
+                     str(report)]))
+        self.assertIn("CocoGenerate //app:app_cpp\n  likely causes: license token", stdout.getvalue())
+        self.assertNotIn("bob-token", stdout.getvalue())
+        self.assertEqual({"hits": 1, "actions": 1}, json.loads(report.read_text())["hit_rates"]["CocoTypecheck"])
+
+
+if __name__ == "__main__":
+    unittest.main()
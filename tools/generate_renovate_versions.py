@@ -26,7 +26,7 @@ import json
 import os
 import re
 import subprocess
-import tempfile
+import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
@@ -49,43 +49,92 @@ def parse_version(filename: str) -> Optional[str]:
     return match.group(1) if match else None
 
 
-def compute_sha256_from_gcs(gcs_uri: str, temp_dir: Path) -> str:
+def compute_sha256_from_gcs(gcs_uri: str) -> str:
     """Compute SHA256 digest of a file in GCS.
 
+    The object is streamed from `gcloud storage cat` straight into the hash, so
+    nothing is written to disk.
+
     Args:
         gcs_uri: Full GCS URI (e.g., 'gs://bucket/path/file.tar.gz')
-        temp_dir: Temporary directory for downloading the file
 
     Returns:
         SHA256 hash as hexadecimal string
     """
-    filename = gcs_uri.split('/')[-1]
-    temp_file = temp_dir / filename
-
-    subprocess.run(['gcloud', 'storage', 'cp', gcs_uri,
-                    str(temp_file)],
-                   capture_output=True,
-                   text=True,
-                   check=True)
-
     sha256_hash = hashlib.sha256()
-    with open(temp_file, 'rb') as f:
-        for chunk in iter(lambda: f.read(8192), b''):
+    with subprocess.Popen(['gcloud', 'storage', 'cat', gcs_uri],
+                          stdout=subprocess.PIPE) as process:
+        for chunk in iter(lambda: process.stdout.read(1 << 20), b''):
             sha256_hash.update(chunk)
-
-    temp_file.unlink()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, process.args)
 
     return sha256_hash.hexdigest()
 
 
+class DigestCache:
+    """Persistent cache of object digests.
+
+    Entries are keyed by object name and record the object's generation and MD5
+    metadata, so an object is only hashed again if it was replaced. Digests from a
+    previously emitted renovate_versions.json can seed the cache for objects that
+    have no entry yet, but only if the release's timestamp is still the object's
+    creation time: an object that was replaced since has a new creation time.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self.entries: Dict[str, Dict[str, str]] = {}
+        self.previous: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+        if path and path.exists():
+            self.entries = json.loads(path.read_text())
+
+    def seed_from_manifest(self, manifest: Dict) -> None:
+        """Seed version digests from a previously emitted renovate_versions.json."""
+        for release in manifest.get('releases', []):
+            if (release.get('version') and release.get('digest')
+                    and release.get('releaseTimestamp')):
+                self.previous[release['version']] = release
+
+    def lookup(self, name: str, version: str,
+               metadata: Dict) -> Optional[str]:
+        with self._lock:
+            entry = self.entries.get(name)
+            if entry is not None:
+                if (entry.get('generation') == metadata.get('generation') and
+                        entry.get('md5Hash') == metadata.get('md5Hash')):
+                    return entry['digest']
+                return None
+        release = self.previous.get(version)
+        if release and release['releaseTimestamp'] == metadata.get(
+                'timeCreated'):
+            return release['digest']
+        return None
+
+    def store(self, name: str, metadata: Dict, digest: str) -> None:
+        with self._lock:
+            self.entries[name] = {
+                'generation': metadata.get('generation'),
+                'md5Hash': metadata.get('md5Hash'),
+                'digest': digest,
+            }
+
+    def save(self) -> None:
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self.entries, indent=2,
+                                            sort_keys=True))
+
+
 def process_release(obj: Dict, bucket_name: str,
-                    temp_path: Path) -> Optional[Dict[str, str]]:
+                    cache: DigestCache) -> Optional[Dict[str, str]]:
     """Process a single release object from GCS.
 
     Args:
         obj: GCS object metadata from gcloud storage ls --json
         bucket_name: GCS bucket name
-        temp_path: Temporary directory for downloads
+        cache: Digests of objects that were already hashed
 
     Returns:
         Release dictionary or None if not a valid release
@@ -104,9 +153,12 @@ def process_release(obj: Dict, bucket_name: str,
     # Get timestamp from object metadata
     timestamp = metadata.get('timeCreated')
 
-    # Compute SHA256 digest
-    object_uri = f'gs://{bucket_name}/{name}'
-    sha256_digest = compute_sha256_from_gcs(object_uri, temp_path)
+    # Compute SHA256 digest, unless this object was already hashed
+    sha256_digest = cache.lookup(name, version, metadata)
+    if sha256_digest is None:
+        object_uri = f'gs://{bucket_name}/{name}'
+        sha256_digest = compute_sha256_from_gcs(object_uri)
+    cache.store(name, metadata, sha256_digest)
 
     return {
         'version': version,
@@ -117,15 +169,18 @@ def process_release(obj: Dict, bucket_name: str,
     }
 
 
-def list_versions_from_gcs(bucket_name: str,
-                           prefix: str,
-                           max_workers: int = 8) -> List[Dict[str, str]]:
+def list_versions_from_gcs(
+        bucket_name: str,
+        prefix: str,
+        max_workers: int = 8,
+        cache: Optional[DigestCache] = None) -> List[Dict[str, str]]:
     """List all rules_coco releases from GCS bucket using gcloud CLI.
 
     Args:
         bucket_name: GCS bucket name (e.g., 'cocotec-downloads')
         prefix: Path prefix within bucket (e.g., 'rules_coco')
         max_workers: Maximum number of parallel workers for processing
+        cache: Digests of objects that were already hashed (default: none)
 
     Returns:
         List of release dictionaries with version, timestamp, and URL
@@ -141,30 +196,27 @@ def list_versions_from_gcs(bucket_name: str,
     objects = json.loads(result.stdout)
 
     releases: List[Dict[str, str]] = []
-
-    # Create temporary directory for downloading files
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-
-        # Process releases in parallel
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all tasks
-            futures = {
-                executor.submit(process_release, obj, bucket_name, temp_path):
-                obj
-                for obj in objects
-            }
-
-            # Collect results as they complete
-            for future in as_completed(futures):
-                try:
-                    release = future.result()
-                    if release:
-                        releases.append(release)
-                except Exception as e:
-                    obj = futures[future]
-                    name = obj.get('metadata', {}).get('name', 'unknown')
-                    print(f"Error processing {name}: {e}", flush=True)
+    if cache is None:
+        cache = DigestCache()
+
+    # Process releases in parallel
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Submit all tasks
+        futures = {
+            executor.submit(process_release, obj, bucket_name, cache): obj
+            for obj in objects
+        }
+
+        # Collect results as they complete
+        for future in as_completed(futures):
+            try:
+                release = future.result()
+                if release:
+                    releases.append(release)
+            except Exception as e:
+                obj = futures[future]
+                name = obj.get('metadata', {}).get('name', 'unknown')
+                print(f"Error processing {name}: {e}", flush=True)
 
     # Sort by version (descending) - newest first
     releases.sort(
@@ -174,7 +226,7 @@ def list_versions_from_gcs(bucket_name: str,
     return releases
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
     parser = argparse.ArgumentParser(
         description='Generate versions.json for Renovate compatibility')
     parser.add_argument('--bucket',
@@ -197,9 +249,27 @@ def main():
         'Number of parallel workers for processing (default: min(cpu_count, 8))'
     )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        '--cache',
+        type=Path,
+        help='JSON file caching digests by object name, generation and MD5, so '
+        'only new or replaced releases are hashed (default: no cache)')
+    parser.add_argument(
+        '--previous',
+        type=Path,
+        help='A previously emitted renovate_versions.json whose digests are '
+        'reused for releases that are not in the cache, as long as the '
+        'release\'s object has not been replaced since')
+
+    args = parser.parse_args(argv)
+
+    cache = DigestCache(args.cache)
+    if args.previous and args.previous.exists():
+        cache.seed_from_manifest(json.loads(args.previous.read_text()))
 
-    releases = list_versions_from_gcs(args.bucket, args.prefix, args.workers)
+    releases = list_versions_from_gcs(args.bucket, args.prefix, args.workers,
+                                      cache)
+    cache.save()
     print(f"Found {len(releases)} releases", flush=True)
     json_output = json.dumps(
         {
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for generate_renovate_versions using a stub gcloud on PATH."""
+
+import hashlib
+import io
+import json
+import os
+import stat
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import generate_renovate_versions  # noqa: E402
+
+# Stands in for gcloud: lists the objects in $STUB_GCLOUD_ROOT and cats their
+# contents, logging each invocation to $STUB_GCLOUD_LOG.
+STUB_GCLOUD = f"""#!{sys.executable}
+import json, os, sys
+root = os.environ["STUB_GCLOUD_ROOT"]
+with open(os.environ["STUB_GCLOUD_LOG"], "a") as log:
+    log.write(" ".join(sys.argv[1:]) + "\\n")
+if sys.argv[1:3] == ["storage", "ls"]:
+    with open(os.path.join(root, "listing.json")) as f:
+        sys.stdout.write(f.read())
+elif sys.argv[1:3] == ["storage", "cat"]:
+    name = sys.argv[3].split("/", 3)[3]
+    path = os.path.join(root, "objects", name)
+    if not os.path.exists(path):
+        sys.stderr.write("not found: " + name)
+        sys.exit(1)
+    with open(path, "rb") as f:
+        sys.stdout.buffer.write(f.read())
+else:
+    sys.exit(2)
+"""
+
+
+class GenerateRenovateVersionsTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+
+        bin_dir = self.tmp / "bin"
+        bin_dir.mkdir()
+        gcloud = bin_dir / "gcloud"
+        gcloud.write_text(STUB_GCLOUD)
+        gcloud.chmod(gcloud.stat().st_mode | stat.S_IEXEC)
+
+        self.root = self.tmp / "bucket"
+        (self.root / "objects" / "rules_coco").mkdir(parents=True)
+        self.log = self.tmp / "gcloud.log"
+        self.log.touch()
+        self.objects = []
+
+        environ = mock.patch.dict(
+            os.environ, {
+                "PATH": str(bin_dir) + os.pathsep + os.environ["PATH"],
+                "STUB_GCLOUD_ROOT": str(self.root),
+                "STUB_GCLOUD_LOG": str(self.log),
+            })
+        environ.start()
+        self.addCleanup(environ.stop)
+
+    def publish(self,
+                filename,
+                content,
+                generation="1",
+                time_created="2026-01-01T00:00:00Z"):
+        name = f"rules_coco/{filename}"
+        (self.root / "objects" / name).write_bytes(content)
+        self.objects = [
+            o for o in self.objects if o["metadata"]["name"] != name
+        ]
+        self.objects.append({
+            "metadata": {
+                "name": name,
+                "generation": generation,
+                "md5Hash": hashlib.md5(content).hexdigest(),
+                "timeCreated": time_created,
+            }
+        })
+        (self.root / "listing.json").write_text(json.dumps(self.objects))
+
+    def run_tool(self, *args):
+        out = self.tmp / "renovate_versions.json"
+        with redirect_stdout(io.StringIO()):
+            generate_renovate_versions.main(
+                ["--bucket", "bucket", "--out",
+                 str(out)] + list(args))
+        return {
+            r["version"]: r["digest"]
+            for r in json.loads(out.read_text())["releases"]
+        }
+
+    def hashed(self):
+        return [
+            line.split()[2].rsplit("/", 1)[1]
+            for line in self.log.read_text().splitlines()
+            if line.startswith("storage cat")
+        ]
+
+    def test_streams_digests(self):
+        self.publish("rules_coco_0.1.0.tar.gz", b"first")
+        self.publish("rules_coco_0.2.0.tar.gz", b"second" * 100000)
+        self.publish("renovate_versions.json", b"{}")
+        self.assertEqual(
+            {
+                "0.1.0": hashlib.sha256(b"first").hexdigest(),
+                "0.2.0": hashlib.sha256(b"second" * 100000).hexdigest(),
+            }, self.run_tool())
+
+    def test_cache_only_hashes_new_or_replaced_objects(self):
+        cache = str(self.tmp / "cache" / "digests.json")
+        self.publish("rules_coco_0.1.0.tar.gz", b"first")
+        self.publish("rules_coco_0.2.0.tar.gz", b"second")
+        self.run_tool("--cache", cache)
+
+        self.log.write_text("")
+        self.publish("rules_coco_0.2.0.tar.gz", b"replaced", generation="2")
+        self.publish("rules_coco_0.3.0.tar.gz", b"third")
+        releases = self.run_tool("--cache", cache)
+
+        self.assertEqual(
+            ["rules_coco_0.2.0.tar.gz", "rules_coco_0.3.0.tar.gz"],
+            sorted(self.hashed()))
+        self.assertEqual(hashlib.sha256(b"replaced").hexdigest(),
+                         releases["0.2.0"])
+
+    def test_previous_seeds_digests(self):
+        self.publish("rules_coco_0.1.0.tar.gz", b"first")
+        previous = self.tmp / "previous.json"
+        self.run_tool()
+        (self.tmp / "renovate_versions.json").rename(previous)
+
+        self.log.write_text("")
+        self.publish("rules_coco_0.2.0.tar.gz", b"second")
+        releases = self.run_tool("--previous", str(previous))
+
+        self.assertEqual(["rules_coco_0.2.0.tar.gz"], self.hashed())
+        self.assertEqual(hashlib.sha256(b"first").hexdigest(),
+                         releases["0.1.0"])
+
+    def test_previous_ignores_replaced_objects(self):
+        self.publish("rules_coco_0.1.0.tar.gz", b"first")
+        previous = self.tmp / "previous.json"
+        self.run_tool()
+        (self.tmp / "renovate_versions.json").rename(previous)
+
+        self.log.write_text("")
+        self.publish("rules_coco_0.1.0.tar.gz",
+                     b"replaced",
+                     generation="2",
+                     time_created="2026-02-01T00:00:00Z")
+        releases = self.run_tool("--previous", str(previous))
+
+        self.assertEqual(["rules_coco_0.1.0.tar.gz"], self.hashed())
+        self.assertEqual(hashlib.sha256(b"replaced").hexdigest(),
+                         releases["0.1.0"])
+
+    def test_failed_download_is_skipped(self):
+        self.publish("rules_coco_0.1.0.tar.gz", b"first")
+        self.publish("rules_coco_0.2.0.tar.gz", b"second")
+        (self.root / "objects" / "rules_coco" /
+         "rules_coco_0.2.0.tar.gz").unlink()
+        self.assertEqual(["0.1.0"], list(self.run_tool()))
+
+
+if __name__ == "__main__":
+    unittest.main()
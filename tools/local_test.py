@@ -1,26 +1,81 @@
 #!/usr/bin/env python3
 """Run the CI test matrix locally, including e2e tests."""
 
+import argparse
+import json
 import os
+import re
 import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+# Kept outside the workspace so that //... does not descend into the output bases.
+_LOCAL_TEST_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                               'rules_coco', 'local_test')
 
-def run_bazel_test(name, bazel_version, build_system, cwd=None):
-    """Run bazel test for a given configuration."""
-    print(f"\n{'=' * 70}")
-    print(f"Testing {name}: Bazel {bazel_version} with {build_system} mode")
-    print('=' * 70)
+CONFIGS = [
+    ('8.4.2', 'workspace'),
+    ('8.4.2', 'bzlmod'),
+    ('9.0.0rc2', 'bzlmod'),
+]
 
-    env = os.environ.copy()
-    env['USE_BAZEL_VERSION'] = bazel_version
-    cmd = ['bazel', 'test', f'--config={build_system}', '//...']
 
-    result = subprocess.run(cmd, env=env, cwd=cwd)
-    status = "✓ PASSED" if result.returncode == 0 else "✗ FAILED"
-    print(f"\n{status}: {name} with Bazel {bazel_version} and {build_system}")
+def run_bazel_test(name, bazel_version, build_system, cwd=None, isolation_dir=None, cache_dir=None):
+    """Run bazel test for a given configuration.
+
+    When isolation_dir is set the run gets its own output base under it (and creates
+    no convenience symlinks), so several runs can share a workspace concurrently; its
+    output goes to a log file there instead of the console. cache_dir holds a disk and
+    repository cache shared between runs.
 
-    return result.returncode == 0
+    Returns a dict describing the run: its name, configuration, outcome, wall-clock
+    seconds and log file (if any).
+    """
+    env = os.environ.copy()
+    env['USE_BAZEL_VERSION'] = bazel_version
+    startup = []
+    flags = [f'--config={build_system}']
+    log = None
+    if isolation_dir:
+        slug = re.sub(r'[^A-Za-z0-9.]+', '_', f'{bazel_version}-{build_system}-{name}')
+        os.makedirs(isolation_dir, exist_ok=True)
+        startup.append(f'--output_base={os.path.join(isolation_dir, slug)}')
+        flags.append('--symlink_prefix=/')
+        log = os.path.join(isolation_dir, slug + '.log')
+    if cache_dir:
+        flags += [
+            f'--disk_cache={os.path.join(cache_dir, "disk")}',
+            f'--repository_cache={os.path.join(cache_dir, "repository")}',
+        ]
+    cmd = ['bazel'] + startup + ['test'] + flags + ['//...']
+
+    start = time.monotonic()
+    if log:
+        print(f"Started {name}: Bazel {bazel_version} with {build_system} mode (log: {log})", flush=True)
+        with open(log, 'w') as out:
+            returncode = subprocess.run(cmd, env=env, cwd=cwd, stdout=out, stderr=subprocess.STDOUT).returncode
+            # Each isolated output base has its own server; don't leave it running.
+            subprocess.run(['bazel'] + startup + ['shutdown'], env=env, cwd=cwd, stdout=out,
+                           stderr=subprocess.STDOUT)
+    else:
+        print(f"\n{'=' * 70}")
+        print(f"Testing {name}: Bazel {bazel_version} with {build_system} mode")
+        print('=' * 70)
+        returncode = subprocess.run(cmd, env=env, cwd=cwd).returncode
+    seconds = time.monotonic() - start
+
+    status = "✓ PASSED" if returncode == 0 else "✗ FAILED"
+    print(f"\n{status}: {name} with Bazel {bazel_version} and {build_system} ({seconds:.0f}s)", flush=True)
+
+    return {
+        'name': name,
+        'bazel_version': bazel_version,
+        'build_system': build_system,
+        'passed': returncode == 0,
+        'seconds': round(seconds, 1),
+        'log': log,
+    }
 
 
 def discover_e2e_dirs():
@@ -46,34 +101,84 @@ def stage_e2e_dirs(e2e_dirs):
             subprocess.run([sys.executable, hook], check=True)
 
 
+def workspaces_for_mode(e2e_dirs, mode):
+    """The root workspace and e2e directories to test in a mode.
+
+    Skips bzlmod-only scenarios (those without a WORKSPACE file) when testing
+    workspace mode.
+    """
+    return [('root workspace', None)] + [
+        (d, d)
+        for d in e2e_dirs
+        if mode != 'workspace' or os.path.isfile(os.path.join(d, 'WORKSPACE'))
+    ]
+
+
+def print_timings(results):
+    """Print a wall-clock table of the runs, slowest first."""
+    rows = [(r['name'], r['bazel_version'], r['build_system'], 'PASSED' if r['passed'] else 'FAILED',
+             f"{r['seconds']:.0f}s") for r in sorted(results, key=lambda r: r['seconds'], reverse=True)]
+    headers = ('Target', 'Bazel', 'Mode', 'Result', 'Time')
+    widths = [max(len(row[i]) for row in rows + [headers]) for i in range(len(headers))]
+    print()
+    for row in [headers] + rows:
+        print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+
 def main():
     """Run all test configurations."""
-    configs = [
-        ('8.4.2', 'workspace'),
-        ('8.4.2', 'bzlmod'),
-        ('9.0.0rc2', 'bzlmod'),
-    ]
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Number of workspaces to test concurrently. With more than one job every '
+                        'run gets an isolated output base and all runs complete even if some fail '
+                        '(default: 1, stopping at the first failing configuration)')
+    parser.add_argument('--output-root', default=os.path.join(_LOCAL_TEST_DIR, 'output_bases'),
+                        help='Directory for the isolated output bases and logs of parallel runs')
+    parser.add_argument('--cache-dir', default=os.path.join(_LOCAL_TEST_DIR, 'cache'),
+                        help='Disk and repository cache shared by parallel runs')
+    parser.add_argument('--json', help='Also write the per-run timings to this JSON file')
+    options = parser.parse_args()
 
     e2e_dirs = discover_e2e_dirs()
     stage_e2e_dirs(e2e_dirs)
-    passed = 0
-
-    for version, mode in configs:
-        # Run root workspace and all e2e tests. Skip bzlmod-only scenarios (those
-        # without a WORKSPACE file) when testing workspace mode.
-        test_dirs = [('root workspace', None)] + [
-            (d, d)
-            for d in e2e_dirs
-            if mode != 'workspace' or os.path.isfile(os.path.join(d, 'WORKSPACE'))
-        ]
-
-        if all(run_bazel_test(name, version, mode, cwd) for name, cwd in test_dirs):
-            passed += 1
-        else:
-            print("\nStopping due to failure.")
-            break
-
-    failed = len(configs) - passed
+    results = []
+
+    if options.jobs > 1:
+        output_root = os.path.abspath(options.output_root)
+        cache_dir = os.path.abspath(options.cache_dir)
+        runs = [(name, version, mode, cwd)
+                for version, mode in CONFIGS
+                for name, cwd in workspaces_for_mode(e2e_dirs, mode)]
+        with ThreadPoolExecutor(max_workers=options.jobs) as executor:
+            results = list(
+                executor.map(
+                    lambda run: run_bazel_test(*run, isolation_dir=output_root, cache_dir=cache_dir),
+                    runs))
+        passed_configs = [(version, mode) for version, mode in CONFIGS if all(
+            r['passed'] for r in results if (r['bazel_version'], r['build_system']) == (version, mode))]
+        passed = len(passed_configs)
+    else:
+        passed = 0
+        for version, mode in CONFIGS:
+            config_results = []
+            for name, cwd in workspaces_for_mode(e2e_dirs, mode):
+                config_results.append(run_bazel_test(name, version, mode, cwd))
+                if not config_results[-1]['passed']:
+                    break
+            results += config_results
+
+            if all(r['passed'] for r in config_results):
+                passed += 1
+            else:
+                print("\nStopping due to failure.")
+                break
+
+    print_timings(results)
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    failed = len(CONFIGS) - passed
     print(f"\n{'=' * 70}")
     print(f"Summary: {passed} configurations passed, {failed} failed")
     print('=' * 70)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the popili action profiler."""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "coco" / "private"))
+
+import popili_profile  # noqa: E402
+
+
+class PopiliProfileTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+
+    def profile(self, name, label, mnemonic, code):
+        output = self.tmp / f"{name}.json"
+        inputs = self.tmp / f"{name}.inputs"
+        inputs.write_text("pkg/Coco.toml\npkg/src/A.coco\npkg/src/B.coco\n")
+        returncode = popili_profile.main([
+            "run", "--output",
+            str(output), "--label", label, "--mnemonic", mnemonic,
+            f"--inputs-file={inputs}", "--", sys.executable, "-c", code
+        ])
+        return returncode, json.loads(output.read_text())
+
+    def test_run_records_profile_and_exit_code(self):
+        returncode, profile = self.profile("fail", "//pkg:a", "CocoGenerate",
+                                           "import sys; sys.exit(4)")
+        self.assertEqual(4, returncode)
+        self.assertEqual(4, profile["exit_code"])
+        self.assertEqual("//pkg:a", profile["label"])
+        self.assertEqual(3, profile["inputs"])
+        self.assertGreaterEqual(profile["wall_seconds"], 0)
+        if os.name != "nt":
+            self.assertGreater(profile["peak_rss_kb"], 0)
+
+    def test_merge_ranks_by_wall_time(self):
+        self.profile("fast", "//pkg:a", "CocoTypecheck", "pass")
+        self.profile("slow", "//pkg:b", "CocoGenerate",
+                     "import time; time.sleep(0.2)")
+        params = self.tmp / "profiles.params"
+        params.write_text(f"{self.tmp / 'fast.json'}\n{self.tmp / 'slow.json'}\n")
+        report_path = self.tmp / "report.json"
+
+        self.assertEqual(
+            0,
+            popili_profile.main(
+                ["merge", "--output",
+                 str(report_path), f"@{params}"]))
+        report = json.loads(report_path.read_text())
+        self.assertEqual(["//pkg:b", "//pkg:a"],
+                         [t["label"] for t in report["targets"]])
+        self.assertEqual(["CocoGenerate", "CocoTypecheck"],
+                         [a["mnemonic"] for a in report["actions"]])
+        self.assertAlmostEqual(
+            report["total_wall_seconds"],
+            sum(a["wall_seconds"] for a in report["actions"]),
+            places=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Prefetch popili and runtime archives into a Bazel repository cache.
+
+Reads the checksums in known_shas.bzl for the chosen versions, platforms and
+runtimes, downloads the archives concurrently (trying each mirror in turn) and
+stores each one, once its sha256 is verified, where Bazel's repository cache
+looks for it:
+
+  <repository_cache>/content_addressable/sha256/<sha256>/file
+
+Bazel then serves the coco toolchain and runtime repositories from the cache
+without any network access, e.g. on air-gapped CI runners started with
+`--repository_cache=<repository_cache>`.
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+_PRIVATE = Path(__file__).resolve().parent.parent / "coco" / "private"
+
+DEFAULT_MIRRORS = ["https://dl.cocotec.io/popili"]
+
+PLATFORMS = ("darwin_amd64", "darwin_arm64", "linux_amd64", "linux_arm64", "windows_amd64")
+
+RUNTIMES = ("c", "cpp", "csharp")
+
+
+def _load_bzl(path: Path) -> Dict:
+    namespace: Dict = {}
+    exec(path.read_text(), namespace)
+    return namespace
+
+
+def download_prefix(version: str) -> str:
+    """Mirrors download_prefix in common_repositories.bzl."""
+    if len(version.split("-")[0].split(".")) >= 2:
+        return f"archive/{version}"
+    return version
+
+
+def select_archives(known_shas: Dict[str, str], versions: List[str], platforms: List[str],
+                    runtimes: List[str]) -> Dict[str, str]:
+    """Returns the sha256 of each requested archive, keyed by `<version>/<filename>`.
+
+    Archives that have no checksum in known_shas are left out: Bazel cannot
+    serve those from its repository cache anyway.
+    """
+    result = {}
+    for version in versions:
+        filenames = [f"popili_{platform}.zip" for platform in platforms]
+        filenames += [f"coco-{runtime}-runtime.zip" for runtime in runtimes]
+        for filename in filenames:
+            key = f"{version}/{filename}"
+            if key in known_shas:
+                result[key] = known_shas[key]
+    return result
+
+
+def cache_path(repository_cache: Path, sha256: str) -> Path:
+    return repository_cache / "content_addressable" / "sha256" / sha256 / "file"
+
+
+def _sha256_of(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _download(url: str, sha256: str, dest: Path) -> None:
+    """Downloads url to dest, raising ValueError if its sha256 does not match."""
+    digest = hashlib.sha256()
+    fd, tmp = tempfile.mkstemp(dir=dest.parent)
+    try:
+        with os.fdopen(fd, "wb") as out, urllib.request.urlopen(url) as response:
+            for chunk in iter(lambda: response.read(1 << 20), b""):
+                digest.update(chunk)
+                out.write(chunk)
+        if digest.hexdigest() != sha256:
+            raise ValueError(f"expected sha256 {sha256}, got {digest.hexdigest()}")
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def prefetch_archive(key: str, sha256: str, repository_cache: Path, mirrors: List[str]) -> Optional[str]:
+    """Places the archive for key in repository_cache.
+
+    Returns the URL it was downloaded from, or None if the cache already held it.
+    Raises RuntimeError if no mirror served the archive with the right checksum.
+    """
+    dest = cache_path(repository_cache, sha256)
+    if dest.exists() and _sha256_of(dest) == sha256:
+        return None
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    version, filename = key.split("/", 1)
+    errors = []
+    for mirror in mirrors:
+        url = f"{mirror.rstrip('/')}/{download_prefix(version)}/{filename}"
+        try:
+            _download(url, sha256, dest)
+            return url
+        except (OSError, ValueError) as e:
+            errors.append(f"{url}: {e}")
+    raise RuntimeError(f"Could not fetch {key}:\n  " + "\n  ".join(errors))
+
+
+def prefetch(repository_cache: Path, archives: Dict[str, str], mirrors: List[str],
+             jobs: int = 8) -> Dict[str, Optional[str]]:
+    """Prefetches archives (as returned by select_archives) on up to `jobs` threads.
+
+    Returns, for each archive key, the URL it was downloaded from or None if it
+    was already cached.
+    """
+    keys = sorted(archives)
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        results = executor.map(lambda key: prefetch_archive(key, archives[key], repository_cache, mirrors),
+                               keys)
+        return dict(zip(keys, results))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--repository-cache",
+                        type=Path,
+                        required=True,
+                        help="Bazel repository cache directory to fill (as passed to --repository_cache)")
+    parser.add_argument("--versions",
+                        nargs="+",
+                        default=["stable"],
+                        help="Popili versions or version aliases to prefetch (default: stable)")
+    parser.add_argument("--platforms",
+                        nargs="+",
+                        choices=PLATFORMS,
+                        default=list(PLATFORMS),
+                        help="Platforms to prefetch popili for (default: all)")
+    parser.add_argument("--runtimes",
+                        nargs="*",
+                        choices=RUNTIMES,
+                        default=["c", "cpp"],
+                        help="Runtimes to prefetch (default: c cpp)")
+    parser.add_argument("--mirror",
+                        dest="mirrors",
+                        action="append",
+                        help="URL prefix to download from, tried in the order given "
+                        f"(default: {DEFAULT_MIRRORS[0]})")
+    parser.add_argument("--jobs", type=int, default=8, help="Number of archives to download concurrently")
+    parser.add_argument("--known-shas",
+                        type=Path,
+                        default=_PRIVATE / "known_shas.bzl",
+                        help="known_shas.bzl to read checksums from")
+    parser.add_argument("--version-aliases",
+                        type=Path,
+                        default=_PRIVATE / "version_aliases.bzl",
+                        help="version_aliases.bzl to resolve version aliases with")
+    options = parser.parse_args(argv)
+
+    aliases = _load_bzl(options.version_aliases)["VERSION_ALIASES"]
+    versions = list(dict.fromkeys(aliases.get(v, v) for v in options.versions))
+    known_shas = _load_bzl(options.known_shas)["FILE_KEY_TO_SHA"]
+    archives = select_archives(known_shas, versions, options.platforms, options.runtimes)
+    if not archives:
+        print(f"No known archives for versions {', '.join(versions)}", file=sys.stderr)
+        return 1
+
+    try:
+        results = prefetch(options.repository_cache, archives, options.mirrors or DEFAULT_MIRRORS,
+                           options.jobs)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    for key, url in results.items():
+        print(f"{key}: {'already cached' if url is None else 'fetched from ' + url}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
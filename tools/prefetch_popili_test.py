@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for prefetching archives into a Bazel repository cache."""
+
+import functools
+import hashlib
+import http.server
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import prefetch_popili  # noqa: E402
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PrefetchPopiliTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.cache = self.tmp / "cache"
+
+        # A mirror serving version 9.9.9, laid out like dl.cocotec.io/popili
+        served = self.tmp / "mirror"
+        archive_dir = served / "archive" / "9.9.9"
+        archive_dir.mkdir(parents=True)
+        self.shas = {}
+        for filename in ["popili_linux_amd64.zip", "coco-cpp-runtime.zip"]:
+            content = f"contents of {filename}".encode()
+            (archive_dir / filename).write_bytes(content)
+            self.shas[f"9.9.9/{filename}"] = hashlib.sha256(content).hexdigest()
+
+        server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), functools.partial(_QuietHandler, directory=str(served)))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.mirror = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def test_select_archives(self):
+        known = dict(self.shas, **{"9.9.9/coco-c-runtime.zip": "c" * 64, "1.0.0/coco-cpp-runtime.zip": "d" * 64})
+        self.assertEqual(
+            self.shas,
+            prefetch_popili.select_archives(known, ["9.9.9"], ["linux_amd64", "darwin_arm64"], ["cpp"]))
+
+    def test_prefetch_into_repository_cache(self):
+        results = prefetch_popili.prefetch(self.cache, self.shas, [self.mirror])
+        self.assertEqual(f"{self.mirror}/archive/9.9.9/popili_linux_amd64.zip",
+                         results["9.9.9/popili_linux_amd64.zip"])
+        for key, sha in self.shas.items():
+            path = self.cache / "content_addressable" / "sha256" / sha / "file"
+            self.assertEqual(sha, hashlib.sha256(path.read_bytes()).hexdigest())
+
+        # A second run finds everything in the cache
+        results = prefetch_popili.prefetch(self.cache, self.shas, [self.mirror])
+        self.assertEqual({key: None for key in self.shas}, results)
+
+    def test_falls_back_to_next_mirror(self):
+        archives = {"9.9.9/coco-cpp-runtime.zip": self.shas["9.9.9/coco-cpp-runtime.zip"]}
+        results = prefetch_popili.prefetch(self.cache, archives, [self.mirror + "/missing", self.mirror])
+        self.assertEqual(f"{self.mirror}/archive/9.9.9/coco-cpp-runtime.zip",
+                         results["9.9.9/coco-cpp-runtime.zip"])
+
+    def test_rejects_checksum_mismatch(self):
+        with self.assertRaisesRegex(RuntimeError, "expected sha256"):
+            prefetch_popili.prefetch(self.cache, {"9.9.9/coco-cpp-runtime.zip": "0" * 64}, [self.mirror])
+        self.assertFalse((self.cache / "content_addressable" / "sha256" / ("0" * 64) / "file").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
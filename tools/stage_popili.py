@@ -3,18 +3,27 @@
 
 Downloads the archives for the version rules_coco pins as `stable` and lays the
 binaries (and optionally the C++ runtime) on disk, preserving executable bits.
+
+Archives are kept in a cache shared by every e2e directory and rerun, addressed
+by their sha256 (which is checked against known_shas.bzl). Each archive is
+unpacked once in the cache and staged by copying its files, so e2e directories
+never share (and cannot corrupt) the cached copy.
 """
 
 import argparse
+import hashlib
 import os
 import platform
 import shutil
 import sys
+import tempfile
 import urllib.request
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
 _HERE = os.path.dirname(os.path.abspath(__file__))
 _VERSION_ALIASES_BZL = os.path.join(_HERE, "..", "coco", "private", "version_aliases.bzl")
+_KNOWN_SHAS_BZL = os.path.join(_HERE, "..", "coco", "private", "known_shas.bzl")
 
 
 def stable_version():
@@ -23,6 +32,24 @@ def stable_version():
     return namespace["VERSION_ALIASES"]["stable"]
 
 
+def known_sha(version, archive):
+    """Returns the sha256 of archive for version recorded in known_shas.bzl."""
+    namespace = {}
+    exec(open(_KNOWN_SHAS_BZL).read(), namespace)
+    key = f"{version}/{archive}"
+    if key not in namespace["FILE_KEY_TO_SHA"]:
+        sys.exit(f"No checksum for {key} in known_shas.bzl; run //tools:update_digests.")
+    return namespace["FILE_KEY_TO_SHA"][key]
+
+
+def default_cache_dir():
+    """Returns $COCO_STAGE_CACHE, or a directory under the user's cache directory."""
+    if os.environ.get("COCO_STAGE_CACHE"):
+        return os.environ["COCO_STAGE_CACHE"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "rules_coco", "stage_popili")
+
+
 def _os_token(system):
     return {"Darwin": "darwin", "Linux": "linux", "Windows": "windows"}.get(system)
 
@@ -45,25 +72,68 @@ def popili_archive():
     return f"popili_{os_token}_{arch_token}.zip"
 
 
-def _download_and_extract(base_url, archive, dest, tmp_dir):
-    """Downloads base_url/archive and extracts it into dest, preserving modes."""
-    url = f"{base_url}/{archive}"
-    tmp = os.path.join(tmp_dir, archive)
-    print(f"Downloading {url}")
-    urllib.request.urlretrieve(url, tmp)
+def _fetch(url, sha256, cache_dir):
+    """Returns the path of the archive with the given sha256, downloading url if it is not cached."""
+    path = os.path.join(cache_dir, "sha256", sha256)
+    if os.path.exists(path):
+        return path
 
-    os.makedirs(dest, exist_ok=True)
-    with zipfile.ZipFile(tmp) as zf:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    print(f"Downloading {url}")
+    digest = hashlib.sha256()
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as out, urllib.request.urlopen(url) as response:
+            for chunk in iter(lambda: response.read(1 << 20), b""):
+                digest.update(chunk)
+                out.write(chunk)
+        if digest.hexdigest() != sha256:
+            sys.exit(f"Checksum mismatch for {url}: expected {sha256}, got {digest.hexdigest()}.")
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+def _unpack(archive_path, sha256, cache_dir):
+    """Returns a directory holding the contents of the archive, extracting it on first use."""
+    unpacked = os.path.join(cache_dir, "unpacked", sha256)
+    if os.path.isdir(unpacked):
+        return unpacked
+
+    os.makedirs(os.path.dirname(unpacked), exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(unpacked))
+    with zipfile.ZipFile(archive_path) as zf:
         for info in zf.infolist():
-            extracted = zf.extract(info, dest)
+            extracted = zf.extract(info, tmp)
             mode = info.external_attr >> 16
             if mode:
                 os.chmod(extracted, mode)
-    os.remove(tmp)
+    try:
+        os.rename(tmp, unpacked)
+    except OSError:
+        # Another stage run unpacked the same archive first.
+        shutil.rmtree(tmp)
+    return unpacked
+
+
+def _copy_tree(src, dest):
+    """Recreates src at dest, copying files with their permissions."""
+    shutil.copytree(src, dest, dirs_exist_ok=True)
 
 
-def stage(dest_dir, binary_subdir="popili", with_cpp_runtime=False, force=False):
+def _fetch_and_unpack(base_url, version, archive, cache_dir):
+    sha256 = known_sha(version, archive)
+    return _unpack(_fetch(f"{base_url}/{archive}", sha256, cache_dir), sha256, cache_dir)
+
+
+def stage(dest_dir, binary_subdir="popili", with_cpp_runtime=False, force=False, cache_dir=None,
+          base_url=None):
     """Stages popili binaries under dest_dir/<binary_subdir> (+ cpp-runtime if asked).
+
+    Archives come from cache_dir (default: default_cache_dir()), and are only
+    downloaded, concurrently, from base_url (default: dl.cocotec.io) if missing.
     """
     binary_dir = os.path.join(dest_dir, binary_subdir)
     if os.path.isdir(binary_dir) and not force:
@@ -78,10 +148,19 @@ def stage(dest_dir, binary_subdir="popili", with_cpp_runtime=False, force=False)
     os.makedirs(dest_dir, exist_ok=True)
 
     version = stable_version()
-    base_url = f"https://dl.cocotec.io/popili/archive/{version}"
-    _download_and_extract(base_url, popili_archive(), binary_dir, dest_dir)
+    base_url = base_url or f"https://dl.cocotec.io/popili/archive/{version}"
+    cache_dir = cache_dir or default_cache_dir()
+    archives = {binary_dir: popili_archive()}
     if with_cpp_runtime:
-        _download_and_extract(base_url, "coco-cpp-runtime.zip", runtime_dir, dest_dir)
+        archives[runtime_dir] = "coco-cpp-runtime.zip"
+
+    with ThreadPoolExecutor(max_workers=len(archives)) as executor:
+        unpacked = {
+            dest: executor.submit(_fetch_and_unpack, base_url, version, archive, cache_dir)
+            for dest, archive in archives.items()
+        }
+        for dest, future in unpacked.items():
+            _copy_tree(future.result(), dest)
 
     print(f"Staged popili {version} into {dest_dir}")
 
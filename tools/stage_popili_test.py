@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the shared archive cache of stage_popili."""
+
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import stage_popili  # noqa: E402
+
+
+def _write_zip(path, files):
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, (content, mode) in files.items():
+            info = zipfile.ZipInfo(name)
+            info.external_attr = mode << 16
+            zf.writestr(info, content)
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+class StagePopiliTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.archives = self.tmp / "archives"
+        self.archives.mkdir()
+        self.cache = str(self.tmp / "cache")
+
+        self.shas = {
+            stage_popili.popili_archive():
+            _write_zip(self.archives / stage_popili.popili_archive(),
+                       {"popili": (b"#!/bin/sh\n", 0o755)}),
+            "coco-cpp-runtime.zip":
+            _write_zip(self.archives / "coco-cpp-runtime.zip",
+                       {"include/coco/runtime.h": (b"// runtime\n", 0o644)}),
+        }
+        for patch in [
+                mock.patch.object(stage_popili, "stable_version", return_value="9.9.9"),
+                mock.patch.object(stage_popili, "known_sha",
+                                  side_effect=lambda version, archive: self.shas[archive]),
+        ]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def stage(self, dest, **kwargs):
+        with redirect_stdout(io.StringIO()) as out:
+            stage_popili.stage(str(dest),
+                               cache_dir=self.cache,
+                               base_url=self.archives.as_uri(),
+                               **kwargs)
+        return out.getvalue()
+
+    def test_stages_from_shared_cache(self):
+        first = self.stage(self.tmp / "a", with_cpp_runtime=True)
+        self.assertEqual(2, first.count("Downloading"))
+        binary = self.tmp / "a" / "popili" / "popili"
+        self.assertTrue(os.access(binary, os.X_OK))
+        self.assertTrue((self.tmp / "a" / "cpp-runtime" / "include" / "coco" / "runtime.h").is_file())
+
+        # A second directory reuses the cached archive and its unpacked copy
+        second = self.stage(self.tmp / "b", binary_subdir="bin")
+        self.assertNotIn("Downloading", second)
+        staged = self.tmp / "b" / "bin" / "popili"
+        self.assertEqual(binary.read_bytes(), staged.read_bytes())
+        self.assertTrue(os.access(staged, os.X_OK))
+
+        # Each directory has its own copy, so editing one leaves the cache intact
+        self.assertFalse(os.path.samefile(binary, staged))
+        staged.write_bytes(b"corrupted")
+        self.stage(self.tmp / "c")
+        self.assertEqual(binary.read_bytes(), (self.tmp / "c" / "popili" / "popili").read_bytes())
+
+    def test_rejects_checksum_mismatch(self):
+        self.shas["coco-cpp-runtime.zip"] = "0" * 64
+        with self.assertRaises(SystemExit):
+            self.stage(self.tmp / "a", with_cpp_runtime=True)
+        self.assertFalse(os.path.exists(os.path.join(self.cache, "sha256", "0" * 64)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Generate a synthetic Bazel workspace of Coco packages for benchmarking.
+
+The workspace has N packages of M .coco files each, wired together in one of
+several dependency shapes:
+
+  chain    package i depends on package i-1
+  diamond  package i depends on packages i-1 and i-2, so every package is
+           reachable along many paths
+  fan-in   the last package depends on every other package, which are leaves
+
+Every package gets a coco_package, a coco_generate (C++) and a coco_cc_library,
+and the workspace uses rules_coco from this checkout with a local popili
+toolchain (see the README section "Using a local toolchain"), so it can be
+built without downloading popili.
+"""
+
+import argparse
+import os
+import shutil
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SHAPES = ("chain", "diamond", "fan-in")
+
+
+def package_name(index: int) -> str:
+    return f"pkg{index:04d}"
+
+
+def module_name(package: int, file: int) -> str:
+    return f"P{package:04d}M{file:04d}"
+
+
+def dependencies(shape: str, index: int, packages: int) -> List[int]:
+    """Returns the packages that package `index` depends on."""
+    if shape == "chain":
+        return [index - 1] if index > 0 else []
+    if shape == "diamond":
+        return [d for d in (index - 1, index - 2) if d >= 0]
+    if shape == "fan-in":
+        return list(range(index)) if index == packages - 1 else []
+    raise ValueError(f"Unknown dependency shape: {shape}")
+
+
+def coco_module(package: int, file: int, imports: List[str]) -> str:
+    """A module with a port whose machine refers to each imported module."""
+    name = module_name(package, file)
+    lines = [f"import unqualified {i}" for i in imports]
+    if imports:
+        lines.append("")
+    lines += [
+        f"enum {name}State {{",
+        "  case Idle",
+        "  case Busy",
+        "}",
+        "",
+        f"port {name} {{",
+        f"  function state() : {name}State",
+    ]
+    lines += [f"  function from{i}() : {i}State" for i in imports]
+    lines += [
+        "",
+        "  machine {",
+        f"    state() = {name}State.Idle",
+    ]
+    lines += [f"    from{i}() = {i}State.Idle" for i in imports]
+    lines += ["  }", "}", ""]
+    return "\n".join(lines)
+
+
+def coco_toml(package: int, deps: List[int]) -> str:
+    lines = [
+        "[package]",
+        f'name = "{package_name(package)}"',
+        'sources = ["src"]',
+        "",
+        "[language]",
+        'standard = "1.2"',
+        'profiles = ["C++"]',
+        "",
+        "[generator]",
+        'defaultLanguage = "C++"',
+    ]
+    if deps:
+        lines += ["", "[dependencies]"]
+        lines += [f'{package_name(d)} = "*"' for d in deps]
+    return "\n".join(lines) + "\n"
+
+
+def build_file(package: int, deps: List[int], unity_batch_size: int = 0) -> str:
+    name = package_name(package)
+    unity = f"    unity_batch_size = {unity_batch_size},\n" if unity_batch_size else ""
+    coco_deps = "".join(f'        "//{package_name(d)}",\n' for d in deps)
+    cc_deps = "".join(f'        "//{package_name(d)}:{package_name(d)}_cc",\n' for d in deps)
+    return f'''load("@rules_coco//coco:cc.bzl", "coco_cc_library")
+load("@rules_coco//coco:defs.bzl", "coco_generate", "coco_package")
+
+coco_package(
+    name = "{name}",
+    srcs = glob(["src/*.coco"]),
+    package = "Coco.toml",
+    visibility = ["//visibility:public"],
+    deps = [
+{coco_deps}    ],
+)
+
+coco_generate(
+    name = "{name}_cpp",
+    language = "cpp",
+    package = ":{name}",
+)
+
+coco_cc_library(
+    name = "{name}_cc",
+    generated_package = ":{name}_cpp",
+    includes = ["src"],
+{unity}    visibility = ["//visibility:public"],
+    deps = [
+{cc_deps}    ],
+)
+'''
+
+
+def module_file(popili: str, cc_runtime: str, rules_coco: Path = ROOT) -> str:
+    return f'''module(
+    name = "rules_coco_synthetic_workspace",
+    version = "0.0.0",
+)
+
+bazel_dep(name = "rules_coco", version = "")
+local_path_override(
+    module_name = "rules_coco",
+    path = "{Path(rules_coco).as_posix()}",
+)
+
+bazel_dep(name = "rules_cc", version = "0.2.14")
+
+coco = use_extension("@rules_coco//coco:extensions.bzl", "coco")
+coco.local_toolchain(
+    cc_runtime = "{Path(cc_runtime).as_posix()}",
+    popili = "{Path(popili).as_posix()}",
+)
+'''
+
+
+BAZELRC = """common --enable_bzlmod=true
+common --@rules_coco//:version=local
+"""
+
+
+def generate(out: Path, packages: int, files: int, shape: str, popili: str,
+             cc_runtime: str, unity_batch_size: int = 0, rules_coco: Path = ROOT) -> None:
+    """Writes the synthetic workspace to out, replacing anything already there.
+
+    rules_coco is the checkout the workspace uses, so that two versions of the
+    rules can be compared on the same workspace.
+    """
+    if packages < 1 or files < 1:
+        raise ValueError("packages and files must be positive")
+    shutil.rmtree(out, ignore_errors=True)
+    out.mkdir(parents=True)
+    (out / "MODULE.bazel").write_text(module_file(popili, cc_runtime, rules_coco))
+    (out / ".bazelrc").write_text(BAZELRC)
+    (out / "BUILD.bazel").write_text("")
+
+    for package in range(packages):
+        deps = dependencies(shape, package, packages)
+        src = out / package_name(package) / "src"
+        src.mkdir(parents=True)
+        (src.parent / "Coco.toml").write_text(coco_toml(package, deps))
+        (src.parent / "BUILD.bazel").write_text(build_file(package, deps, unity_batch_size))
+        for file in range(files):
+            if file > 0:
+                imports = [module_name(package, file - 1)]
+            else:
+                # The first module of a package uses the last module of each dependency
+                imports = [module_name(d, files - 1) for d in deps]
+            (src / f"{module_name(package, file)}.coco").write_text(
+                coco_module(package, file, imports))
+
+
+def main(argv=None) -> None:
+    staged = ROOT / "e2e" / "local_toolchain" / "staged"
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--out", type=Path, required=True, help="Directory to write the workspace to")
+    parser.add_argument("--packages", type=int, default=10, help="Number of packages (default: 10)")
+    parser.add_argument("--files", type=int, default=10, help="Number of .coco files per package (default: 10)")
+    parser.add_argument("--shape", choices=SHAPES, default="chain", help="Dependency shape (default: chain)")
+    parser.add_argument("--popili",
+                        default=str(staged / "popili"),
+                        help="Local popili toolchain directory (default: the one staged by "
+                        "e2e/local_toolchain/stage.py)")
+    parser.add_argument("--cc-runtime",
+                        default=str(staged / "cpp-runtime"),
+                        help="Local C++ runtime directory (default: the one staged by "
+                        "e2e/local_toolchain/stage.py)")
+    parser.add_argument("--unity-batch-size",
+                        type=int,
+                        default=0,
+                        help="unity_batch_size of the coco_cc_library targets (default: 0, no batching)")
+    parser.add_argument("--rules-coco",
+                        type=Path,
+                        default=ROOT,
+                        help="rules_coco checkout to use (default: this one)")
+    options = parser.parse_args(argv)
+    generate(options.out, options.packages, options.files, options.shape, os.path.abspath(options.popili),
+             os.path.abspath(options.cc_runtime), options.unity_batch_size, options.rules_coco.resolve())
+    print(f"Wrote {options.packages} x {options.files} {options.shape} workspace to {options.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the synthetic workspace generator and analysis benchmark."""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import benchmark_analysis  # noqa: E402
+import benchmark_compile  # noqa: E402
+import synthetic_workspace  # noqa: E402
+
+
+class SyntheticWorkspaceTest(unittest.TestCase):
+
+    def test_shapes(self):
+        deps = synthetic_workspace.dependencies
+        self.assertEqual([[], [0], [1], [2]], [deps("chain", i, 4) for i in range(4)])
+        self.assertEqual([[], [0], [1, 0], [2, 1]], [deps("diamond", i, 4) for i in range(4)])
+        self.assertEqual([[], [], [], [0, 1, 2]], [deps("fan-in", i, 4) for i in range(4)])
+
+    def test_generate(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "ws"
+            synthetic_workspace.generate(out, 3, 2, "diamond", "/opt/popili", "/opt/cpp-runtime")
+
+            self.assertIn('popili = "/opt/popili"', (out / "MODULE.bazel").read_text())
+            self.assertEqual(2, len(list((out / "pkg0002" / "src").glob("*.coco"))))
+            self.assertIn('pkg0000 = "*"', (out / "pkg0002" / "Coco.toml").read_text())
+            self.assertIn('"//pkg0001:pkg0001_cc"', (out / "pkg0002" / "BUILD.bazel").read_text())
+
+            # The first module of a package imports the last module of each dependency
+            first = (out / "pkg0002" / "src" / "P0002M0000.coco").read_text()
+            self.assertIn("import unqualified P0001M0001", first)
+            self.assertIn("import unqualified P0000M0001", first)
+            second = (out / "pkg0002" / "src" / "P0002M0001.coco").read_text()
+            self.assertIn("import unqualified P0002M0000", second)
+            self.assertNotIn("unity_batch_size", (out / "pkg0002" / "BUILD.bazel").read_text())
+
+    def test_generate_unity_build(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "ws"
+            synthetic_workspace.generate(out, 1, 2, "chain", "/opt/popili", "/opt/cpp-runtime", unity_batch_size=8)
+            self.assertIn("unity_batch_size = 8,", (out / "pkg0000" / "BUILD.bazel").read_text())
+
+    def test_generate_other_checkout(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "ws"
+            synthetic_workspace.generate(out, 1, 1, "chain", "/opt/popili", "/opt/cpp-runtime",
+                                         rules_coco=Path("/src/rules_coco_before"))
+            self.assertIn('path = "/src/rules_coco_before"', (out / "MODULE.bazel").read_text())
+
+    def test_count_action_inputs(self):
+        aquery = {
+            "depSetOfFiles": [
+                {"id": 1, "directArtifactIds": [1, 2]},
+                {"id": 2, "directArtifactIds": [2, 3], "transitiveDepSetIds": [1]},
+            ],
+            "actions": [
+                {"inputDepSetIds": [2]},
+                {"inputDepSetIds": [1, 2]},
+                {},
+            ],
+        }
+        self.assertEqual(6, benchmark_analysis.count_action_inputs(aquery))
+
+    def test_requires_bazel(self):
+        with mock.patch.object(benchmark_analysis.shutil, "which", return_value=None):
+            with self.assertRaises(SystemExit) as raised:
+                benchmark_analysis.main(["--work-dir", "/nonexistent"])
+        self.assertIn("bazel", str(raised.exception.code))
+        with mock.patch.object(benchmark_analysis.shutil, "which", return_value=None):
+            with self.assertRaises(SystemExit):
+                benchmark_compile.main(["--work-dir", "/nonexistent"])
+
+    def test_count_mnemonic(self):
+        aquery = {"actions": [{"mnemonic": "CppCompile"}, {"mnemonic": "CppLink"}, {"mnemonic": "CppCompile"}]}
+        self.assertEqual(2, benchmark_compile.count_mnemonic(aquery, "CppCompile"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for coco/private/unused_inputs.awk, which finds the unimported .coco inputs of a popili action."""
+
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+SCRIPT = Path(__file__).resolve().parent.parent / "coco" / "private" / "unused_inputs.awk"
+
+
+@unittest.skipIf(shutil.which("awk") is None, "awk is not installed")
+class UnusedInputsTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        # A dependency package whose sources import each other
+        self.write("dep/src/a/b/Timer.coco", "import Clock\n\nport Timer {}\n")
+        self.write("dep/src/Clock.coco", "port Clock {}\n")
+        self.write("dep/src/Queue.coco", "port Queue {}\n")
+        self.write("dep/src/Mock.coco", "import Queue\n")
+        self.write("dep/src/Unused.coco", "port Unused {}\n")
+        self.write("dep/Coco.toml", "")
+
+    def write(self, path, text):
+        (self.tmp / path).parent.mkdir(parents=True, exist_ok=True)
+        (self.tmp / path).write_text(text)
+
+    def unused(self, roots):
+        """Returns the unused inputs of an action processing roots, with every dependency file as an input."""
+        inputs = sorted(str(p.relative_to(self.tmp)) for p in (self.tmp / "dep").rglob("*.coco"))
+        manifest = self.tmp / "manifest"
+        manifest.write_text("\n".join(["out/unused"] + [f"root {root}" for root in roots] +
+                                      [f"input {path}" for path in roots + inputs]) + "\n")
+        result = subprocess.run(["awk", "-f", str(SCRIPT), str(manifest)],
+                                cwd=self.tmp,
+                                check=True,
+                                capture_output=True,
+                                text=True)
+        return result.stdout.split()
+
+    def test_unqualified_import(self):
+        self.write("app/src/App.coco", "import unqualified Clock\n")
+        self.assertEqual(["dep/src/Mock.coco", "dep/src/Queue.coco", "dep/src/Unused.coco", "dep/src/a/b/Timer.coco"],
+                         self.unused(["app/src/App.coco"]))
+
+    def test_qualified_import_of_nested_module(self):
+        self.write("app/src/App.coco", "  import qualified a.b.Timer\n")
+        self.assertNotIn("dep/src/a/b/Timer.coco", self.unused(["app/src/App.coco"]))
+
+    def test_transitive_import(self):
+        self.write("app/src/App.coco", "import a.b.Timer\n")
+        self.assertEqual(["dep/src/Mock.coco", "dep/src/Queue.coco", "dep/src/Unused.coco"],
+                         self.unused(["app/src/App.coco"]))
+
+    def test_imports_of_test_sources(self):
+        self.write("app/src/App.coco", "import a.b.Timer\n")
+        self.write("app/test/AppTest.coco", "import Mock\n")
+        self.assertEqual(["dep/src/Unused.coco"], self.unused(["app/src/App.coco", "app/test/AppTest.coco"]))
+
+    def test_unimported_file_is_unused(self):
+        self.write("app/src/App.coco", "// import Unused\nport App {}\n")
+        self.assertIn("dep/src/Unused.coco", self.unused(["app/src/App.coco"]))
+
+    def test_module_matches_whole_file_names(self):
+        # Timer matches a/b/Timer.coco, since popili may find it under a package's nested source directory, but Used
+        # does not match Unused.coco
+        self.write("app/src/App.coco", "import Timer\nimport Used\n")
+        self.assertEqual(["dep/src/Mock.coco", "dep/src/Queue.coco", "dep/src/Unused.coco"],
+                         self.unused(["app/src/App.coco"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -15,17 +15,29 @@
 # limitations under the License.
 
 import argparse
+import http.client
 import json
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
 from pathlib import Path
-from typing import Dict, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from urllib.error import HTTPError
-from urllib.request import urlopen
+from urllib.parse import urljoin, urlsplit
 
 tools_dir = Path(__file__).resolve().parent
 
+DEFAULT_BASE_URL = "https://dl.cocotec.io/popili"
+
 # Minimum supported version (rules_coco requires Popili 1.5.0 or higher)
 MINIMUM_VERSION = (1, 5, 0)
 
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+# Redirects followed per fetch before giving up
+MAX_REDIRECTS = 5
+
 
 def parse_version(version: str) -> Optional[Tuple[int, ...]]:
     """Parse a version string like '1.5.0' or '1.5.0-rc.1' into a tuple."""
@@ -44,46 +56,226 @@ def is_version_supported(version: str) -> bool:
     return parsed >= MINIMUM_VERSION
 
 
-def read_url(url: str) -> str:
-    return urlopen(url).read().decode('utf-8')
+class Fetcher:
+    """Fetches URLs over keep-alive connections, one per host and thread.
+
+    Redirects are followed, up to MAX_REDIRECTS of them. URLs that the
+    environment routes through a proxy (HTTP_PROXY, HTTPS_PROXY and NO_PROXY)
+    are fetched with urllib.request instead, which honours those settings.
+
+    Responses are remembered in `cache` (keyed by URL) together with their ETag and
+    Last-Modified validators, so later fetches of the same URL are conditional and a
+    304 Not Modified reuses the cached body.
+    """
+
+    def __init__(self,
+                 cache: Optional[Dict[str, Dict[str, str]]] = None,
+                 timeout: float = 60):
+        self.cache = cache if cache is not None else {}
+        self._timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _connection(self, scheme: str,
+                    netloc: str) -> http.client.HTTPConnection:
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+        key = (scheme, netloc)
+        if key not in connections:
+            connection_type = (http.client.HTTPSConnection if scheme == "https"
+                               else http.client.HTTPConnection)
+            connections[key] = connection_type(netloc, timeout=self._timeout)
+        return connections[key]
+
+    def _drop_connection(self, scheme: str, netloc: str) -> None:
+        connection = self._local.connections.pop((scheme, netloc))
+        connection.close()
+
+    def _request(self, url: str,
+                 headers: Dict[str, str]) -> Tuple[int, str, Message, bytes]:
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        connection = self._connection(parts.scheme, parts.netloc)
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+        except (http.client.HTTPException, OSError):
+            self._drop_connection(parts.scheme, parts.netloc)
+            raise
+        return response.status, response.reason, response.headers, body
+
+    def _get_direct(self, url: str,
+                    headers: Dict[str, str]) -> Tuple[int, str, Message, bytes]:
+        # A kept-alive connection may have been closed by the server since its last
+        # use, so retry once on a fresh connection.
+        try:
+            return self._request(url, headers)
+        except (http.client.HTTPException, OSError):
+            return self._request(url, headers)
+
+    def _get_proxied(self, url: str,
+                     headers: Dict[str, str]) -> Tuple[int, str, Message, bytes]:
+        # urllib.request follows redirects itself, and reports any other
+        # non-200 status (including 304) as an HTTPError. A new opener reads the
+        # current proxy settings, unlike urlopen's shared one.
+        request = urllib.request.Request(url, headers=headers)
+        try:
+            with urllib.request.build_opener().open(
+                    request, timeout=self._timeout) as response:
+                body = response.read()
+                return response.status, response.reason, response.headers, body
+        except HTTPError as e:
+            return e.code, e.reason, e.headers, b""
+
+    def _get(self, url: str,
+             headers: Dict[str, str]) -> Tuple[int, str, Message, bytes]:
+        """Sends one GET request, returning the status, reason, headers and body."""
+        host = urlsplit(url).hostname or ""
+        proxied = (urlsplit(url).scheme in urllib.request.getproxies()
+                   and not urllib.request.proxy_bypass(host))
+        return (self._get_proxied if proxied else self._get_direct)(url,
+                                                                     headers)
+
+    def read(self, url: str) -> str:
+        with self._lock:
+            cached = self.cache.get(url)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        location = url
+        for _ in range(MAX_REDIRECTS + 1):
+            status, reason, response_headers, body = self._get(
+                location, headers)
+            if status not in REDIRECT_STATUSES or not response_headers.get(
+                    "Location"):
+                break
+            location = urljoin(location, response_headers["Location"])
+        else:
+            raise HTTPError(url, status,
+                            f"more than {MAX_REDIRECTS} redirects",
+                            response_headers, None)
+
+        if status == 304 and cached:
+            return cached["body"]
+        if status != 200:
+            raise HTTPError(url, status, reason, response_headers, None)
+
+        text = body.decode('utf-8')
+        entry = {"body": text}
+        if response_headers.get("ETag"):
+            entry["etag"] = response_headers["ETag"]
+        if response_headers.get("Last-Modified"):
+            entry["last_modified"] = response_headers["Last-Modified"]
+        with self._lock:
+            self.cache[url] = entry
+        return text
+
+
+def read_url(url: str, fetcher: Optional[Fetcher] = None) -> str:
+    return (fetcher or Fetcher()).read(url)
 
 
-def download_sha_file(url: str) -> Dict[str, str]:
+def download_sha_file(url: str,
+                      fetcher: Optional[Fetcher] = None) -> Dict[str, str]:
     result: Dict[str, str] = {}
-    for line in read_url(url).splitlines():
+    for line in read_url(url, fetcher).splitlines():
         sha, file = line.split(' ')
         result[file] = sha
     return result
 
 
-def create_digest_dictionary(versions_file: str) -> Dict[str, str]:
+def parse_known_shas(text: str) -> Dict[str, str]:
+    """Parse the FILE_KEY_TO_SHA dictionary out of a generated known_shas.bzl."""
+    marker = "FILE_KEY_TO_SHA = "
+    start = text.find(marker)
+    if start == -1:
+        return {}
+    digests, _ = json.JSONDecoder().raw_decode(text, start + len(marker))
+    return digests
+
+
+def _version_digests(version: str, base_url: str,
+                     fetcher: Fetcher) -> Optional[Dict[str, str]]:
+    """Fetches the digests of a version's archives, or None if it has no sha256sums.txt.
+
+    Any error other than a 404 Not Found is raised, so that a version is never
+    silently dropped from the digests.
+    """
     result: Dict[str, str] = {}
-    for version in json.loads(versions_file)["all"]:
-        version = version["name"]
+    try:
+        for file, digest in download_sha_file(
+                f'{base_url}/archive/{version}/sha256sums.txt',
+                fetcher).items():
+            if not file.endswith(".zip") or file.endswith(
+                    "p2.zip") or file.endswith("examples.zip"):
+                continue
+            result[f'{version}/{file}'] = digest
+    except HTTPError as e:
+        if e.code != 404:
+            raise
+        return None
+    return result
 
+
+def create_digest_dictionary(versions_file: str,
+                             existing: Optional[Dict[str, str]] = None,
+                             base_url: str = DEFAULT_BASE_URL,
+                             jobs: int = 8,
+                             fetcher: Optional[Fetcher] = None) -> Dict[str, str]:
+    """Builds FILE_KEY_TO_SHA for every supported version in versions_file.
+
+    Versions that already have digests in `existing` are not fetched again, as the
+    checksums of a published release never change. The remaining versions are
+    fetched concurrently on up to `jobs` threads. Entries are ordered as in
+    versions_file regardless of which versions were fetched.
+    """
+    fetcher = fetcher or Fetcher()
+    known: Dict[str, Dict[str, str]] = {}
+    for key, digest in (existing or {}).items():
+        known.setdefault(key.split("/", 1)[0], {})[key] = digest
+
+    versions: List[str] = [
+        version["name"] for version in json.loads(versions_file)["all"]
         # Skip versions older than 1.5.0
-        if not is_version_supported(version):
-            continue
+        if is_version_supported(version["name"])
+    ]
+    missing = [version for version in versions if version not in known]
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        fetched = dict(
+            zip(
+                missing,
+                executor.map(
+                    lambda version: _version_digests(version, base_url,
+                                                     fetcher), missing)))
 
-        try:
-            for file, digest in download_sha_file(
-                    f'https://dl.cocotec.io/popili/archive/{version}/sha256sums.txt'
-            ).items():
-                if not file.endswith(".zip") or file.endswith(
-                        "p2.zip") or file.endswith("examples.zip"):
-                    continue
-                result[f'{version}/{file}'] = digest
-        except HTTPError:
-            pass
+    result: Dict[str, str] = {}
+    for version in versions:
+        digests = known.get(version) or fetched.get(version)
+        if digests:
+            result.update(digests)
     return result
 
 
-if __name__ == "__main__":
+def main(argv: Optional[List[str]] = None) -> None:
     parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url",
+                        action="store",
+                        type=str,
+                        default=DEFAULT_BASE_URL,
+                        help="Popili download site to read checksums from")
     parser.add_argument("--versions",
                         action="store",
                         type=str,
-                        default="https://dl.cocotec.io/popili/versions.json")
+                        default=None,
+                        help="URL of versions.json (default: under --base-url)")
     parser.add_argument("--out",
                         action="store",
                         type=Path,
@@ -94,11 +286,45 @@ if __name__ == "__main__":
                         type=Path,
                         default=tools_dir.parent / "coco" / "private" /
                         "version_aliases.bzl")
+    parser.add_argument("--jobs",
+                        action="store",
+                        type=int,
+                        default=8,
+                        help="Number of checksum files to fetch concurrently")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only fetch checksums for versions missing from --out")
+    parser.add_argument(
+        "--cache",
+        action="store",
+        type=Path,
+        default=None,
+        help="JSON file remembering responses and their ETag/Last-Modified "
+        "validators, so unchanged files are revalidated rather than re-downloaded")
+
+    options = parser.parse_args(argv)
 
-    options = parser.parse_args()
+    cache = {}
+    if options.cache and options.cache.exists():
+        cache = json.loads(options.cache.read_text())
+    fetcher = Fetcher(cache)
 
-    versions_json = json.loads(read_url(options.versions))
-    digests = create_digest_dictionary(json.dumps(versions_json))
+    existing = None
+    if options.incremental and options.out.exists():
+        existing = parse_known_shas(options.out.read_text())
+
+    versions_json = json.loads(
+        read_url(options.versions or f"{options.base_url}/versions.json",
+                 fetcher))
+    digests = create_digest_dictionary(json.dumps(versions_json),
+                                       existing=existing,
+                                       base_url=options.base_url,
+                                       jobs=options.jobs,
+                                       fetcher=fetcher)
+
+    if options.cache:
+        options.cache.write_text(json.dumps(fetcher.cache, indent=2))
 
     # Write digests file
     with open(options.out, 'w') as f:
@@ -123,3 +349,7 @@ VERSION_ALIASES = {
             if alias in versions_json:
                 f.write(f'    "{alias}": "{versions_json[alias]}",\n')
         f.write("}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Cocotec Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for update_digests against a local server of fixture files."""
+
+import functools
+import hashlib
+import http.server
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import unittest.mock
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import update_digests  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "testdata" / "update_digests"
+
+
+class FixtureHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves the fixtures over keep-alive connections with ETags, recording each request.
+
+    Paths under /moved/ redirect to the rest of the path, /loop redirects to
+    itself and paths under /broken/ fail with 500. Requests for absolute URLs, as
+    sent to a proxy, are recorded in `proxied` and served from the fixtures too.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+        self._etag = None
+
+    def log_message(self, *args):
+        pass
+
+    def send_head(self):
+        if not self.path.startswith("/"):
+            self.server.proxied.append(self.path)
+            self.path = urlsplit(self.path).path
+        self.server.requests.append(self.path)
+        self._etag = None
+        if self.path.startswith("/moved/"):
+            return self.redirect(301, self.path[len("/moved"):])
+        if self.path == "/loop":
+            return self.redirect(302, "/loop")
+        if self.path.startswith("/broken/"):
+            self.send_error(500)
+            return None
+        path = Path(self.translate_path(self.path))
+        if path.is_file():
+            self._etag = '"%s"' % hashlib.sha256(path.read_bytes()).hexdigest()
+            if self.headers.get("If-None-Match") == self._etag:
+                self.send_response(304)
+                self.end_headers()
+                return None
+        return super().send_head()
+
+    def redirect(self, status, location):
+        self.send_response(status)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        return None
+
+    def end_headers(self):
+        if self._etag:
+            self.send_header("ETag", self._etag)
+        super().end_headers()
+
+
+class UpdateDigestsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0),
+            functools.partial(FixtureHandler, directory=str(FIXTURES)))
+        self.server.requests = []
+        self.server.proxied = []
+        self.server.connections = 0
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = "http://127.0.0.1:%d" % self.server.server_address[1]
+        self.versions = (FIXTURES / "versions.json").read_text()
+
+    def digests(self, **kwargs):
+        return self.digests_from(self.base_url, **kwargs)
+
+    def digests_from(self, base_url, **kwargs):
+        return update_digests.create_digest_dictionary(self.versions,
+                                                       base_url=base_url,
+                                                       **kwargs)
+
+    def test_full_refresh(self):
+        digests = self.digests()
+        self.assertEqual(
+            ["1.7.0-rc.1", "1.6.0", "1.5.0"],
+            list(dict.fromkeys(key.split("/")[0] for key in digests)))
+        self.assertEqual(
+            [
+                "1.6.0/popili_linux_amd64.zip",
+                "1.6.0/popili_darwin_arm64.zip",
+                "1.6.0/coco-cpp-runtime.zip",
+            ],
+            [key for key in digests if key.startswith("1.6.0/")],
+        )
+        # Unsupported versions are never fetched
+        self.assertNotIn("/archive/1.4.2/sha256sums.txt", self.server.requests)
+
+    def test_incremental_only_fetches_missing_versions(self):
+        full = self.digests()
+        existing = {
+            key: digest
+            for key, digest in full.items()
+            if not key.startswith("1.7.0-rc.1/")
+        }
+        self.server.requests.clear()
+
+        self.assertEqual(full, self.digests(existing=existing))
+        self.assertEqual(
+            sorted([
+                "/archive/1.7.0-rc.1/sha256sums.txt",
+                "/archive/1.6.1/sha256sums.txt",
+            ]), sorted(self.server.requests))
+
+    def test_incremental_drops_unlisted_versions(self):
+        existing = dict(self.digests())
+        existing["1.0.0/popili_linux_amd64.zip"] = "0" * 64
+        self.assertNotIn("1.0.0/popili_linux_amd64.zip",
+                         self.digests(existing=existing))
+
+    def test_reuses_connections(self):
+        self.digests(jobs=1)
+        self.assertEqual(4, len(self.server.requests))
+        # The server closes the connection after the 404 for 1.6.1, so one reconnect
+        self.assertEqual(2, self.server.connections)
+
+    def test_revalidates_with_etag(self):
+        fetcher = update_digests.Fetcher()
+        url = self.base_url + "/versions.json"
+        first = fetcher.read(url)
+        self.assertIn("etag", fetcher.cache[url])
+
+        # Serve a stale body from the cache to prove a 304 reuses it
+        fetcher.cache[url]["body"] = "cached"
+        self.assertEqual("cached", fetcher.read(url))
+        self.assertEqual(json.loads(first), json.loads(self.versions))
+
+    def test_follows_redirects(self):
+        self.assertEqual(self.digests(),
+                         self.digests_from(self.base_url + "/moved"))
+        self.assertIn("/moved/archive/1.6.0/sha256sums.txt",
+                      self.server.requests)
+
+    def test_redirect_loop_raises(self):
+        with self.assertRaises(HTTPError) as raised:
+            update_digests.Fetcher().read(self.base_url + "/loop")
+        self.assertIn("redirects", str(raised.exception))
+        self.assertEqual(update_digests.MAX_REDIRECTS + 1,
+                         self.server.requests.count("/loop"))
+
+    def test_errors_other_than_not_found_raise(self):
+        with self.assertRaises(HTTPError) as raised:
+            self.digests_from(self.base_url + "/broken")
+        self.assertEqual(500, raised.exception.code)
+
+    def test_honours_proxy(self):
+        # example.invalid never resolves, so it can only be reached through the proxy
+        environment = {
+            "http_proxy": self.base_url,
+            "HTTP_PROXY": self.base_url,
+            "no_proxy": "",
+            "NO_PROXY": ""
+        }
+        with unittest.mock.patch.dict(os.environ, environment):
+            self.assertEqual(self.digests(),
+                             self.digests_from("http://example.invalid"))
+        self.assertIn("http://example.invalid/archive/1.6.0/sha256sums.txt",
+                      self.server.proxied)
+
+    def test_main_incremental_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "known_shas.bzl"
+            aliases_out = Path(tmp) / "version_aliases.bzl"
+            cache = Path(tmp) / "cache.json"
+            args = [
+                "--base-url", self.base_url, "--out",
+                str(out), "--aliases-out",
+                str(aliases_out), "--cache",
+                str(cache)
+            ]
+            update_digests.main(args)
+            written = out.read_text()
+            self.assertEqual(self.digests(),
+                             update_digests.parse_known_shas(written))
+            self.assertIn('"stable": "1.6.0"', aliases_out.read_text())
+
+            self.server.requests.clear()
+            update_digests.main(args + ["--incremental"])
+            self.assertEqual(written, out.read_text())
+            # Only versions.json and the version without checksums are requested again
+            self.assertEqual(
+                sorted(["/versions.json", "/archive/1.6.1/sha256sums.txt"]),
+                sorted(self.server.requests))
+
+
+if __name__ == "__main__":
+    unittest.main()